@@ -1,43 +1,113 @@
-import random
-import string
 import os
+import time
+import random
+import argparse
 
-def create_dummy_ascii_file(file_path, target_size_bytes):
-    possible_chars = [chr(i) for i in range(32, 127)] + ['\n']
-    bytes_written = 0
-    try:
-        with open(file_path, 'w', encoding='ascii') as f:
-            chunk_size = 4096
-            while bytes_written < target_size_bytes:
-                remaining_bytes = target_size_bytes - bytes_written
-                current_chunk_target_size = min(chunk_size, remaining_bytes)
-                random_chars_for_chunk = [random.choice(possible_chars) for _ in range(current_chunk_target_size)]
-                random_string_chunk = "".join(random_chars_for_chunk)
-                f.write(random_string_chunk)
-                bytes_written += len(random_string_chunk)
-        
-        actual_size_on_disk = os.path.getsize(file_path)
-        print(f"File '{file_path}' created. Target: {target_size_bytes} bytes, Actual: {actual_size_on_disk} bytes.")
-        if actual_size_on_disk != target_size_bytes:
-             print("Note: Actual size differs slightly from target.")
-    except IOError as e:
-        print(f"Error writing to file '{file_path}': {e}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+PRINTABLE = bytes(range(32, 127)) + b'\n'
+PRINTABLE_TABLE = bytes(PRINTABLE[i % len(PRINTABLE)] for i in range(256))
+FILLER = b"Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor.\n"
+KINDS = ('text', 'binary', 'zero', 'sparse')
+WRITE_SIZE = 4 * 1024 * 1024
+BLOCK_SIZE = 64 * 1024
+DEFAULT_SIZES_MB = (10, 50, 100)
+SIZE_UNITS = {'': 1024 * 1024, 'b': 1, 'k': 1024, 'm': 1024 * 1024, 'g': 1024 * 1024 * 1024}
 
-if __name__ == "__main__":
+def parse_size(text):
+    value = text.strip().lower()
+    for suffix in ('ib', 'b'):
+        if value.endswith(suffix) and value[:-len(suffix)][-1:] in ('k', 'm', 'g'):
+            value = value[:-len(suffix)]
+            break
+    unit = value[-1] if value and value[-1] in SIZE_UNITS else ''
     try:
-        file_name_input = input("Enter filename (default: dummy_data.txt): ") or "dummy_data.txt"
-        size_mb_input_str = input("Enter file size in MB (default: 1.0): ") or "1.0"
-        
-        target_size_mb = float(size_mb_input_str)
-        if target_size_mb < 0:
-            print("Error: File size cannot be negative.")
-        else:
-            target_size_in_bytes = int(target_size_mb * 1024 * 1024)
-            print(f"Creating '{file_name_input}' ({target_size_mb} MB)...")
-            create_dummy_ascii_file(file_name_input, target_size_in_bytes)
+        size = int(float(value[:-1] if unit else value) * SIZE_UNITS[unit])
     except ValueError:
-        print("Error: Invalid input for file size. Please enter a number.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
+        raise ValueError(f"Invalid file size '{text}', expected e.g. 512k, 10M, 1.5GB or 100b")
+    if size < 0:
+        raise ValueError(f"File size cannot be negative: '{text}'")
+    return size
+
+def _random_bytes(count, rng):
+    return rng.randbytes(count) if rng is not None else os.urandom(count)
+
+def _make_chunk(size, kind, rng, compressibility):
+    if kind == 'zero':
+        return bytes(size)
+    random_per_block = BLOCK_SIZE - int(BLOCK_SIZE * compressibility)
+    blocks = -(-size // BLOCK_SIZE)
+    data = _random_bytes(random_per_block * blocks, rng)
+    if kind == 'text':
+        data = data.translate(PRINTABLE_TABLE)
+    if random_per_block == BLOCK_SIZE:
+        return data[:size]
+    filler = (FILLER * (BLOCK_SIZE // len(FILLER) + 1))[:BLOCK_SIZE - random_per_block]
+    parts = []
+    for i in range(blocks):
+        parts.append(data[i * random_per_block:(i + 1) * random_per_block])
+        parts.append(filler)
+    return b''.join(parts)[:size]
+
+def create_dummy_file(file_path, target_size_bytes, kind='text', seed=None, compressibility=0.0):
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind '{kind}', expected one of {', '.join(KINDS)}")
+    if not 0.0 <= compressibility <= 1.0:
+        raise ValueError("compressibility must be between 0.0 and 1.0")
+    rng = random.Random(seed) if seed is not None else None
+    with open(file_path, 'wb', buffering=0) as f:
+        if kind == 'sparse':
+            f.truncate(target_size_bytes)
+            return os.path.getsize(file_path)
+        bytes_written = 0
+        while bytes_written < target_size_bytes:
+            chunk = _make_chunk(min(WRITE_SIZE, target_size_bytes - bytes_written), kind, rng, compressibility)
+            view = memoryview(chunk)
+            while view:
+                written = f.write(view)
+                view = view[written:]
+            bytes_written += len(chunk)
+    return os.path.getsize(file_path)
+
+def create_dummy_ascii_file(file_path, target_size_bytes, seed=None, compressibility=0.0):
+    return create_dummy_file(file_path, target_size_bytes, 'text', seed, compressibility)
+
+def main():
+    parser = argparse.ArgumentParser(description="Buat file dummy untuk stress test dan benchmark")
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES_MB),
+                        help="daftar ukuran dalam MB untuk <prefix><N>MB.txt (default 10,50,100); kosongkan untuk melewati")
+    parser.add_argument('--prefix', default='dummy_file_', help="awalan nama file untuk --sizes")
+    parser.add_argument('--file', action='append', default=[], metavar='NAMA:UKURAN',
+                        help="file tambahan, contoh dummy_data.txt:1.5M atau kosong.bin:100MB (satuan b, k, M, G dengan akhiran b/ib opsional; angka tanpa satuan = MB)")
+    parser.add_argument('--dir', default='.', help="direktori tujuan")
+    parser.add_argument('--kind', choices=KINDS, default='text',
+                        help="text = ASCII acak, binary = byte acak, zero = nol ditulis, sparse = file berlubang")
+    parser.add_argument('--compressibility', type=float, default=0.0,
+                        help="0.0 = acak penuh, 1.0 = seluruhnya pola berulang; porsi per blok 64 KiB")
+    parser.add_argument('--seed', type=int, default=None, help="seed PRNG agar isi file dapat direproduksi")
+    parser.add_argument('--force', action='store_true', help="tulis ulang file yang sudah ada dengan ukuran sama")
+    args = parser.parse_args()
+
+    targets = [(f"{args.prefix}{size}MB.txt", int(size) * 1024 * 1024) for size in args.sizes.split(',') if size.strip()]
+    for spec in args.file:
+        name, sep, size = spec.rpartition(':')
+        if not sep or not name:
+            parser.error(f"--file expects NAMA:UKURAN, got '{spec}'")
+        try:
+            targets.append((name, parse_size(size)))
+        except ValueError as e:
+            parser.error(str(e))
+    os.makedirs(args.dir, exist_ok=True)
+
+    for index, (name, size) in enumerate(targets):
+        path = os.path.join(args.dir, name)
+        if not args.force and os.path.exists(path) and os.path.getsize(path) == size:
+            print(f"'{path}' sudah ada ({size} bytes), dilewati.")
+            continue
+        started = time.monotonic()
+        seed = None if args.seed is None else args.seed + index
+        actual = create_dummy_file(path, size, args.kind, seed, args.compressibility)
+        elapsed = time.monotonic() - started
+        print(f"File '{path}' created. Target: {size} bytes, Actual: {actual} bytes "
+              f"({elapsed:.2f}s, {size / (1024 * 1024) / elapsed if elapsed else 0:.0f} MB/s).")
+
+if __name__ == "__main__":
+    main()
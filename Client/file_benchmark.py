@@ -0,0 +1,259 @@
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import socket
+import platform
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+import file_client_stress_test as client
+from file_client_loadgen import LoadGenerator, parse_size, DEFAULT_MIX, DEFAULT_SIZES
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Server')
+SERVER_IMPLEMENTATIONS = {
+    'file_server': ('file_server', 'Server'),
+    'file_server_threadpool': ('file_server_threadpool', 'Server'),
+    'file_server_async': ('file_server_async', 'Server'),
+    'file_server_multiprocess': ('file_server_multiprocess', 'Supervisor'),
+}
+SCENARIO_TYPES = ('closed', 'open')
+SERVER_START_TIMEOUT = 15.0
+SERVER_STOP_TIMEOUT = 10.0
+DEFAULT_REPEATS = 3
+DEFAULT_WARMUP = 1
+DEFAULT_THRESHOLD = 0.10
+HIGHER_IS_BETTER = ('mbps', 'mbps_per_client', 'throughput_rps')
+T_95 = {1: 12.71, 2: 4.30, 3: 3.18, 4: 2.78, 5: 2.57, 6: 2.45, 7: 2.36, 8: 2.31, 9: 2.26, 10: 2.23,
+        15: 2.13, 20: 2.09, 30: 2.04}
+
+def implementation_name(server):
+    name = os.path.basename(server)
+    return name[:-3] if name.endswith('.py') else name
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+class LocalServer:
+    def __init__(self, server, options=None, server_dir=SERVER_DIR):
+        self.implementation = implementation_name(server)
+        if self.implementation not in SERVER_IMPLEMENTATIONS:
+            raise ValueError(f"Unknown server '{server}', expected one of {', '.join(SERVER_IMPLEMENTATIONS)}")
+        self.options = options or {}
+        self.server_dir = os.path.abspath(server_dir)
+        self.port = None
+        self.process = None
+        self.work_dir = None
+        self.log_file = None
+
+    def start(self):
+        module, cls = SERVER_IMPLEMENTATIONS[self.implementation]
+        self.port = _free_port()
+        self.work_dir = tempfile.mkdtemp(prefix=f"bench_{self.implementation}_")
+        os.makedirs(os.path.join(self.work_dir, 'files'), exist_ok=True)
+        code = (f"import json, sys; from {module} import {cls}; "
+                f"{cls}(ipaddress='127.0.0.1', port={self.port}, **json.loads(sys.argv[1])).run()")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [self.server_dir, os.environ.get('PYTHONPATH')])))
+        self.log_file = open(os.path.join(self.work_dir, 'server.log'), 'w')
+        self.process = subprocess.Popen([sys.executable, '-c', code, json.dumps(self.options)], cwd=self.work_dir,
+                                        env=env, stdout=self.log_file, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server {self.implementation} berhenti saat start, lihat {self.log_file.name}")
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=0.5).close()
+                return ('127.0.0.1', self.port)
+            except OSError:
+                time.sleep(0.1)
+        self.stop()
+        raise RuntimeError(f"Server {self.implementation} tidak siap dalam {SERVER_START_TIMEOUT:.0f} detik")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(SERVER_STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.log_file:
+            self.log_file.close()
+        if self.work_dir:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+        self.process = self.log_file = self.work_dir = None
+
+def _write_random_file(path, size, chunk_size=1024 * 1024):
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            f.write(os.urandom(min(chunk_size, remaining)))
+            remaining -= chunk_size
+
+def run_closed_scenario(scenario, iteration, work_dir):
+    size = parse_size(scenario.get('file_size', '10M'))
+    file_info = {'id': scenario['name'], 'path': os.path.join(work_dir, 'payload.bin'), 'size_bytes': size}
+    if not os.path.exists(file_info['path']) or os.path.getsize(file_info['path']) != size:
+        _write_random_file(file_info['path'], size)
+    clients = int(scenario.get('clients', 1))
+    started = time.monotonic()
+    results = client.run_stress_scenario(file_info, clients, f"{iteration:03d}", int(scenario.get('processes', 1)))
+    metrics = dict(wall_time=time.monotonic() - started)
+    for op_name, status_key, time_key in client.OPERATION_COLUMNS:
+        summary = client.summarize_operation(results, status_key, time_key, file_info)
+        op = op_name.lower()
+        metrics[f"{op}.mbps_per_client"] = summary['avg_MBps']
+        metrics[f"{op}.time_mean"] = summary['avg_time'] if summary['times'] else None
+        metrics[f"{op}.time_max"] = max(summary['times']) if summary['times'] else None
+        metrics[f"{op}.failures"] = summary['fail_server'] + summary['fail_other']
+    return metrics
+
+def run_open_scenario(scenario, iteration, work_dir):
+    generator = LoadGenerator(client.server_address, scenario.get('rate', 20), scenario.get('duration', 10),
+                              scenario.get('mix', DEFAULT_MIX), scenario.get('sizes', DEFAULT_SIZES),
+                              scenario.get('schedule', 'poisson'), scenario.get('concurrency', 256),
+                              seed=scenario.get('seed', iteration), work_dir=os.path.join(work_dir, f"loadgen_{iteration}"))
+    try:
+        generator.prepare()
+        report = generator.run()
+    finally:
+        generator.cleanup()
+    metrics = dict(throughput_rps=report['throughput'], mbps=report['mbps'], error_rate=report['error_rate'],
+                   latency_p50=report['latency']['p50'], latency_p99=report['latency']['p99'],
+                   latency_p99_9=report['latency']['p99.9'])
+    for operation, stats in report['operations'].items():
+        metrics[f"{operation}.latency_p50"] = stats['latency']['p50']
+        metrics[f"{operation}.latency_p99"] = stats['latency']['p99']
+        metrics[f"{operation}.ttfb_p99"] = stats['ttfb']['p99']
+    return metrics
+
+SCENARIO_RUNNERS = {'closed': run_closed_scenario, 'open': run_open_scenario}
+
+def summarize_values(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return dict(values=[], mean=None, stdev=None, ci95=None)
+    mean = statistics.mean(values)
+    stdev = statistics.stdev(values) if len(values) > 1 else 0.0
+    ci95 = None
+    if len(values) > 1:
+        dof = len(values) - 1
+        t = T_95[max(k for k in T_95 if k <= dof)] if dof <= max(T_95) else 1.96
+        ci95 = t * stdev / math.sqrt(len(values))
+    return dict(values=values, mean=mean, stdev=stdev, ci95=ci95)
+
+def run_scenario(scenario, defaults):
+    scenario = dict(defaults, **scenario)
+    if scenario.get('type', 'closed') not in SCENARIO_TYPES:
+        raise ValueError(f"Scenario {scenario['name']}: type must be one of {', '.join(SCENARIO_TYPES)}")
+    runner = SCENARIO_RUNNERS[scenario.get('type', 'closed')]
+    server = LocalServer(scenario.get('server', 'file_server_threadpool'), scenario.get('server_options'))
+    work_dir = tempfile.mkdtemp(prefix='bench_client_')
+    previous_cwd = os.getcwd()
+    samples = []
+    try:
+        client.server_address = server.start()
+        os.chdir(work_dir)
+        for iteration in range(int(scenario.get('warmup', DEFAULT_WARMUP))):
+            print(f"  [{scenario['name']}] warmup {iteration + 1}")
+            runner(scenario, iteration, work_dir)
+        for iteration in range(int(scenario.get('repeats', DEFAULT_REPEATS))):
+            metrics = runner(scenario, 1000 + iteration, work_dir)
+            samples.append(metrics)
+            print(f"  [{scenario['name']}] run {iteration + 1}: " +
+                  ", ".join(f"{name}={value:.4g}" for name, value in metrics.items() if value is not None))
+    finally:
+        os.chdir(previous_cwd)
+        server.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+    names = sorted({name for metrics in samples for name in metrics})
+    return dict(config=scenario, metrics={name: summarize_values([metrics.get(name) for metrics in samples]) for name in names})
+
+def higher_is_better(metric):
+    return metric.rsplit('.', 1)[-1] in HIGHER_IS_BETTER
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    comparisons = []
+    for name, scenario in results['scenarios'].items():
+        base_scenario = baseline.get('scenarios', {}).get(name)
+        if not base_scenario:
+            continue
+        for metric, summary in scenario['metrics'].items():
+            base = base_scenario['metrics'].get(metric)
+            if not base or base['mean'] is None or summary['mean'] is None:
+                continue
+            if base['mean'] == 0:
+                change = 0.0 if summary['mean'] == 0 else math.inf
+            else:
+                change = (summary['mean'] - base['mean']) / abs(base['mean'])
+            worse = -change if higher_is_better(metric) else change
+            noise = (summary['ci95'] or 0) + (base['ci95'] or 0)
+            regression = worse > threshold and abs(summary['mean'] - base['mean']) > noise
+            comparisons.append(dict(scenario=name, metric=metric, baseline=base['mean'], current=summary['mean'],
+                                    change=change, regression=regression))
+    return comparisons
+
+def print_comparisons(comparisons, threshold):
+    regressions = [c for c in comparisons if c['regression']]
+    print(f"Perbandingan dengan baseline (ambang {threshold * 100:.0f}%): {len(comparisons)} metrik, {len(regressions)} regresi")
+    for c in comparisons:
+        flag = 'REGRESI' if c['regression'] else ''
+        print(f"  {c['scenario']:<28} {c['metric']:<26} {c['baseline']:>12.4g} -> {c['current']:>12.4g} ({c['change'] * 100:+7.1f}%) {flag}")
+    return regressions
+
+def environment_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return dict(python=platform.python_version(), platform=platform.platform(), cpu_count=os.cpu_count(), commit=commit)
+
+def load_config(path):
+    with open(path) as f:
+        config = json.load(f)
+    names = [scenario.get('name') for scenario in config.get('scenarios', [])]
+    if not names or None in names or len(set(names)) != len(names):
+        raise ValueError(f"{path}: every scenario needs a unique name")
+    return config
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark file server dengan skenario dari file konfigurasi")
+    parser.add_argument('config', help="file JSON berisi defaults dan daftar scenarios")
+    parser.add_argument('--output', help="simpan hasil dalam JSON (default bench_results_<waktu>.json)")
+    parser.add_argument('--baseline', help="bandingkan hasil dengan file baseline JSON")
+    parser.add_argument('--save-baseline', action='store_true', help="simpan hasil juga sebagai --baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="ambang regresi relatif (default 0.10)")
+    parser.add_argument('--only', action='append', help="jalankan hanya skenario dengan nama ini (boleh berulang)")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    scenarios = [scenario for scenario in config['scenarios'] if not args.only or scenario['name'] in args.only]
+    results = dict(created=time.strftime('%Y-%m-%dT%H:%M:%S'), environment=environment_info(), scenarios={})
+    for scenario in scenarios:
+        print(f"Skenario {scenario['name']}")
+        results['scenarios'][scenario['name']] = run_scenario(scenario, config.get('defaults', {}))
+
+    output = args.output or f"bench_results_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Hasil disimpan di {output}")
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = print_comparisons(compare_results(results, baseline, args.threshold), args.threshold)
+    if args.baseline and args.save_baseline:
+        shutil.copyfile(output, args.baseline)
+        print(f"Baseline disimpan di {args.baseline}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
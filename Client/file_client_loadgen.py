@@ -0,0 +1,404 @@
+import os
+import math
+import time
+import json
+import uuid
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import file_client_stress_test as client
+
+OPERATIONS = ('list', 'get', 'upload', 'delete')
+SCHEDULES = ('poisson', 'constant')
+DEFAULT_MIX = 'list=20,get=60,upload=15,delete=5'
+DEFAULT_SIZES = 'choice:4k,64k,1M'
+SIZE_UNITS = {'': 1, 'k': 1024, 'm': 1024 * 1024, 'g': 1024 * 1024 * 1024}
+PERCENTILES = (50, 90, 99, 99.9)
+HISTOGRAM_SUB_BUCKET_BITS = 7
+HISTOGRAM_UNIT = 1e-6
+PAYLOAD_SAMPLES = 16
+SEED_FILES = 8
+PAYLOAD_CHUNK_SIZE = 1024 * 1024
+
+_timing = threading.local()
+
+class LatencyHistogram:
+    def __init__(self, sub_bucket_bits=HISTOGRAM_SUB_BUCKET_BITS):
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.half_count = self.sub_bucket_count >> 1
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.half_count + (value >> shift) - self.half_count
+
+    def _highest_value(self, index):
+        if index < self.sub_bucket_count:
+            return index
+        shift = (index - self.sub_bucket_count) // self.half_count + 1
+        sub_bucket = (index - self.sub_bucket_count) % self.half_count + self.half_count
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, seconds):
+        seconds = max(0.0, seconds)
+        index = self._index(int(seconds / HISTOGRAM_UNIT))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def merge(self, other):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100.0 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._highest_value(index) * HISTOGRAM_UNIT, self.max)
+        return self.max
+
+    def summary(self):
+        hasil = dict(count=self.count, mean=self.total / self.count if self.count else None, min=self.min, max=self.max)
+        for q in PERCENTILES:
+            hasil[f"p{q:g}"] = self.percentile(q)
+        return hasil
+
+    def to_dict(self):
+        return dict(sub_bucket_bits=self.sub_bucket_bits, counts=sorted(self.counts.items()),
+                    count=self.count, total=self.total, min=self.min, max=self.max)
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['sub_bucket_bits'])
+        histogram.counts = {int(index): count for index, count in data['counts']}
+        histogram.count = data['count']
+        histogram.total = data['total']
+        histogram.min = data['min']
+        histogram.max = data['max']
+        return histogram
+
+class TimedConnection(client.ServerConnection):
+    def send_command(self, command, *params):
+        super().send_command(command, *params)
+        if command != "HELLO":
+            _timing.sent = True
+
+    def _fill(self):
+        filled = super()._fill()
+        if filled and getattr(_timing, 'sent', False) and getattr(_timing, 'first_byte_at', None) is None:
+            _timing.first_byte_at = time.monotonic()
+        return filled
+
+def parse_size(text):
+    value = str(text).strip().lower()
+    if value.endswith('b'):
+        value = value[:-1]
+    unit = value[-1] if value and value[-1] in SIZE_UNITS else ''
+    try:
+        size = int(float(value[:-1] if unit else value) * SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid size '{text}', expected bytes such as 4k, 512k or 10M")
+    if size < 0:
+        raise ValueError(f"Invalid size '{text}', must not be negative")
+    return size
+
+def parse_size_distribution(spec):
+    kind, _, args = spec.partition(':')
+    values = args.split(':') if args else []
+    if kind == 'fixed' and len(values) == 1:
+        size = parse_size(values[0])
+        return lambda rng: size
+    if kind == 'uniform' and len(values) == 2:
+        low, high = parse_size(values[0]), parse_size(values[1])
+        return lambda rng: rng.randint(min(low, high), max(low, high))
+    if kind == 'lognormal' and len(values) == 2:
+        median, sigma = parse_size(values[0]), float(values[1])
+        return lambda rng: max(1, int(rng.lognormvariate(math.log(max(1, median)), sigma)))
+    if kind == 'choice' and len(values) == 1:
+        sizes = [parse_size(value) for value in values[0].split(',') if value]
+        if sizes:
+            return lambda rng: rng.choice(sizes)
+    raise ValueError(f"Invalid size distribution '{spec}', use fixed:S, uniform:A:B, lognormal:MEDIAN:SIGMA or choice:A,B,C")
+
+def parse_mix(spec):
+    operations, weights = [], []
+    for item in spec.split(','):
+        operation, sep, weight = item.partition('=')
+        operation = operation.strip().lower()
+        if operation not in OPERATIONS or not sep:
+            raise ValueError(f"Invalid mix entry '{item}', expected op=weight with op in {', '.join(OPERATIONS)}")
+        if float(weight) > 0:
+            operations.append(operation)
+            weights.append(float(weight))
+    if not operations:
+        raise ValueError(f"Mix '{spec}' has no operation with positive weight")
+    return operations, weights
+
+def arrival_offsets(rate, duration, schedule, rng):
+    if schedule not in SCHEDULES:
+        raise ValueError(f"Unknown schedule '{schedule}', use {' or '.join(SCHEDULES)}")
+    offset = 0.0
+    while True:
+        offset += rng.expovariate(rate) if schedule == 'poisson' else 1.0 / rate
+        if offset >= duration:
+            return
+        yield offset
+
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    return (host or '127.0.0.1', int(port))
+
+class _Window:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latency = LatencyHistogram()
+
+class LoadGenerator:
+    def __init__(self, address, rate, duration, mix=DEFAULT_MIX, sizes=DEFAULT_SIZES, schedule='poisson',
+                 max_concurrency=256, interval=1.0, seed=None, work_dir=None, prefix='loadgen'):
+        self.address = address
+        self.rate = float(rate)
+        self.duration = float(duration)
+        self.mix = mix
+        self.sizes = sizes
+        self.operations, self.weights = parse_mix(mix)
+        self.size_sampler = parse_size_distribution(sizes)
+        self.schedule = schedule
+        self.max_concurrency = max_concurrency
+        self.interval = interval
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.prefix = f"{prefix}_{uuid.uuid4().hex[:6]}"
+        self.work_dir = work_dir or tempfile.mkdtemp(prefix='loadgen_')
+        self.client = client.FileClient(address, client.ConnectionPool(max_idle_per_address=max_concurrency, connection_class=TimedConnection))
+        self.payloads = []
+        self.seed_files = []
+        self.uploaded = []
+        self._lock = threading.Lock()
+        self._reset_results()
+
+    def _reset_results(self):
+        self.latency = {operation: LatencyHistogram() for operation in OPERATIONS}
+        self.ttfb = {operation: LatencyHistogram() for operation in OPERATIONS}
+        self.service = {operation: LatencyHistogram() for operation in OPERATIONS}
+        self.statuses = {operation: {} for operation in OPERATIONS}
+        self.bytes_transferred = 0
+        self.windows = {}
+        self.outstanding = 0
+        self.max_outstanding = 0
+
+    def prepare(self):
+        payload_dir = os.path.join(self.work_dir, 'payloads')
+        os.makedirs(payload_dir, exist_ok=True)
+        for i in range(PAYLOAD_SAMPLES):
+            size = self.size_sampler(self.rng)
+            path = os.path.join(payload_dir, f"payload_{i}.bin")
+            with open(path, 'wb') as f:
+                remaining = size
+                while remaining > 0:
+                    chunk = min(PAYLOAD_CHUNK_SIZE, remaining)
+                    f.write(os.urandom(chunk))
+                    remaining -= chunk
+            self.payloads.append((path, size))
+        for i in range(SEED_FILES):
+            path, size = self.payloads[i % len(self.payloads)]
+            name = f"{self.prefix}_seed_{i}.bin"
+            status_code, hasil = self.client.upload(path, name)
+            if status_code != client.STATUS_OK:
+                raise RuntimeError(f"Gagal mengunggah file seed {name}: {hasil.get('data') if isinstance(hasil, dict) else hasil}")
+            self.seed_files.append((name, size))
+
+    def _pick_target(self, pop=False):
+        with self._lock:
+            if pop:
+                return self.uploaded.pop(self.rng.randrange(len(self.uploaded))) if self.uploaded else None
+            candidates = self.seed_files + self.uploaded
+            return self.rng.choice(candidates) if candidates else None
+
+    def _perform(self, operation, payload):
+        if operation == 'list':
+            return self.client.list(limit=100), 0
+        if operation == 'get':
+            target = self._pick_target()
+            if target is None:
+                return (client.STATUS_SKIPPED, {'data': 'No remote file to download'}), 0
+            local_path = os.path.join(self.work_dir, 'downloads', f"{threading.get_ident()}.bin")
+            return self.client.download(target[0], local_path), target[1]
+        if operation == 'upload':
+            path, size = payload
+            name = f"{self.prefix}_{uuid.uuid4().hex[:12]}.bin"
+            result = self.client.upload(path, name)
+            if result[0] == client.STATUS_OK:
+                with self._lock:
+                    self.uploaded.append((name, size))
+            return result, size
+        target = self._pick_target(pop=True)
+        if target is None:
+            return (client.STATUS_SKIPPED, {'data': 'No uploaded file left to delete'}), 0
+        return self.client.delete(target[0]), 0
+
+    def _execute(self, operation, payload, scheduled_at, run_started):
+        _timing.sent = False
+        _timing.first_byte_at = None
+        started = time.monotonic()
+        try:
+            (status_code, _), transferred = self._perform(operation, payload)
+        except Exception:
+            status_code, transferred = client.STATUS_FAIL_UNKNOWN_EXCEPTION, 0
+        finished = time.monotonic()
+        first_byte_at = _timing.first_byte_at
+        with self._lock:
+            self.outstanding -= 1
+            self.statuses[operation][status_code] = self.statuses[operation].get(status_code, 0) + 1
+            if status_code == client.STATUS_SKIPPED:
+                return
+            window = self.windows.setdefault(int((scheduled_at - run_started) / self.interval), _Window())
+            window.requests += 1
+            window.latency.record(finished - scheduled_at)
+            if status_code != client.STATUS_OK:
+                window.errors += 1
+                return
+            self.bytes_transferred += transferred
+            self.latency[operation].record(finished - scheduled_at)
+            self.service[operation].record(finished - started)
+            if first_byte_at is not None:
+                self.ttfb[operation].record(first_byte_at - scheduled_at)
+
+    def run(self):
+        self._reset_results()
+        schedule = [(offset, self.rng.choices(self.operations, self.weights)[0], self.rng.choice(self.payloads))
+                    for offset in arrival_offsets(self.rate, self.duration, self.schedule, self.rng)]
+        run_started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="LoadGen") as executor:
+            for offset, operation, payload in schedule:
+                scheduled_at = run_started + offset
+                delay = scheduled_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                with self._lock:
+                    self.outstanding += 1
+                    self.max_outstanding = max(self.max_outstanding, self.outstanding)
+                executor.submit(self._execute, operation, payload, scheduled_at, run_started)
+        return self.report(time.monotonic() - run_started, len(schedule))
+
+    def report(self, elapsed, scheduled):
+        overall = LatencyHistogram()
+        operations = {}
+        completed = errors = 0
+        for operation in OPERATIONS:
+            statuses = self.statuses[operation]
+            if not statuses:
+                continue
+            op_errors = sum(count for status_code, count in statuses.items()
+                            if status_code not in (client.STATUS_OK, client.STATUS_SKIPPED))
+            op_total = sum(count for status_code, count in statuses.items() if status_code != client.STATUS_SKIPPED)
+            completed += op_total
+            errors += op_errors
+            overall.merge(self.latency[operation])
+            operations[operation] = dict(requests=op_total, errors=op_errors,
+                                         error_rate=op_errors / op_total if op_total else 0.0,
+                                         statuses=dict(statuses),
+                                         latency=self.latency[operation].summary(),
+                                         ttfb=self.ttfb[operation].summary(),
+                                         service=self.service[operation].summary())
+        timeline = []
+        for index in sorted(self.windows):
+            window = self.windows[index]
+            timeline.append(dict(start=index * self.interval, requests=window.requests, errors=window.errors,
+                                 error_rate=window.errors / window.requests if window.requests else 0.0,
+                                 p99=window.latency.percentile(99)))
+        return dict(config=dict(address=f"{self.address[0]}:{self.address[1]}", rate=self.rate, duration=self.duration,
+                                schedule=self.schedule, mix=self.mix, sizes=self.sizes,
+                                max_concurrency=self.max_concurrency, seed=self.seed),
+                    elapsed=elapsed, scheduled=scheduled, completed=completed, errors=errors,
+                    error_rate=errors / completed if completed else 0.0,
+                    throughput=completed / elapsed if elapsed else 0.0,
+                    mbps=self.bytes_transferred / (1024 * 1024) / elapsed if elapsed else 0.0,
+                    max_outstanding=self.max_outstanding,
+                    latency=overall.summary(), operations=operations, timeline=timeline)
+
+    def cleanup(self):
+        for name, _ in self.seed_files + self.uploaded:
+            self.client.delete(name)
+        self.seed_files, self.uploaded = [], []
+        self.client.close()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+def _ms(seconds):
+    return f"{seconds * 1000:9.2f}" if seconds is not None else f"{'-':>9}"
+
+def print_report(report):
+    config = report['config']
+    print(f"Open-loop {config['schedule']} {config['rate']:g} req/s selama {config['duration']:g}s ke {config['address']} (mix {config['mix']}, ukuran {config['sizes']})")
+    print(f"  Selesai {report['completed']}/{report['scheduled']} request dalam {report['elapsed']:.2f}s, "
+          f"{report['throughput']:.1f} req/s, {report['mbps']:.2f} MB/s, error {report['error_rate'] * 100:.2f}%, "
+          f"outstanding maks {report['max_outstanding']}")
+    header = f"  {'operasi':<8} {'req':>6} {'err%':>6}  {'metrik':<8}" + ''.join(f"{f'p{q:g} ms':>10}" for q in PERCENTILES) + f"{'max ms':>10}"
+    print(header)
+    for operation, stats in report['operations'].items():
+        for label, key in (('latency', 'latency'), ('ttfb', 'ttfb')):
+            summary = stats[key]
+            prefix = f"  {operation:<8} {stats['requests']:>6} {stats['error_rate'] * 100:>6.2f}" if key == 'latency' else f"  {'':<8} {'':>6} {'':>6}"
+            print(f"{prefix}  {label:<8}" + ''.join(f" {_ms(summary[f'p{q:g}'])}" for q in PERCENTILES) + f" {_ms(summary['max'])}")
+    print("  Error rate per interval:")
+    for window in report['timeline']:
+        print(f"    t={window['start']:6.1f}s  req {window['requests']:5d}  err {window['errors']:4d} ({window['error_rate'] * 100:5.1f}%)  p99 {_ms(window['p99'])} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load generator untuk file server")
+    parser.add_argument('--server', default=f"{client.server_address[0]}:{client.server_address[1]}", help="host:port server")
+    parser.add_argument('--rate', type=float, default=20.0, help="target request per detik")
+    parser.add_argument('--duration', type=float, default=30.0, help="lama pengujian dalam detik")
+    parser.add_argument('--schedule', choices=SCHEDULES, default='poisson')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="bobot operasi, contoh list=20,get=60,upload=15,delete=5")
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help="distribusi ukuran upload: fixed:S, uniform:A:B, lognormal:MEDIAN:SIGMA, choice:A,B,C")
+    parser.add_argument('--concurrency', type=int, default=256, help="jumlah maksimum request yang berjalan bersamaan")
+    parser.add_argument('--interval', type=float, default=1.0, help="lebar interval untuk error rate per waktu (detik)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--protocol', type=int, choices=(client.PROTOCOL_V1, client.PROTOCOL_V2), default=client.preferred_protocol)
+    parser.add_argument('--busy-retries', type=int, default=None, help="jumlah retry saat server BUSY (default mengikuti client)")
+    parser.add_argument('--json', dest='json_path', help="simpan laporan lengkap dalam format JSON")
+    args = parser.parse_args()
+
+    client.server_address = parse_address(args.server)
+    client.preferred_protocol = args.protocol
+    if args.busy_retries is not None:
+        client.BUSY_MAX_RETRIES = args.busy_retries
+    generator = LoadGenerator(client.server_address, args.rate, args.duration, args.mix, args.sizes, args.schedule,
+                              args.concurrency, args.interval, args.seed)
+    try:
+        generator.prepare()
+        report = generator.run()
+    finally:
+        generator.cleanup()
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -3,17 +3,75 @@ import json
 import os
 import time
 import threading
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import uuid
 import csv
+import struct
+import queue
+import hashlib
+import zlib
+import random
+import argparse
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
 
 server_address = ('127.0.0.1', 8889)
 
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+preferred_protocol = PROTOCOL_V2
+_server_protocols = {}
+
+FRAME_MAGIC = 0xF2
+FRAME_HEADER = struct.Struct('!BBBHQ')
+PARAM_COUNT = struct.Struct('!H')
+PARAM_LEN = struct.Struct('!H')
+OP_COMMAND = 0x00
+OP_RESPONSE = 0x7F
+COMMAND_OPCODES = {
+    'LIST': 0x01,
+    'DELETE': 0x02,
+    'MDELETE': 0x03,
+    'UPLOAD_INITIATE': 0x10,
+    'UPLOAD_FINALIZE': 0x11,
+    'UPLOAD_ABORT': 0x12,
+    'UPLOAD_SESSION_CREATE': 0x13,
+    'UPLOAD_PART': 0x14,
+    'UPLOAD_SESSION_STATUS': 0x15,
+    'UPLOAD_SESSION_COMPLETE': 0x16,
+    'GET_STREAM_INITIATE': 0x20,
+    'MGET': 0x21,
+}
+MGET_HEADER = struct.Struct('!HQI')
+BATCH_REQUEST_NAMES = 256
+
+CHECKSUM_VERIFY_ORDER = ('crc32', 'blake2b', 'sha256')
+
+CODEC_PREFERENCE = ('zstd', 'lz4', 'zlib')
+COMPRESSION_BLOCK_SIZE = 1024 * 1024
+COMPRESSION_SAMPLE_SIZE = 64 * 1024
+COMPRESSION_MAX_RATIO = 0.9
+BLOCK_HEADER = struct.Struct('!I')
+BLOCK_RAW_FLAG = 0x80000000
+
+BUSY_MAX_RETRIES = 5
+BUSY_DEFAULT_RETRY_AFTER = 0.5
+BUSY_MAX_BACKOFF = 10.0
+
 STATUS_OK = "OK"
 STATUS_FAIL_CLIENT_PRECONDITION = "FAIL_CLIENT_PRECONDITION"
 STATUS_FAIL_CONNECTION_REFUSED = "FAIL_CONNECTION_REFUSED"
 STATUS_FAIL_CONNECTION_TIMEOUT_CONNECT = "FAIL_CONNECTION_TIMEOUT_CONNECT"
 STATUS_FAIL_SERVER_RESPONSE_ERROR = "FAIL_SERVER_RESPONSE_ERROR"
+STATUS_FAIL_SERVER_BUSY = "FAIL_SERVER_BUSY"
 STATUS_FAIL_SERVER_PROTOCOL = "FAIL_SERVER_PROTOCOL"
 STATUS_FAIL_SOCKET_TIMEOUT_OPERATION = "FAIL_SOCKET_TIMEOUT_OPERATION"
 STATUS_FAIL_CONNECTION_RESET_OPERATION = "FAIL_CONNECTION_RESET_OPERATION"
@@ -25,182 +83,829 @@ STATUS_SKIPPED = "SKIPPED"
 def is_server_attributed_failure(status_code):
     return status_code in [
         STATUS_FAIL_SERVER_RESPONSE_ERROR,
+        STATUS_FAIL_SERVER_BUSY,
         STATUS_FAIL_SERVER_PROTOCOL,
         STATUS_FAIL_SOCKET_TIMEOUT_OPERATION,
         STATUS_FAIL_CONNECTION_RESET_OPERATION
     ]
 
-def receive_json_response(sock):
-    buffer = ""
-    try:
+def encode_command(protocol, command, *params):
+    if protocol == PROTOCOL_V2:
+        opcode = COMMAND_OPCODES.get(command.upper(), OP_COMMAND)
+        if opcode == OP_COMMAND:
+            params = (command,) + params
+        parts = [PARAM_COUNT.pack(len(params))]
+        for param in params:
+            encoded = str(param).encode('utf-8')
+            parts.append(PARAM_LEN.pack(len(encoded)))
+            parts.append(encoded)
+        header = b''.join(parts)
+        return FRAME_HEADER.pack(FRAME_MAGIC, opcode, 0, len(header), 0) + header
+    return (" ".join([command] + [str(p) for p in params]) + "\r\n\r\n").encode()
+
+class ServerBusy(Exception):
+    def __init__(self, response):
+        super().__init__(response.get('data', 'Server busy'))
+        self.response = response
+
+def busy_backoff(hasil, attempt):
+    retry_after = hasil.get('retry_after') if isinstance(hasil, dict) else None
+    delay = float(retry_after or BUSY_DEFAULT_RETRY_AFTER) * (2 ** attempt)
+    return min(BUSY_MAX_BACKOFF, delay * random.uniform(0.5, 1.5))
+
+def retry_when_busy(call, max_retries=None):
+    max_retries = BUSY_MAX_RETRIES if max_retries is None else max_retries
+    for attempt in range(max_retries + 1):
+        status_code, hasil = call()
+        if status_code != STATUS_FAIL_SERVER_BUSY or attempt == max_retries:
+            return status_code, hasil
+        time.sleep(busy_backoff(hasil, attempt))
+
+class ServerConnection:
+    def __init__(self, address, timeout=300):
+        self.address = address
+        self.protocol = PROTOCOL_V1
+        self.hello_pending = False
+        self.buffer = bytearray()
+        self.scan_from = 0
+        self.broken = False
+        self.last_used = time.monotonic()
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            self.sock.settimeout(timeout)
+            self.sock.connect(address)
+        except Exception:
+            self.sock.close()
+            raise
+
+    def negotiate(self):
+        if preferred_protocol < PROTOCOL_V2 or _server_protocols.get(self.address) == PROTOCOL_V1:
+            return self.protocol
+        self.send_command("HELLO", PROTOCOL_V2)
+        if _server_protocols.get(self.address) == PROTOCOL_V2:
+            self.protocol = PROTOCOL_V2
+            self.hello_pending = True
+            return self.protocol
+        status_code, response = self.read_response()
+        if status_code == STATUS_FAIL_SERVER_BUSY:
+            self.close()
+            raise ServerBusy(response)
+        if status_code not in (STATUS_OK, STATUS_FAIL_SERVER_RESPONSE_ERROR):
+            self.broken = True
+            return self.protocol
+        self.protocol = PROTOCOL_V2 if status_code == STATUS_OK and response.get('protocol') == PROTOCOL_V2 else PROTOCOL_V1
+        _server_protocols[self.address] = self.protocol
+        return self.protocol
+
+    def _finish_hello(self):
+        self.hello_pending = False
+        self.protocol = PROTOCOL_V1
+        status_code, response = self.read_response()
+        if status_code == STATUS_OK and response.get('protocol') == PROTOCOL_V2:
+            self.protocol = PROTOCOL_V2
+            return None
+        self.broken = True
+        if status_code in (STATUS_OK, STATUS_FAIL_SERVER_RESPONSE_ERROR):
+            _server_protocols.pop(self.address, None)
+            return STATUS_FAIL_SERVER_PROTOCOL, {'data': 'Server no longer accepts protocol v2'}
+        return status_code, response
+
+    def send_command(self, command, *params):
+        self.sock.sendall(encode_command(self.protocol, command, *params))
+
+    def sendall(self, data):
+        self.sock.sendall(data)
+
+    def _fill(self):
+        chunk = self.sock.recv(65536)
+        if not chunk:
+            return False
+        self.buffer += chunk
+        return True
+
+    def _read_frame(self):
+        while len(self.buffer) < FRAME_HEADER.size:
+            if not self._fill(): return None
+        magic, opcode, flags, header_len, body_len = FRAME_HEADER.unpack_from(self.buffer, 0)
+        if magic != FRAME_MAGIC or opcode != OP_RESPONSE or body_len:
+            raise ValueError('Unexpected frame from server')
+        frame_len = FRAME_HEADER.size + header_len
+        while len(self.buffer) < frame_len:
+            if not self._fill(): return None
+        header = bytes(self.buffer[FRAME_HEADER.size:frame_len])
+        del self.buffer[:frame_len]
+        return header
+
+    def _read_text(self):
         while True:
-            data = sock.recv(4096)
-            if not data:
+            end = self.buffer.find(b"\r\n\r\n", self.scan_from)
+            if end >= 0:
+                response = bytes(self.buffer[:end])
+                del self.buffer[:end + 4]
+                self.scan_from = 0
+                return response
+            self.scan_from = max(0, len(self.buffer) - 3)
+            if not self._fill(): return None
+
+    def read_response(self):
+        if self.hello_pending:
+            failed = self._finish_hello()
+            if failed:
+                return failed
+        try:
+            raw_response = self._read_frame() if self.protocol == PROTOCOL_V2 else self._read_text()
+            if raw_response is None:
+                self.broken = True
                 return STATUS_NO_RESPONSE, {'data': 'No data from server or connection closed'}
-            buffer += data.decode('utf-8', errors='ignore')
-            if "\r\n\r\n" in buffer:
-                json_response_str, _, _ = buffer.partition("\r\n\r\n")
-                hasil = json.loads(json_response_str)
-                if isinstance(hasil, dict) and hasil.get('status') == 'ERROR':
-                    return STATUS_FAIL_SERVER_RESPONSE_ERROR, hasil
-                return STATUS_OK, hasil
-    except json.JSONDecodeError as je:
-        return STATUS_FAIL_SERVER_PROTOCOL, {'data': f'JSON decoding error: {str(je)}'}
-    except socket.timeout:
-        return STATUS_FAIL_SOCKET_TIMEOUT_OPERATION, {'data': 'Timeout receiving server JSON response'}
-    except ConnectionResetError:
-        return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': 'Connection reset by server receiving JSON response'}
-    except Exception as e:
-        return STATUS_FAIL_UNKNOWN_EXCEPTION, {'data': f'Generic error in receive_json_response: {str(e)}'}
+            hasil = json.loads(raw_response.decode('utf-8', errors='ignore'))
+            self.last_used = time.monotonic()
+            if isinstance(hasil, dict) and hasil.get('status') == 'ERROR':
+                return STATUS_FAIL_SERVER_RESPONSE_ERROR, hasil
+            if isinstance(hasil, dict) and hasil.get('status') == 'BUSY':
+                if hasil.get('scope') == 'connection':
+                    self.broken = True
+                return STATUS_FAIL_SERVER_BUSY, hasil
+            return STATUS_OK, hasil
+        except json.JSONDecodeError as je:
+            self.broken = True
+            return STATUS_FAIL_SERVER_PROTOCOL, {'data': f'JSON decoding error: {str(je)}'}
+        except ValueError as ve:
+            self.broken = True
+            return STATUS_FAIL_SERVER_PROTOCOL, {'data': str(ve)}
+        except socket.timeout:
+            self.broken = True
+            return STATUS_FAIL_SOCKET_TIMEOUT_OPERATION, {'data': 'Timeout receiving server JSON response'}
+        except ConnectionResetError:
+            self.broken = True
+            return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': 'Connection reset by server receiving JSON response'}
+        except Exception as e:
+            self.broken = True
+            return STATUS_FAIL_UNKNOWN_EXCEPTION, {'data': f'Generic error in read_response: {str(e)}'}
 
-def send_command_and_get_response(command_str=""):
-    global server_address
-    sock = None
+    def recv_exact(self, size):
+        while len(self.buffer) < size:
+            if not self._fill():
+                self.broken = True
+                return None
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self.last_used = time.monotonic()
+        return data
+
+    def sendfile(self, f, offset, count):
+        return self.sock.sendfile(f, offset, count)
+
+    def recv_to_file(self, f, size, chunk_size=65536, write_offset=None, checksum=None):
+        def write(data, received):
+            if checksum is not None:
+                checksum.update(data)
+            if write_offset is None:
+                f.write(data)
+            else:
+                os.pwrite(f.fileno(), data, write_offset + received)
+        bytes_received = 0
+        if self.buffer:
+            leftover = min(size, len(self.buffer))
+            write(self.buffer[:leftover], 0)
+            del self.buffer[:leftover]
+            bytes_received += leftover
+        while bytes_received < size:
+            chunk = self.sock.recv(min(chunk_size, size - bytes_received))
+            if not chunk:
+                self.broken = True
+                break
+            write(chunk, bytes_received)
+            bytes_received += len(chunk)
+        self.last_used = time.monotonic()
+        return bytes_received
+
+    def close(self):
+        try: self.sock.close()
+        except Exception: pass
+
+def open_connection(address=None, timeout=300, connection_class=ServerConnection):
+    conn = connection_class(address or server_address, timeout)
+    conn.negotiate()
+    return conn
+
+def _request_on_connection(conn, command, *params):
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(20)
-        sock.connect(server_address)
-        command_to_send = command_str + "\r\n\r\n"
-        sock.sendall(command_to_send.encode())
-        status_code, response_data = receive_json_response(sock)
-        if status_code == STATUS_OK and isinstance(response_data, dict) and response_data.get('status') == 'ERROR':
-            return STATUS_FAIL_SERVER_RESPONSE_ERROR, response_data
-        return status_code, response_data
-    except ConnectionRefusedError:
-        return STATUS_FAIL_CONNECTION_REFUSED, {'data': 'Connection refused'}
+        conn.send_command(command, *params)
     except socket.timeout:
-        return STATUS_FAIL_CONNECTION_TIMEOUT_CONNECT, {'data': 'Connection attempt timed out'}
-    except Exception as e:
-        return STATUS_FAIL_UNKNOWN_EXCEPTION, {'data': str(e)}
-    finally:
-        if sock:
-            sock.close()
+        conn.broken = True
+        return STATUS_FAIL_SOCKET_TIMEOUT_OPERATION, {'data': 'Timeout sending command'}
+    except socket.error as se:
+        conn.broken = True
+        return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': f'Socket error sending command: {str(se)}'}
+    return conn.read_response()
 
-def remote_list():
-    command_str = "LIST"
-    status_code, hasil = send_command_and_get_response(command_str)
-    if status_code == STATUS_OK and isinstance(hasil, dict) and hasil.get('status') == 'OK':
-        print("Daftar file : ")
-        if hasil.get('data'):
-            for nmfile in hasil['data']:
-                print(f"- {nmfile}")
-        else:
-            print("Tidak ada file.")
-        return True
+class Crc32:
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return f"{self.value:08x}"
+
+def new_hasher(algorithm):
+    return Crc32() if algorithm == 'crc32' else hashlib.new(algorithm)
+
+def available_codecs():
+    available = {'zlib': True, 'zstd': zstandard is not None, 'lz4': lz4_frame is not None}
+    return [codec for codec in CODEC_PREFERENCE if available[codec]]
+
+def encode_block(codec, data):
+    if codec == 'zstd':
+        compressed = zstandard.ZstdCompressor(level=3).compress(data)
+    elif codec == 'lz4':
+        compressed = lz4_frame.compress(data)
     else:
-        error_message = hasil.get('data', 'Operasi gagal') if isinstance(hasil, dict) else 'Operasi gagal (respons tidak valid)'
-        print(f"Gagal menampilkan daftar file: {error_message} (Status: {status_code})")
-        return False
+        compressed = zlib.compress(data, 1)
+    if len(compressed) >= len(data):
+        return BLOCK_HEADER.pack(len(data) | BLOCK_RAW_FLAG) + data
+    return BLOCK_HEADER.pack(len(compressed)) + compressed
 
-def remote_upload_stream(local_filepath, remote_filename=None):
-    global server_address
-    if not local_filepath or not os.path.exists(local_filepath):
-        return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'Local file invalid or not found'}
+def decode_block(codec, data):
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=COMPRESSION_BLOCK_SIZE)
+    if codec == 'lz4':
+        return lz4_frame.decompress(data)
+    return zlib.decompress(data)
 
-    if remote_filename is None:
-        remote_filename = os.path.basename(local_filepath)
+class DecodingWriter:
+    def __init__(self, f, codec, checksum=None):
+        self.f = f
+        self.codec = codec
+        self.checksum = checksum
+        self.pending = bytearray()
+        self.raw_size = 0
 
-    file_size = os.path.getsize(local_filepath)
-    sock = None
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(300)
-        sock.connect(server_address)
+    def write(self, data):
+        self.pending += data
+        while len(self.pending) >= BLOCK_HEADER.size:
+            (header,) = BLOCK_HEADER.unpack_from(self.pending, 0)
+            block_len = header & ~BLOCK_RAW_FLAG
+            if len(self.pending) < BLOCK_HEADER.size + block_len:
+                break
+            block = bytes(self.pending[BLOCK_HEADER.size:BLOCK_HEADER.size + block_len])
+            del self.pending[:BLOCK_HEADER.size + block_len]
+            raw = block if header & BLOCK_RAW_FLAG else decode_block(self.codec, block)
+            if self.checksum is not None:
+                self.checksum.update(raw)
+            self.f.write(raw)
+            self.raw_size += len(raw)
+
+def worth_compressing(local_filepath):
+    size = os.path.getsize(local_filepath)
+    if size < COMPRESSION_SAMPLE_SIZE:
+        return size > 0
+    sampled = compressed = 0
+    with open(local_filepath, 'rb') as f:
+        for offset in (0, size // 2, max(0, size - COMPRESSION_SAMPLE_SIZE)):
+            f.seek(offset)
+            sample = f.read(COMPRESSION_SAMPLE_SIZE)
+            sampled += len(sample)
+            compressed += len(zlib.compress(sample, 1))
+    return compressed / max(sampled, 1) <= COMPRESSION_MAX_RATIO
 
-        init_command = f"UPLOAD_INITIATE {remote_filename} {file_size}\r\n\r\n"
-        sock.sendall(init_command.encode())
-        status_code_init, init_response = receive_json_response(sock)
+def compress_options(compress):
+    if not compress:
+        return []
+    codecs = available_codecs() if compress is True else list(compress)
+    return [f"compress={','.join(codecs)}"]
+
+def local_sha256(local_filepath, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(local_filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _upload_on_connection(conn, local_filepath, remote_filename, file_size, sha256=None, compress=None):
+    try:
+        options = ([f"sha256={sha256}"] if sha256 else []) + compress_options(compress)
+        status_code_init, init_response = _request_on_connection(conn, "UPLOAD_INITIATE", remote_filename, file_size, *options)
 
         if status_code_init != STATUS_OK: return status_code_init, init_response
+        if isinstance(init_response, dict) and init_response.get('status') == 'OK' and init_response.get('deduplicated'):
+            return STATUS_OK, init_response
         if not isinstance(init_response, dict) or init_response.get('status') != 'READY_FOR_DATA':
+            conn.broken = True
             return STATUS_FAIL_SERVER_PROTOCOL, init_response
         file_id = init_response.get('file_id')
         if not file_id:
+            conn.broken = True
             return STATUS_FAIL_SERVER_PROTOCOL, {'data': 'Server READY_FOR_DATA but no file_id'}
 
         bytes_sent = 0
-        chunk_size = 65536
+        encoding = init_response.get('encoding')
+        chunk_size = COMPRESSION_BLOCK_SIZE if encoding else 65536
+        digest = hashlib.sha256() if not sha256 else None
         with open(local_filepath, 'rb') as f:
             while True:
                 chunk = f.read(chunk_size)
                 if not chunk: break
-                sock.sendall(chunk)
+                if digest: digest.update(chunk)
+                conn.sendall(encode_block(encoding, chunk) if encoding else chunk)
                 bytes_sent += len(chunk)
         
         if bytes_sent != file_size:
+            conn.broken = True
             return STATUS_FAIL_DATA_INTEGRITY, {'data': f'Sent {bytes_sent} but expected {file_size}'}
 
-        finalize_command = f"UPLOAD_FINALIZE {file_id}\r\n\r\n"
-        sock.sendall(finalize_command.encode())
-        status_code_final, final_response = receive_json_response(sock)
+        finalize_options = [f"sha256={digest.hexdigest()}"] if digest else []
+        status_code_final, final_response = _request_on_connection(conn, "UPLOAD_FINALIZE", file_id, *finalize_options)
 
         if status_code_final == STATUS_OK and isinstance(final_response, dict) and final_response.get('status') == 'OK':
             return STATUS_OK, final_response
         else:
             err_data = final_response if isinstance(final_response, dict) else {'data': 'Invalid finalize response'}
             return status_code_final if status_code_final != STATUS_OK else STATUS_FAIL_SERVER_RESPONSE_ERROR, err_data
-    except ConnectionRefusedError: return STATUS_FAIL_CONNECTION_REFUSED, {'data': 'Connection refused'}
-    except socket.timeout: return STATUS_FAIL_SOCKET_TIMEOUT_OPERATION, {'data': 'Timeout during upload operation'}
-    except ConnectionResetError: return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': 'Connection reset during upload'}
+    except socket.timeout:
+        conn.broken = True
+        return STATUS_FAIL_SOCKET_TIMEOUT_OPERATION, {'data': 'Timeout during upload operation'}
+    except ConnectionResetError:
+        conn.broken = True
+        return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': 'Connection reset during upload'}
     except socket.error as se:
+        conn.broken = True
         return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': f'Socket error during data send: {str(se)}'}
     except Exception as e:
+        conn.broken = True
         return STATUS_FAIL_UNKNOWN_EXCEPTION, {'data': str(e)}
-    finally:
-        if sock: sock.close()
 
-def remote_get_stream(remote_filename, local_save_path=None):
-    global server_address
-    if not remote_filename:
-        return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'Remote filename is empty'}
-    if local_save_path is None:
-        local_save_path = "downloaded_" + os.path.basename(remote_filename)
-    local_dir = os.path.dirname(local_save_path)
-    if local_dir and not os.path.exists(local_dir):
-        try: os.makedirs(local_dir)
-        except OSError as e: return STATUS_FAIL_CLIENT_PRECONDITION, {'data': f'Cannot create local dir {local_dir}: {e}'}
-
-    sock = None
+def _download_on_connection(conn, remote_filename, local_save_path, offset=0, length=None, verify=True, compress=None):
+    range_params = [offset] + ([length] if length is not None else []) if offset or length is not None else []
     try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(300)
-        sock.connect(server_address)
-
-        init_command = f"GET_STREAM_INITIATE {remote_filename}\r\n\r\n"
-        sock.sendall(init_command.encode())
-        status_code_init, init_response = receive_json_response(sock)
+        options = compress_options(compress) if not range_params else []
+        status_code_init, init_response = _request_on_connection(conn, "GET_STREAM_INITIATE", remote_filename, *range_params, *options)
 
         if status_code_init != STATUS_OK: return status_code_init, init_response
         if not isinstance(init_response, dict) or init_response.get('status') != 'READY_TO_SEND_DATA':
+            conn.broken = True
             return STATUS_FAIL_SERVER_PROTOCOL, init_response
         expected_size = init_response.get('expected_size')
-        if expected_size is None: return STATUS_FAIL_SERVER_PROTOCOL, {'data': 'Server no expected_size'}
+        if expected_size is None:
+            conn.broken = True
+            return STATUS_FAIL_SERVER_PROTOCOL, {'data': 'Server no expected_size'}
         expected_size = int(expected_size)
 
-        bytes_received = 0
-        chunk_size = 65536
-        with open(local_save_path, 'wb') as f:
-            while bytes_received < expected_size:
-                bytes_to_read_now = min(chunk_size, expected_size - bytes_received)
-                if bytes_to_read_now <= 0: break
-                chunk = sock.recv(bytes_to_read_now)
-                if not chunk:
-                    return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': 'Connection closed by server prematurely during download'}
-                f.write(chunk)
-                bytes_received += len(chunk)
-        
+        checksums = init_response.get('checksums') or {}
+        algorithm = next((a for a in CHECKSUM_VERIFY_ORDER if a in checksums), None) if verify and not range_params else None
+        checksum = new_hasher(algorithm) if algorithm else None
+        if range_params:
+            with open(local_save_path, 'r+b') as f:
+                bytes_received = conn.recv_to_file(f, expected_size, write_offset=int(init_response.get('offset', offset)))
+        elif init_response.get('encoding'):
+            with open(local_save_path, 'wb') as f:
+                writer = DecodingWriter(f, init_response['encoding'], checksum)
+                bytes_received = conn.recv_to_file(writer, expected_size)
+            if not conn.broken and writer.raw_size != init_response.get('file_size'):
+                return STATUS_FAIL_DATA_INTEGRITY, {'data': f"Decoded {writer.raw_size} bytes but expected {init_response.get('file_size')}"}
+        else:
+            with open(local_save_path, 'wb') as f:
+                bytes_received = conn.recv_to_file(f, expected_size, checksum=checksum)
+        if conn.broken:
+            return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': 'Connection closed by server prematurely during download'}
         if bytes_received != expected_size:
             return STATUS_FAIL_DATA_INTEGRITY, {'data': f'Received {bytes_received} but expected {expected_size}'}
+        if checksum and checksum.hexdigest() != checksums[algorithm]:
+            return STATUS_FAIL_DATA_INTEGRITY, {'data': f'{algorithm} mismatch for {remote_filename}: expected {checksums[algorithm]}, got {checksum.hexdigest()}'}
         return STATUS_OK, {'data': f'File {remote_filename} downloaded to {local_save_path}'}
-    except ConnectionRefusedError: return STATUS_FAIL_CONNECTION_REFUSED, {'data': 'Connection refused'}
-    except socket.timeout: return STATUS_FAIL_SOCKET_TIMEOUT_OPERATION, {'data': 'Timeout during download operation'}
-    except ConnectionResetError: return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': 'Connection reset during download'}
+    except socket.timeout:
+        conn.broken = True
+        return STATUS_FAIL_SOCKET_TIMEOUT_OPERATION, {'data': 'Timeout during download operation'}
+    except ConnectionResetError:
+        conn.broken = True
+        return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': 'Connection reset during download'}
     except socket.error as se:
+        conn.broken = True
         return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': f'Socket error during data recv: {str(se)}'}
+    except Exception as e:
+        conn.broken = True
+        return STATUS_FAIL_UNKNOWN_EXCEPTION, {'data': str(e)}
+
+def _receive_bundle(conn, bundle_size, local_dir, saved, errors):
+    remaining = bundle_size
+    while remaining > 0:
+        header = conn.recv_exact(MGET_HEADER.size)
+        if header is None:
+            break
+        name_len, size, crc = MGET_HEADER.unpack(header)
+        encoded_name = conn.recv_exact(name_len)
+        if encoded_name is None:
+            break
+        name = encoded_name.decode('utf-8')
+        checksum = Crc32()
+        with open(os.path.join(local_dir, os.path.basename(name)), 'wb') as f:
+            received = conn.recv_to_file(f, size, checksum=checksum)
+        remaining -= MGET_HEADER.size + name_len + received
+        if received != size:
+            break
+        if checksum.value != crc:
+            try: os.remove(os.path.join(local_dir, os.path.basename(name)))
+            except OSError: pass
+            errors.append({'name': name, 'data': f'crc32 mismatch: expected {crc:08x}, got {checksum.hexdigest()}'})
+            continue
+        saved.append(name)
+    return remaining == 0 and not conn.broken
+
+def _mget_on_connection(conn, names, local_dir):
+    saved, errors, deferred = [], [], []
+    more = False
+    pending = list(names)
+    try:
+        while pending:
+            batch, pending = pending[:BATCH_REQUEST_NAMES], pending[BATCH_REQUEST_NAMES:]
+            status_code, hasil = _request_on_connection(conn, "MGET", *batch)
+            if status_code != STATUS_OK:
+                return status_code, hasil
+            if not isinstance(hasil, dict) or hasil.get('status') != 'OK' or 'expected_size' not in hasil:
+                conn.broken = True
+                return STATUS_FAIL_SERVER_PROTOCOL, hasil
+            if not _receive_bundle(conn, int(hasil['expected_size']), local_dir, saved, errors):
+                return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': 'Connection closed by server prematurely during MGET', 'files': saved}
+            errors.extend(hasil.get('errors') or [])
+            deferred.extend(hasil.get('deferred') or [])
+            more = more or bool(hasil.get('more'))
+            pending = (hasil.get('remaining') or []) + pending
+        for name in deferred:
+            status_code, hasil = _download_on_connection(conn, name, os.path.join(local_dir, os.path.basename(name)))
+            if status_code == STATUS_OK:
+                saved.append(name)
+            else:
+                errors.append({'name': name, 'data': hasil.get('data') if isinstance(hasil, dict) else status_code})
+                if conn.broken:
+                    return status_code, hasil
+    except socket.timeout:
+        conn.broken = True
+        return STATUS_FAIL_SOCKET_TIMEOUT_OPERATION, {'data': 'Timeout during MGET'}
+    except socket.error as se:
+        conn.broken = True
+        return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': f'Socket error during MGET: {str(se)}'}
+    except Exception as e:
+        conn.broken = True
+        return STATUS_FAIL_UNKNOWN_EXCEPTION, {'data': str(e)}
+    return STATUS_OK, {'status': 'OK', 'data': f'{len(saved)} file(s) downloaded to {local_dir}',
+                       'files': saved, 'errors': errors, 'more': more}
+
+def _mdelete_on_connection(conn, patterns):
+    results = []
+    more = False
+    for start in range(0, len(patterns), BATCH_REQUEST_NAMES):
+        status_code, hasil = _request_on_connection(conn, "MDELETE", *patterns[start:start + BATCH_REQUEST_NAMES])
+        if status_code != STATUS_OK or not isinstance(hasil, dict) or hasil.get('status') != 'OK':
+            return _result_status(status_code, hasil, 'Invalid mdelete response')
+        results.extend(hasil.get('results') or [])
+        more = more or bool(hasil.get('more'))
+    deleted = sum(1 for r in results if r.get('status') == 'OK')
+    return STATUS_OK, {'status': 'OK', 'data': f'{deleted} file(s) deleted, {len(results) - deleted} failed',
+                       'deleted': deleted, 'failed': len(results) - deleted, 'results': results, 'more': more}
+
+def _prepare_mget_dir(local_dir):
+    local_dir = local_dir or '.'
+    os.makedirs(local_dir, exist_ok=True)
+    return local_dir
+
+def _prepare_download_path(remote_filename, local_save_path):
+    if local_save_path is None:
+        local_save_path = "downloaded_" + os.path.basename(remote_filename)
+    local_dir = os.path.dirname(local_save_path)
+    if local_dir and not os.path.exists(local_dir):
+        os.makedirs(local_dir)
+    return local_save_path
+
+def _result_status(status_code, hasil, default_error):
+    if status_code == STATUS_OK and isinstance(hasil, dict) and hasil.get('status') == 'OK':
+        return STATUS_OK, hasil
+    err_data = hasil if isinstance(hasil, dict) else {'data': default_error}
+    return status_code if status_code != STATUS_OK else STATUS_FAIL_SERVER_RESPONSE_ERROR, err_data
+
+class ConnectionPool:
+    def __init__(self, max_idle_per_address=4, idle_timeout=60, timeout=300, connection_class=ServerConnection):
+        self.max_idle_per_address = max_idle_per_address
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.connection_class = connection_class
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, address):
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(address, [])
+            while idle:
+                conn = idle.pop()
+                if now - conn.last_used < self.idle_timeout:
+                    return conn, True
+                conn.close()
+        return self.connect(address), False
+
+    def connect(self, address):
+        return open_connection(address, self.timeout, self.connection_class)
+
+    def release(self, conn):
+        if conn.broken:
+            conn.close()
+            return
+        with self._lock:
+            idle = self._idle.setdefault(conn.address, [])
+            if len(idle) < self.max_idle_per_address:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            idle_lists = list(self._idle.values())
+            self._idle = {}
+        for idle in idle_lists:
+            for conn in idle:
+                conn.close()
+
+class FileClient:
+    def __init__(self, address=None, pool=None):
+        self.address = address or server_address
+        self.pool = pool or ConnectionPool()
+
+    def _with_connection(self, operation):
+        conn, reused = self.pool.acquire(self.address)
+        try:
+            result = operation(conn)
+            if reused and result[0] in (STATUS_NO_RESPONSE, STATUS_FAIL_CONNECTION_RESET_OPERATION):
+                conn.broken = True
+                self.pool.release(conn)
+                conn = self.pool.connect(self.address)
+                result = operation(conn)
+            return result
+        finally:
+            self.pool.release(conn)
+
+    def _call(self, operation):
+        return retry_when_busy(lambda: self._call_once(operation))
+
+    def _call_once(self, operation):
+        try:
+            return self._with_connection(operation)
+        except ServerBusy as busy:
+            return STATUS_FAIL_SERVER_BUSY, busy.response
+        except ConnectionRefusedError:
+            return STATUS_FAIL_CONNECTION_REFUSED, {'data': 'Connection refused'}
+        except socket.timeout:
+            return STATUS_FAIL_CONNECTION_TIMEOUT_CONNECT, {'data': 'Connection attempt timed out'}
+        except Exception as e:
+            return STATUS_FAIL_UNKNOWN_EXCEPTION, {'data': str(e)}
+
+    def request(self, command, *params):
+        return self._call(lambda conn: _request_on_connection(conn, command, *params))
+
+    def pipeline(self, commands):
+        def run_pipeline(conn):
+            try:
+                conn.sendall(b''.join(encode_command(conn.protocol, command, *params) for command, *params in commands))
+            except socket.error as se:
+                conn.broken = True
+                return [(STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': f'Socket error sending pipeline: {str(se)}'})]
+            return [conn.read_response() for _ in commands]
+        try:
+            conn, reused = self.pool.acquire(self.address)
+        except ServerBusy as busy:
+            return [(STATUS_FAIL_SERVER_BUSY, busy.response)] * len(commands)
+        except ConnectionRefusedError:
+            return [(STATUS_FAIL_CONNECTION_REFUSED, {'data': 'Connection refused'})] * len(commands)
+        except Exception as e:
+            return [(STATUS_FAIL_UNKNOWN_EXCEPTION, {'data': str(e)})] * len(commands)
+        try:
+            return run_pipeline(conn)
+        finally:
+            self.pool.release(conn)
+
+    def list(self, prefix=None, sort=None, order=None, limit=None, cursor=None, detail=False):
+        return _result_status(*self.request("LIST", *list_options(prefix, sort, order, limit, cursor, detail)), 'Invalid list response')
+
+    def delete(self, filename):
+        if not filename:
+            return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'Filename for delete is empty'}
+        return _result_status(*self.request("DELETE", filename), 'Invalid delete response')
+
+    def mdelete(self, *patterns):
+        if not patterns:
+            return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'No filenames or patterns for mdelete'}
+        return self._call(lambda conn: _mdelete_on_connection(conn, list(patterns)))
+
+    def upload(self, local_filepath, remote_filename=None, dedup=False, compress=False):
+        if not local_filepath or not os.path.exists(local_filepath):
+            return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'Local file invalid or not found'}
+        remote_filename = remote_filename or os.path.basename(local_filepath)
+        file_size = os.path.getsize(local_filepath)
+        sha256 = local_sha256(local_filepath) if dedup else None
+        compress = compress if compress and worth_compressing(local_filepath) else None
+        return self._call(lambda conn: _upload_on_connection(conn, local_filepath, remote_filename, file_size, sha256, compress))
+
+    def download(self, remote_filename, local_save_path=None, compress=False):
+        if not remote_filename:
+            return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'Remote filename is empty'}
+        try:
+            local_save_path = _prepare_download_path(remote_filename, local_save_path)
+        except OSError as e:
+            return STATUS_FAIL_CLIENT_PRECONDITION, {'data': f'Cannot create local dir for {local_save_path}: {e}'}
+        return self._call(lambda conn: _download_on_connection(conn, remote_filename, local_save_path, compress=compress))
+
+    def mget(self, remote_filenames, local_dir=None):
+        if not remote_filenames:
+            return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'No filenames or patterns for mget'}
+        try:
+            local_dir = _prepare_mget_dir(local_dir)
+        except OSError as e:
+            return STATUS_FAIL_CLIENT_PRECONDITION, {'data': f'Cannot create local dir {local_dir}: {e}'}
+        return self._call(lambda conn: _mget_on_connection(conn, remote_filenames, local_dir))
+
+    def close(self):
+        self.pool.close_all()
+
+def _single_use(operation):
+    return retry_when_busy(lambda: _single_use_once(operation))
+
+def _single_use_once(operation):
+    global server_address
+    conn = None
+    try:
+        conn = open_connection(server_address)
+        return operation(conn)
+    except ServerBusy as busy:
+        return STATUS_FAIL_SERVER_BUSY, busy.response
+    except ConnectionRefusedError:
+        return STATUS_FAIL_CONNECTION_REFUSED, {'data': 'Connection refused'}
+    except socket.timeout:
+        return STATUS_FAIL_CONNECTION_TIMEOUT_CONNECT, {'data': 'Connection attempt timed out'}
     except Exception as e:
         return STATUS_FAIL_UNKNOWN_EXCEPTION, {'data': str(e)}
     finally:
-        if sock: sock.close()
+        if conn: conn.close()
+
+def send_command_and_get_response(command_str=""):
+    if not command_str.split():
+        return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'Command is empty'}
+    command, *params = command_str.split()
+    return _single_use(lambda conn: _request_on_connection(conn, command, *params))
+
+def list_options(prefix=None, sort=None, order=None, limit=None, cursor=None, detail=False):
+    options = dict(prefix=prefix, sort=sort, order=order, limit=limit, cursor=cursor, detail=1 if detail else None)
+    return [f"{key}={value}" for key, value in options.items() if value is not None]
+
+def remote_list(prefix=None, page_size=None):
+    filenames = []
+    cursor = None
+    while True:
+        command_str = " ".join(["LIST"] + list_options(prefix=prefix, limit=page_size, cursor=cursor))
+        status_code, hasil = send_command_and_get_response(command_str)
+        if not (status_code == STATUS_OK and isinstance(hasil, dict) and hasil.get('status') == 'OK'):
+            break
+        filenames.extend(hasil.get('data') or [])
+        cursor = hasil.get('next_cursor')
+        if not cursor:
+            break
+    if status_code == STATUS_OK and isinstance(hasil, dict) and hasil.get('status') == 'OK':
+        print("Daftar file : ")
+        if filenames:
+            for nmfile in filenames:
+                print(f"- {nmfile}")
+        else:
+            print("Tidak ada file.")
+        return True
+    else:
+        error_message = hasil.get('data', 'Operasi gagal') if isinstance(hasil, dict) else 'Operasi gagal (respons tidak valid)'
+        print(f"Gagal menampilkan daftar file: {error_message} (Status: {status_code})")
+        return False
+
+def remote_upload_stream(local_filepath, remote_filename=None, dedup=False, compress=False):
+    if not local_filepath or not os.path.exists(local_filepath):
+        return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'Local file invalid or not found'}
+
+    if remote_filename is None:
+        remote_filename = os.path.basename(local_filepath)
+
+    file_size = os.path.getsize(local_filepath)
+    sha256 = local_sha256(local_filepath) if dedup else None
+    compress = compress if compress and worth_compressing(local_filepath) else None
+    return _single_use(lambda conn: _upload_on_connection(conn, local_filepath, remote_filename, file_size, sha256, compress))
+
+def remote_get_stream(remote_filename, local_save_path=None, resume=False, compress=False):
+    if not remote_filename:
+        return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'Remote filename is empty'}
+    try:
+        local_save_path = _prepare_download_path(remote_filename, local_save_path)
+    except OSError as e:
+        return STATUS_FAIL_CLIENT_PRECONDITION, {'data': f'Cannot create local dir for {local_save_path}: {e}'}
+    offset = os.path.getsize(local_save_path) if resume and os.path.exists(local_save_path) else 0
+    return _single_use(lambda conn: _download_on_connection(conn, remote_filename, local_save_path, offset, compress=compress))
+
+def remote_get_segmented(remote_filename, local_save_path=None, num_segments=4, min_segment_size=1024 * 1024):
+    if not remote_filename:
+        return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'Remote filename is empty'}
+    try:
+        local_save_path = _prepare_download_path(remote_filename, local_save_path)
+    except OSError as e:
+        return STATUS_FAIL_CLIENT_PRECONDITION, {'data': f'Cannot create local dir for {local_save_path}: {e}'}
+
+    status_code, probe = _single_use(lambda conn: _request_on_connection(conn, "GET_STREAM_INITIATE", remote_filename, 0, 0))
+    if status_code != STATUS_OK: return status_code, probe
+    if probe.get('file_size') is None:
+        return STATUS_FAIL_SERVER_PROTOCOL, {'data': 'Server does not support byte-range downloads'}
+    file_size = int(probe['file_size'])
+
+    with open(local_save_path, 'wb') as f:
+        f.truncate(file_size)
+    segment_size = max(min_segment_size, -(-file_size // max(1, num_segments)))
+    segments = [(start, min(segment_size, file_size - start)) for start in range(0, file_size, segment_size)]
+    if not segments:
+        return STATUS_OK, {'data': f'File {remote_filename} downloaded to {local_save_path}', 'segments': 0}
+
+    with ThreadPoolExecutor(max_workers=len(segments), thread_name_prefix="SegmentDownloader") as executor:
+        futures = [executor.submit(_single_use, lambda conn, start=start, length=length:
+                                   _download_on_connection(conn, remote_filename, local_save_path, start, length))
+                   for start, length in segments]
+        results = [future.result() for future in futures]
+    for (start, length), (segment_status, segment_data) in zip(segments, results):
+        if segment_status != STATUS_OK:
+            return segment_status, dict(segment_data, failed_range=[start, start + length])
+    return STATUS_OK, {'data': f'File {remote_filename} downloaded to {local_save_path}', 'segments': len(segments)}
+
+def _upload_parts_on_connection(conn, local_filepath, file_id, part_queue):
+    try:
+        with open(local_filepath, 'rb') as f:
+            while True:
+                try:
+                    part_index = part_queue.get_nowait()
+                except queue.Empty:
+                    return STATUS_OK, {'data': 'No parts left'}
+                status_code, part_response = _request_on_connection(conn, "UPLOAD_PART", file_id, part_index)
+                if status_code == STATUS_FAIL_SERVER_BUSY:
+                    part_queue.put(part_index)
+                if status_code != STATUS_OK or part_response.get('status') != 'READY_FOR_DATA':
+                    return status_code if status_code != STATUS_OK else STATUS_FAIL_SERVER_PROTOCOL, part_response
+                length = int(part_response['expected_size'])
+                sent = conn.sendfile(f, int(part_response['offset']), length)
+                if sent != length:
+                    conn.broken = True
+                    return STATUS_FAIL_DATA_INTEGRITY, {'data': f'Part {part_index}: sent {sent} of {length} bytes'}
+                status_code, ack = conn.read_response()
+                if status_code != STATUS_OK:
+                    return status_code, ack
+    except socket.timeout:
+        conn.broken = True
+        return STATUS_FAIL_SOCKET_TIMEOUT_OPERATION, {'data': 'Timeout during part upload'}
+    except socket.error as se:
+        conn.broken = True
+        return STATUS_FAIL_CONNECTION_RESET_OPERATION, {'data': f'Socket error during part upload: {str(se)}'}
+    except Exception as e:
+        conn.broken = True
+        return STATUS_FAIL_UNKNOWN_EXCEPTION, {'data': str(e)}
+
+def remote_upload_parallel(local_filepath, remote_filename=None, num_connections=4, part_size=None, file_id=None, max_rounds=3):
+    if not local_filepath or not os.path.exists(local_filepath):
+        return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'Local file invalid or not found'}
+    if remote_filename is None:
+        remote_filename = os.path.basename(local_filepath)
+    file_size = os.path.getsize(local_filepath)
+
+    if file_id is None:
+        create_params = [remote_filename, file_size] + ([part_size] if part_size else [])
+        status_code, session = _single_use(lambda conn: _request_on_connection(conn, "UPLOAD_SESSION_CREATE", *create_params))
+        if status_code != STATUS_OK:
+            return status_code, session
+        file_id = session['file_id']
+
+    last_failure = None
+    for _ in range(max_rounds):
+        status_code, session = _single_use(lambda conn: _request_on_connection(conn, "UPLOAD_SESSION_STATUS", file_id))
+        if status_code != STATUS_OK:
+            return status_code, dict(session, file_id=file_id)
+        if session.get('expected_size') != file_size:
+            return STATUS_FAIL_CLIENT_PRECONDITION, {'data': f"Session expects {session.get('expected_size')} bytes, local file has {file_size}", 'file_id': file_id}
+        missing_parts = session.get('missing_parts', [])
+        if not missing_parts:
+            break
+        part_queue = queue.Queue()
+        for part_index in missing_parts:
+            part_queue.put(part_index)
+        with ThreadPoolExecutor(max_workers=min(num_connections, len(missing_parts)), thread_name_prefix="PartUploader") as executor:
+            futures = [executor.submit(_single_use, lambda conn: _upload_parts_on_connection(conn, local_filepath, file_id, part_queue))
+                       for _ in range(min(num_connections, len(missing_parts)))]
+            for future in futures:
+                part_status, part_data = future.result()
+                if part_status != STATUS_OK:
+                    last_failure = (part_status, part_data)
+
+    status_code, final_response = _single_use(lambda conn: _request_on_connection(conn, "UPLOAD_SESSION_COMPLETE", file_id))
+    status_code, final_response = _result_status(status_code, final_response, 'Invalid session complete response')
+    if status_code != STATUS_OK:
+        if last_failure:
+            status_code, final_response = last_failure[0], dict(last_failure[1])
+        final_response['file_id'] = file_id
+    return status_code, final_response
 
 def remote_delete(filename=""):
     if not filename:
@@ -213,6 +918,27 @@ def remote_delete(filename=""):
         err_data = hasil if isinstance(hasil, dict) else {'data': 'Invalid delete response'}
         return status_code if status_code != STATUS_OK else STATUS_FAIL_SERVER_RESPONSE_ERROR, err_data
 
+def remote_mdelete(*patterns):
+    if not patterns:
+        return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'No filenames or patterns for mdelete'}
+    return _single_use(lambda conn: _mdelete_on_connection(conn, list(patterns)))
+
+def remote_mget(remote_filenames, local_dir=None):
+    if not remote_filenames:
+        return STATUS_FAIL_CLIENT_PRECONDITION, {'data': 'No filenames or patterns for mget'}
+    try:
+        local_dir = _prepare_mget_dir(local_dir)
+    except OSError as e:
+        return STATUS_FAIL_CLIENT_PRECONDITION, {'data': f'Cannot create local dir {local_dir}: {e}'}
+    return _single_use(lambda conn: _mget_on_connection(conn, remote_filenames, local_dir))
+
+def remote_rate_limit(token=None, **rates):
+    params = [f"{scope}={value}" for scope, value in rates.items() if value is not None]
+    if token:
+        params.append(f"token={token}")
+    status_code, hasil = _single_use(lambda conn: _request_on_connection(conn, "RATE_LIMIT", *params))
+    return _result_status(status_code, hasil, 'Invalid rate limit response')
+
 def perform_stress_test_cycle(worker_id, local_file_info, test_run_id_str):
     local_filepath = local_file_info['path']
     original_filename = os.path.basename(local_filepath)
@@ -248,94 +974,175 @@ def perform_stress_test_cycle(worker_id, local_file_info, test_run_id_str):
             results['download_error_info'] = f"Size mismatch: expected {local_file_info['size_bytes']}, got {size_on_disk}"
     return results
 
-if __name__ == '__main__':
-    server_address = ('172.16.16.101', 8889)
+STRESS_TEST_FILES_CONFIG = [
+    {'id': '10MB', 'path': 'dummy_file_10MB.txt', 'size_bytes': 10 * 1024 * 1024},
+    {'id': '50MB', 'path': 'dummy_file_50MB.txt', 'size_bytes': 50 * 1024 * 1024},
+    {'id': '100MB', 'path': 'dummy_file_100MB.txt', 'size_bytes': 100 * 1024 * 1024},
+]
+CONCURRENT_CLIENT_WORKERS_LIST = [1, 5, 10]
+SERVER_WORKER_POOL_SIZE_CONFIG = 10
+PROCESS_START_DELAY = 1.0
 
-    STRESS_TEST_FILES_CONFIG = [
-        {'id': '10MB', 'path': 'dummy_file_10MB.txt', 'size_bytes': 10 * 1024 * 1024},
-        {'id': '50MB', 'path': 'dummy_file_50MB.txt', 'size_bytes': 50 * 1024 * 1024},
-        {'id': '100MB', 'path': 'dummy_file_100MB.txt', 'size_bytes': 100 * 1024 * 1024},
-    ]
-    valid_test_files = []
-    for f_info in STRESS_TEST_FILES_CONFIG:
-        if os.path.exists(f_info['path']) and os.path.getsize(f_info['path']) == f_info['size_bytes']:
-            valid_test_files.append(f_info)
+CSV_FIELDNAMES = [
+    'Nomor', 'Operasi', 'Volume', 'Jumlah client worker pool',
+    'Jumlah server worker pool', 'Waktu total per client', 'Throughput per client',
+    'Jumlah client worker berhasil', 'Jumlah client worker gagal',
+    'Jumlah server worker berhasil', 'Jumlah server worker gagal'
+]
+PER_PROCESS_CSV_FIELDNAMES = ['Proses'] + CSV_FIELDNAMES
+OPERATION_COLUMNS = [("Upload", "upload_detailed_status", "upload_time_s"),
+                     ("Download", "download_detailed_status", "download_time_s")]
+
+def valid_stress_test_files(files_config=STRESS_TEST_FILES_CONFIG):
+    return [f_info for f_info in files_config
+            if os.path.exists(f_info['path']) and os.path.getsize(f_info['path']) == f_info['size_bytes']]
+
+def _run_worker_threads(worker_ids, file_info, test_run_id_str, process_index=0, address=None, start_at=None):
+    global server_address
+    if address:
+        server_address = address
+    if start_at:
+        time.sleep(max(0.0, start_at - time.time()))
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, len(worker_ids)), thread_name_prefix=f"StressClient_F{file_info['id']}") as executor:
+        futures = [executor.submit(perform_stress_test_cycle, i, file_info, test_run_id_str) for i in worker_ids]
+        for future in futures:
+            try: results.append(future.result())
+            except Exception as e_future:
+                results.append({'worker_id': 'N/A_FutureError', 'file_id': file_info['id'],
+                                'upload_detailed_status': STATUS_FAIL_UNKNOWN_EXCEPTION,
+                                'download_detailed_status': STATUS_FAIL_UNKNOWN_EXCEPTION,
+                                'delete_detailed_status': STATUS_FAIL_UNKNOWN_EXCEPTION,
+                                'error_future': str(e_future)})
+    for r_item in results:
+        r_item['process'] = process_index
+        r_item['pid'] = os.getpid()
+    return results
+
+def run_stress_scenario(file_info, num_client_workers, test_run_id_str, num_processes=1):
+    num_processes = max(1, min(num_processes, num_client_workers))
+    if num_processes == 1:
+        return _run_worker_threads(range(num_client_workers), file_info, test_run_id_str)
+    start_at = time.time() + PROCESS_START_DELAY
+    all_results = []
+    with ProcessPoolExecutor(max_workers=num_processes) as executor:
+        futures = [executor.submit(_run_worker_threads, list(range(p, num_client_workers, num_processes)), file_info,
+                                   test_run_id_str, p, server_address, start_at)
+                   for p in range(num_processes)]
+        for p, future in enumerate(futures):
+            try: all_results.extend(future.result())
+            except Exception as e_future:
+                all_results.extend({'worker_id': i, 'file_id': file_info['id'], 'process': p,
+                                    'upload_detailed_status': STATUS_FAIL_UNKNOWN_EXCEPTION,
+                                    'download_detailed_status': STATUS_FAIL_UNKNOWN_EXCEPTION,
+                                    'delete_detailed_status': STATUS_FAIL_UNKNOWN_EXCEPTION,
+                                    'error_future': str(e_future)}
+                                   for i in range(p, num_client_workers, num_processes))
+    return all_results
+
+def summarize_operation(results, status_key, time_key, file_info):
+    op_ok_count = 0; op_fail_server_count = 0; op_fail_other_count = 0
+    op_times = []
+    for r_item in results:
+        op_status = r_item.get(status_key)
+        if op_status == STATUS_OK:
+            op_ok_count += 1
+            if r_item.get(time_key) is not None: op_times.append(r_item[time_key])
+        elif is_server_attributed_failure(op_status):
+            op_fail_server_count += 1
+        else:
+            op_fail_other_count += 1
+    avg_op_time = sum(op_times) / len(op_times) if op_times else 0
+    avg_op_MBps_per_client = (file_info['size_bytes'] / (1024*1024)) / avg_op_time if avg_op_time > 0 else 0
+    return dict(ok=op_ok_count, fail_server=op_fail_server_count, fail_other=op_fail_other_count,
+                times=op_times, avg_time=avg_op_time, avg_MBps=avg_op_MBps_per_client)
+
+def _csv_row(test_run_id_str, op_name, file_info, num_client_workers, server_workers, summary):
+    return {
+        'Nomor': test_run_id_str, 'Operasi': op_name, 'Volume': file_info['id'],
+        'Jumlah client worker pool': num_client_workers,
+        'Jumlah server worker pool': server_workers,
+        'Waktu total per client': f"{summary['avg_time']:.3f}" if summary['times'] else "N/A",
+        'Throughput per client': f"{summary['avg_MBps']:.3f}" if summary['avg_MBps'] > 0 else "N/A",
+        'Jumlah client worker berhasil': summary['ok'],
+        'Jumlah client worker gagal': summary['fail_server'] + summary['fail_other'],
+        'Jumlah server worker berhasil': max(0, server_workers - summary['fail_server']),
+        'Jumlah server worker gagal': summary['fail_server']
+    }
+
+def _append_csv(csv_filename, fieldnames, rows):
+    with open(csv_filename, 'a', newline='') as csvfile_append:
+        writer_append = csv.DictWriter(csvfile_append, fieldnames=fieldnames)
+        for row in rows:
+            writer_append.writerow(row)
+
+def _create_csv(csv_filename, fieldnames):
+    with open(csv_filename, 'w', newline='') as csvfile_main:
+        csv.DictWriter(csvfile_main, fieldnames=fieldnames).writeheader()
+
+def run_stress_test(test_files, client_workers_list=CONCURRENT_CLIENT_WORKERS_LIST,
+                    server_workers=SERVER_WORKER_POOL_SIZE_CONFIG, num_processes=1, csv_filename=None):
+    csv_filename = csv_filename or f"stress_test_results_{time.strftime('%Y%m%d_%H%M%S')}.csv"
+    per_process_csv = f"{os.path.splitext(csv_filename)[0]}_per_process.csv" if num_processes > 1 else None
+    _create_csv(csv_filename, CSV_FIELDNAMES)
+    if per_process_csv:
+        _create_csv(per_process_csv, PER_PROCESS_CSV_FIELDNAMES)
+
+    test_run_id_counter = 0
+    for num_client_workers in client_workers_list:
+        for file_info_to_test in test_files:
+            test_run_id_counter += 1
+            test_run_id_str = f"{test_run_id_counter:03d}"
+            scenario_processes = max(1, min(num_processes, num_client_workers))
+
+            print(f"Memulai stress test run #{test_run_id_str} - File: {file_info_to_test['id']}, Klien: {num_client_workers}, "
+                  f"Proses: {scenario_processes}, Server Workers (Config): {server_workers}")
+
+            start_time_scenario = time.monotonic()
+            all_run_results = run_stress_scenario(file_info_to_test, num_client_workers, test_run_id_str, num_processes)
+            total_time_scenario = time.monotonic() - start_time_scenario
+
+            for op_name, status_key, time_key in OPERATION_COLUMNS:
+                summary = summarize_operation(all_run_results, status_key, time_key, file_info_to_test)
+                _append_csv(csv_filename, CSV_FIELDNAMES,
+                            [_csv_row(test_run_id_str, op_name, file_info_to_test, num_client_workers, server_workers, summary)])
+                print(f"  {op_name}: {summary['ok']} OK, {summary['fail_server']} Gagal (Server), {summary['fail_other']} Gagal (Lainnya).")
+                if summary['times']: print(f"    Rata-rata Waktu {op_name}: {summary['avg_time']:.3f}s, Throughput: {summary['avg_MBps']:.3f} MB/s")
+                if per_process_csv:
+                    rows = []
+                    for p in range(scenario_processes):
+                        process_results = [r_item for r_item in all_run_results if r_item.get('process') == p]
+                        process_summary = summarize_operation(process_results, status_key, time_key, file_info_to_test)
+                        row = _csv_row(test_run_id_str, op_name, file_info_to_test, len(process_results), server_workers, process_summary)
+                        row['Proses'] = p
+                        rows.append(row)
+                        print(f"    Proses {p}: {process_summary['ok']}/{len(process_results)} OK" +
+                              (f", rata-rata {process_summary['avg_time']:.3f}s" if process_summary['times'] else ""))
+                    _append_csv(per_process_csv, PER_PROCESS_CSV_FIELDNAMES, rows)
+            print(f"Total Waktu Skenario Keseluruhan: {total_time_scenario:.2f} detik")
+            print("--------------------------------------------------")
+    return csv_filename
+
+def main():
+    global server_address
+    parser = argparse.ArgumentParser(description="Stress test upload/download file server")
+    parser.add_argument('--server', default='172.16.16.101:8889', help="host:port server")
+    parser.add_argument('--clients', default=','.join(str(n) for n in CONCURRENT_CLIENT_WORKERS_LIST),
+                        help="daftar jumlah client worker, dipisah koma")
+    parser.add_argument('--processes', type=int, default=1,
+                        help="sebar client worker ke N proses, masing-masing dengan thread pool sendiri")
+    parser.add_argument('--server-workers', type=int, default=SERVER_WORKER_POOL_SIZE_CONFIG,
+                        help="jumlah worker server (hanya dicatat di CSV)")
+    args = parser.parse_args()
+
+    host, _, port = args.server.rpartition(':')
+    server_address = (host or '127.0.0.1', int(port))
+    valid_test_files = valid_stress_test_files()
     if not valid_test_files:
         print("Tidak ada file dummy yang valid. Lewati stress test.")
-    else:
-        CONCURRENT_CLIENT_WORKERS_LIST = [1, 5, 10]
-        SERVER_WORKER_POOL_SIZE_CONFIG = 10
-
-        csv_filename = f"stress_test_results_{time.strftime('%Y%m%d_%H%M%S')}.csv"
-        csv_fieldnames = [
-            'Nomor', 'Operasi', 'Volume', 'Jumlah client worker pool',
-            'Jumlah server worker pool', 'Waktu total per client', 'Throughput per client',
-            'Jumlah client worker berhasil', 'Jumlah client worker gagal',
-            'Jumlah server worker berhasil', 'Jumlah server worker gagal'
-        ]
-        with open(csv_filename, 'w', newline='') as csvfile_main:
-            writer_main = csv.DictWriter(csvfile_main, fieldnames=csv_fieldnames)
-            writer_main.writeheader()
-
-        test_run_id_counter = 0
-        for num_client_workers in CONCURRENT_CLIENT_WORKERS_LIST:
-            for file_info_to_test in valid_test_files:
-                test_run_id_counter += 1
-                test_run_id_str = f"{test_run_id_counter:03d}"
-
-                print(f"Memulai stress test run #{test_run_id_str} - File: {file_info_to_test['id']}, Klien: {num_client_workers}, Server Workers (Config): {SERVER_WORKER_POOL_SIZE_CONFIG}")
-                
-                all_run_results = []
-                start_time_scenario = time.monotonic()
-
-                with ThreadPoolExecutor(max_workers=num_client_workers, thread_name_prefix=f"StressClient_F{file_info_to_test['id']}") as executor:
-                    futures = [executor.submit(perform_stress_test_cycle, i, file_info_to_test, test_run_id_str) for i in range(num_client_workers)]
-                    for future in futures:
-                        try: all_run_results.append(future.result())
-                        except Exception as e_future:
-                            all_run_results.append({'worker_id': 'N/A_FutureError', 'file_id': file_info_to_test['id'],
-                                                    'upload_detailed_status': STATUS_FAIL_UNKNOWN_EXCEPTION,
-                                                    'download_detailed_status': STATUS_FAIL_UNKNOWN_EXCEPTION,
-                                                    'delete_detailed_status': STATUS_FAIL_UNKNOWN_EXCEPTION,
-                                                    'error_future': str(e_future)})
-                
-                total_time_scenario = time.monotonic() - start_time_scenario
-
-                for op_name, status_key, time_key in [("Upload", "upload_detailed_status", "upload_time_s"),
-                                                      ("Download", "download_detailed_status", "download_time_s")]:
-                    op_ok_count = 0; op_fail_server_count = 0; op_fail_other_count = 0
-                    op_times = []
-                    for r_item in all_run_results:
-                        op_status = r_item.get(status_key)
-                        if op_status == STATUS_OK:
-                            op_ok_count += 1
-                            if r_item.get(time_key) is not None: op_times.append(r_item[time_key])
-                        elif is_server_attributed_failure(op_status):
-                            op_fail_server_count += 1
-                        else:
-                            op_fail_other_count += 1
-                    
-                    op_fail_total_count = op_fail_server_count + op_fail_other_count
-                    avg_op_time = sum(op_times) / len(op_times) if op_times else 0
-                    avg_op_MBps_per_client = (file_info_to_test['size_bytes'] / (1024*1024)) / avg_op_time if avg_op_time > 0 else 0
-                    server_worker_gagal = op_fail_server_count
-                    server_worker_berhasil = max(0, SERVER_WORKER_POOL_SIZE_CONFIG - server_worker_gagal)
-
-                    with open(csv_filename, 'a', newline='') as csvfile_append:
-                        writer_append = csv.DictWriter(csvfile_append, fieldnames=csv_fieldnames)
-                        writer_append.writerow({
-                            'Nomor': test_run_id_str, 'Operasi': op_name, 'Volume': file_info_to_test['id'],
-                            'Jumlah client worker pool': num_client_workers,
-                            'Jumlah server worker pool': SERVER_WORKER_POOL_SIZE_CONFIG,
-                            'Waktu total per client': f"{avg_op_time:.3f}" if op_times else "N/A",
-                            'Throughput per client': f"{avg_op_MBps_per_client:.3f}" if avg_op_MBps_per_client > 0 else "N/A",
-                            'Jumlah client worker berhasil': op_ok_count,
-                            'Jumlah client worker gagal': op_fail_total_count,
-                            'Jumlah server worker berhasil': server_worker_berhasil,
-                            'Jumlah server worker gagal': server_worker_gagal
-                        })
-                    print(f"  {op_name}: {op_ok_count} OK, {op_fail_server_count} Gagal (Server), {op_fail_other_count} Gagal (Lainnya).")
-                    if op_times: print(f"    Rata-rata Waktu {op_name}: {avg_op_time:.3f}s, Throughput: {avg_op_MBps_per_client:.3f} MB/s")
-                print(f"Total Waktu Skenario Keseluruhan: {total_time_scenario:.2f} detik")
-                print("--------------------------------------------------")
-        print(f"\n--- Semua Tes Selesai. Hasil disimpan di {csv_filename} ---")
\ No newline at end of file
+        return
+    run_stress_test(valid_test_files, [int(n) for n in args.clients.split(',') if n.strip()],
+                    args.server_workers, args.processes)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import os
+import json
+import shlex
+import sys
+import time
+import tempfile
+
+from file_protocol import FileProtocol
+
+COMMANDS = [
+    "HELLO 2",
+    "LIST limit=50",
+    "GET_STREAM_INITIATE pokijan.jpg 0 1024",
+    "UPLOAD_SESSION_STATUS tidak-ada",
+    "DELETE tidak-ada.bin",
+]
+
+def stub_handler(params=[]):
+    return dict(status='OK', data=params)
+
+class StubInterface:
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return stub_handler
+
+def legacy_dispatch(fp, command_str):
+    tokens = shlex.split(command_str.strip())
+    c_request = tokens[0].lower()
+    params = tokens[1:]
+    if c_request == 'hello':
+        hasil = json.dumps(stub_handler(params))
+    elif hasattr(fp.file_interface, c_request):
+        hasil = json.dumps(getattr(fp.file_interface, c_request)(params))
+    else:
+        hasil = json.dumps(dict(status='ERROR', data=f'Request "{c_request}" tidak dikenali'))
+    return hasil
+
+def fast_dispatch(fp, command_str):
+    return json.dumps(fp.handle_string(command_str)[1])
+
+def measure(fp, dispatch, duration):
+    count = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for command_str in COMMANDS:
+            dispatch(fp, command_str)
+        count += len(COMMANDS)
+    return count / duration
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        fp = FileProtocol()
+        fp.file_interface = StubInterface()
+        fp.handlers = {name: stub_handler for name in fp.handlers}
+        results = {}
+        for name, dispatch in (('shlex+getattr+json', legacy_dispatch), ('dispatch table', fast_dispatch)):
+            measure(fp, dispatch, 0.2)
+            results[name] = measure(fp, dispatch, duration)
+            print(f"{name:<20} {results[name]:>12,.0f} commands/s")
+        print(f"speedup              {results['dispatch table'] / results['shlex+getattr+json']:>12.2f}x")
+
+if __name__ == "__main__":
+    main()
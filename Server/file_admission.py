@@ -0,0 +1,86 @@
+import queue
+import socket
+import threading
+
+RETRY_AFTER_BASE = 0.5
+RETRY_AFTER_MAX = 10.0
+BUSY_DRAIN_TIMEOUT = 1.0
+BUSY_QUEUE_SIZE = 256
+
+class AdmissionController:
+    def __init__(self, max_workers, max_queued_connections=None, max_concurrent_transfers=None,
+                 max_upload_bytes=None, max_queue_wait=30.0):
+        self.max_workers = max(1, max_workers)
+        self.max_queued_connections = self.max_workers * 4 if max_queued_connections is None else max_queued_connections
+        self.max_concurrent_transfers = max_concurrent_transfers
+        self.max_upload_bytes = max_upload_bytes
+        self.max_queue_wait = max_queue_wait
+        self.queued = 0
+        self.active_transfers = 0
+        self.upload_bytes = 0
+        self._lock = threading.Lock()
+
+    def try_enqueue_connection(self):
+        with self._lock:
+            if self.queued >= self.max_queued_connections:
+                return False
+            self.queued += 1
+            return True
+
+    def connection_started(self):
+        with self._lock:
+            self.queued -= 1
+
+    def try_acquire_transfer(self, upload_bytes=0):
+        with self._lock:
+            if self.max_concurrent_transfers is not None and self.active_transfers >= self.max_concurrent_transfers:
+                return 'transfers'
+            if self.max_upload_bytes is not None and upload_bytes and self.upload_bytes and \
+               self.upload_bytes + upload_bytes > self.max_upload_bytes:
+                return 'upload_bytes'
+            self.active_transfers += 1
+            self.upload_bytes += upload_bytes
+            return None
+
+    def release_transfer(self, upload_bytes=0):
+        with self._lock:
+            self.active_transfers -= 1
+            self.upload_bytes -= upload_bytes
+
+    def retry_after(self):
+        with self._lock:
+            pressure = self.queued / self.max_workers
+            if self.max_concurrent_transfers:
+                pressure = max(pressure, self.active_transfers / self.max_concurrent_transfers)
+        return round(min(RETRY_AFTER_MAX, RETRY_AFTER_BASE * (1 + pressure)), 2)
+
+    def busy_response(self, reason, scope):
+        return dict(status='BUSY', data=f'Server busy ({reason}), retry later', reason=reason,
+                    scope=scope, retry_after=self.retry_after())
+
+class BusyResponder:
+    def __init__(self):
+        self.pending = queue.Queue(maxsize=BUSY_QUEUE_SIZE)
+        threading.Thread(target=self._loop, name="BusyResponder", daemon=True).start()
+
+    def reject(self, connection, payload):
+        try:
+            self.pending.put_nowait((connection, payload))
+        except queue.Full:
+            try: connection.close()
+            except Exception: pass
+
+    def _loop(self):
+        while True:
+            connection, payload = self.pending.get()
+            try:
+                connection.settimeout(BUSY_DRAIN_TIMEOUT)
+                connection.sendall(payload)
+                connection.shutdown(socket.SHUT_WR)
+                while connection.recv(65536):
+                    pass
+            except Exception:
+                pass
+            finally:
+                try: connection.close()
+                except Exception: pass
@@ -0,0 +1,141 @@
+import os
+import json
+import uuid
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from file_transfer import file_checksums
+
+class BlobStoreError(ValueError):
+    pass
+
+def is_digest(value):
+    return isinstance(value, str) and len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+def file_sha256(path):
+    return file_checksums(path, ('sha256',))['sha256']
+
+class BlobStore:
+    def __init__(self, directory, blob_dir='.blobs'):
+        self.directory = directory
+        self.blob_dir = os.path.join(directory, blob_dir)
+        self.index_path = os.path.join(self.blob_dir, 'index.json')
+        self.lock_path = os.path.join(self.blob_dir, '.lock')
+        self._lock = threading.Lock()
+        self._index_mtime = None
+        self.names = {}
+        self.refs = {}
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+    def blob_path(self, digest):
+        if not is_digest(digest):
+            raise BlobStoreError(f"Invalid sha256 digest '{digest}'")
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def has_blob(self, digest, size=None):
+        try:
+            st = os.stat(self.blob_path(digest))
+        except (OSError, BlobStoreError):
+            return False
+        return size is None or st.st_size == size
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl: fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._reload()
+                    yield
+                finally:
+                    if fcntl: fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.index_path).st_mtime_ns
+        except OSError:
+            self.names, self.refs, self._index_mtime = {}, {}, None
+            return
+        if mtime == self._index_mtime:
+            return
+        with open(self.index_path) as f:
+            index = json.load(f)
+        self.names = index.get('names', {})
+        self.refs = index.get('refs', {})
+        self._index_mtime = mtime
+
+    def _save(self):
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(dict(names=self.names, refs=self.refs), f)
+        os.replace(tmp_path, self.index_path)
+        self._index_mtime = os.stat(self.index_path).st_mtime_ns
+
+    def _release(self, digest):
+        count = self.refs.get(digest, 0) - 1
+        if count > 0:
+            self.refs[digest] = count
+            return
+        self.refs.pop(digest, None)
+        try: os.remove(self.blob_path(digest))
+        except OSError: pass
+
+    def _publish(self, name, digest):
+        final_path = os.path.join(self.directory, name)
+        tmp_path = os.path.join(self.blob_dir, f".{uuid.uuid4().hex}.link")
+        os.link(self.blob_path(digest), tmp_path)
+        try:
+            os.replace(tmp_path, final_path)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+
+    def store(self, name, source_path, digest=None):
+        digest = digest or file_sha256(source_path)
+        blob_path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        with self._locked():
+            if os.path.exists(blob_path):
+                os.remove(source_path)
+            else:
+                os.rename(source_path, blob_path)
+            self._link_locked(name, digest)
+        return digest
+
+    def link(self, name, digest):
+        with self._locked():
+            if not os.path.exists(self.blob_path(digest)):
+                raise BlobStoreError(f"Blob {digest} not found")
+            self._link_locked(name, digest)
+
+    def _link_locked(self, name, digest):
+        self._publish(name, digest)
+        previous = self.names.get(name)
+        self.names[name] = digest
+        self.refs[digest] = self.refs.get(digest, 0) + 1
+        if previous:
+            self._release(previous)
+        self._save()
+
+    def unlink(self, name):
+        with self._locked():
+            digest = self.names.pop(name, None)
+            try: os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError: pass
+            if digest:
+                self._release(digest)
+                self._save()
+        return digest
+
+    def stats(self):
+        with self._locked():
+            total = 0
+            for digest in self.refs:
+                try: total += os.path.getsize(self.blob_path(digest))
+                except OSError: pass
+            return dict(names=len(self.names), blobs=len(self.refs), blob_bytes=total)
@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE_MAX_FILE_SIZE = 1024 * 1024
+
+class ContentCache:
+    def __init__(self, max_bytes=DEFAULT_CACHE_MAX_BYTES, max_file_size=DEFAULT_CACHE_MAX_FILE_SIZE):
+        self.max_bytes = max_bytes
+        self.max_file_size = min(max_file_size, max_bytes)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            self._entries.move_to_end(path)
+            return entry[0]
+
+    def fetch(self, path, st):
+        if st.st_size > self.max_file_size:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[1] == st.st_mtime_ns and len(entry[0]) == st.st_size:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        try:
+            with open(path, 'rb') as f:
+                data = f.read(self.max_file_size + 1)
+        except OSError:
+            return None
+        if len(data) != st.st_size:
+            return None
+        self._put(path, data, st.st_mtime_ns)
+        return data
+
+    def _put(self, path, data, mtime_ns):
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None:
+                self.current_bytes -= len(previous[0])
+            self._entries[path] = (data, mtime_ns)
+            self.current_bytes += len(data)
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.current_bytes -= len(evicted)
+                self.evictions += 1
+
+    def invalidate(self, path):
+        with self._lock:
+            entry = self._entries.pop(path, None)
+            if entry is not None:
+                self.current_bytes -= len(entry[0])
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                entries=len(self._entries),
+                bytes=self.current_bytes,
+                max_bytes=self.max_bytes,
+                max_file_size=self.max_file_size
+            )
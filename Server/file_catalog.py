@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import base64
+import uuid
+import bisect
+import threading
+
+SORT_FIELDS = ('name', 'size', 'mtime')
+META_DIR = '.meta'
+INTERNAL_NAMES = frozenset(('.uploads', META_DIR, '.blobs', '.zcache'))
+FILE_ID_LENGTH = 36
+
+class CatalogError(ValueError):
+    pass
+
+def is_upload_part_name(name):
+    if not name.endswith('.part') or name[FILE_ID_LENGTH:FILE_ID_LENGTH + 1] != '_':
+        return False
+    try:
+        return str(uuid.UUID(name[:FILE_ID_LENGTH])) == name[:FILE_ID_LENGTH]
+    except ValueError:
+        return False
+
+def is_catalog_name(name):
+    return name not in INTERNAL_NAMES and not is_upload_part_name(name)
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, sort='name'):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise CatalogError('Invalid cursor')
+    if not isinstance(key, list) or len(key) != (1 if sort == 'name' else 2) or not isinstance(key[-1], str):
+        raise CatalogError('Invalid cursor')
+    if sort != 'name' and (isinstance(key[0], bool) or not isinstance(key[0], (int, float))):
+        raise CatalogError('Invalid cursor')
+    return tuple(key)
+
+class FileCatalog:
+    def __init__(self, directory, resync_interval=60.0, min_resync_gap=2.0):
+        self.directory = directory
+        self.resync_interval = resync_interval
+        self.min_resync_gap = min_resync_gap
+        self.entries = {}
+        self._sorted_keys = {}
+        self._dir_mtime = None
+        self._last_sync = 0.0
+        self._lock = threading.RLock()
+        self.resync()
+        if resync_interval:
+            threading.Thread(target=self._resync_loop, name="CatalogResync", daemon=True).start()
+
+    def _stat_entry(self, name, st, previous=None):
+        entry = dict(name=name, size=st.st_size, mtime=st.st_mtime, checksum=None)
+        if previous and previous['size'] == entry['size'] and previous['mtime'] == entry['mtime']:
+            entry['checksum'] = previous.get('checksum')
+            entry['checksum_key'] = previous.get('checksum_key')
+        return entry
+
+    def _meta_path(self, name):
+        return os.path.join(self.directory, META_DIR, f"{name}.json")
+
+    def _resync_loop(self):
+        while True:
+            time.sleep(self.resync_interval)
+            try: self.resync()
+            except OSError: pass
+
+    def resync(self):
+        dir_mtime = os.stat(self.directory).st_mtime_ns
+        fresh = {}
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                if not is_catalog_name(dir_entry.name):
+                    continue
+                try:
+                    if not dir_entry.is_file():
+                        continue
+                    st = dir_entry.stat()
+                except OSError:
+                    continue
+                fresh[dir_entry.name] = self._stat_entry(dir_entry.name, st, self.entries.get(dir_entry.name))
+        with self._lock:
+            self.entries = fresh
+            self._sorted_keys = {}
+            self._dir_mtime = dir_mtime
+            self._last_sync = time.monotonic()
+
+    def _refresh_if_changed(self):
+        if time.monotonic() - self._last_sync < self.min_resync_gap:
+            return
+        try:
+            if os.stat(self.directory).st_mtime_ns != self._dir_mtime:
+                self.resync()
+            else:
+                self._last_sync = time.monotonic()
+        except OSError:
+            pass
+
+    def update(self, name):
+        name = os.path.basename(name)
+        if not is_catalog_name(name):
+            return None
+        try:
+            st = os.stat(os.path.join(self.directory, name))
+        except OSError:
+            self.remove(name)
+            return None
+        with self._lock:
+            entry = self._stat_entry(name, st)
+            self.entries[name] = entry
+            self._sorted_keys = {}
+        return entry
+
+    def remove(self, name):
+        name = os.path.basename(name)
+        with self._lock:
+            if self.entries.pop(name, None) is not None:
+                self._sorted_keys = {}
+        try: os.remove(self._meta_path(name))
+        except OSError: pass
+
+    def set_checksum(self, name, checksums, st=None):
+        name = os.path.basename(name)
+        try:
+            st = st or os.stat(os.path.join(self.directory, name))
+            key = [st.st_size, st.st_mtime_ns, st.st_ino]
+            meta_path = self._meta_path(name)
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            tmp_path = f"{meta_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(dict(key=key, checksums=checksums), f)
+            os.replace(tmp_path, meta_path)
+        except OSError:
+            return
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is not None:
+                entry['checksum'] = checksums
+                entry['checksum_key'] = key
+
+    def get_checksum(self, name, st):
+        name = os.path.basename(name)
+        key = [st.st_size, st.st_mtime_ns, st.st_ino]
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is not None and entry.get('checksum') and entry.get('checksum_key') == key:
+                return entry['checksum']
+        try:
+            with open(self._meta_path(name)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('key') != key:
+            return None
+        with self._lock:
+            entry = self.entries.get(name)
+            if entry is not None:
+                entry['checksum'] = meta['checksums']
+                entry['checksum_key'] = key
+        return meta['checksums']
+
+    def _keys_for(self, sort):
+        keys = self._sorted_keys.get(sort)
+        if keys is None:
+            keys = sorted((entry[sort], name) if sort != 'name' else (name,) for name, entry in self.entries.items())
+            self._sorted_keys[sort] = keys
+        return keys
+
+    def list(self, prefix='', sort='name', descending=False, limit=None, cursor=None):
+        if sort not in SORT_FIELDS:
+            raise CatalogError(f"Invalid sort '{sort}', expected one of {SORT_FIELDS}")
+        cursor_key = decode_cursor(cursor, sort) if cursor else None
+        self._refresh_if_changed()
+        with self._lock:
+            keys = self._keys_for(sort)
+            if descending:
+                stop = bisect.bisect_left(keys, cursor_key) if cursor_key else len(keys)
+                candidates = (keys[i] for i in range(stop - 1, -1, -1))
+            else:
+                if cursor_key:
+                    start = bisect.bisect_right(keys, cursor_key)
+                elif sort == 'name' and prefix:
+                    start = bisect.bisect_left(keys, (prefix,))
+                else:
+                    start = 0
+                candidates = (keys[i] for i in range(start, len(keys)))
+
+            page = []
+            last_key = None
+            has_more = False
+            for key in candidates:
+                name = key[-1]
+                if prefix and not name.startswith(prefix):
+                    if sort == 'name' and not descending and name > prefix:
+                        break
+                    continue
+                if limit is not None and len(page) >= limit:
+                    has_more = True
+                    break
+                page.append(dict(self.entries[name]))
+                last_key = key
+        next_cursor = encode_cursor(list(last_key)) if has_more and last_key else None
+        return page, next_cursor
@@ -1,26 +1,217 @@
 import os
-import json
-import base64
-from glob import glob
+import zlib
+import struct
+import fnmatch
 import uuid
+import shutil
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from file_catalog import FileCatalog, CatalogError
+from file_cache import ContentCache
+from file_blobstore import BlobStore, BlobStoreError
+from file_sessions import SessionRegistry
+from file_transfer import DEFAULT_CHECKSUM, RunningChecksum, file_checksums, parse_checksums
+from file_transfer import COMPRESSION_MAX_RATIO, COMPRESSION_MIN_FILE_SIZE, choose_codec, compress_file, sample_ratio
+from file_transfer import durability, fsync_path
 
 UPLOAD_DIR = 'files/'
+UPLOAD_SESSION_DIR = os.path.join(UPLOAD_DIR, '.uploads')
+COMPRESSED_DIR = os.path.join(UPLOAD_DIR, '.zcache')
+COMPRESSION_SYNC_MAX_SIZE = 1024 * 1024
+COMPRESSION_WORKERS = 2
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+MIN_PART_SIZE = 64 * 1024
+MAX_PART_COUNT = 10000
+DEFAULT_LIST_LIMIT = 1000
+MAX_LIST_LIMIT = 10000
+MAX_BATCH_ITEMS = 1000
+MGET_MAX_BYTES = 16 * 1024 * 1024
+MGET_HEADER = struct.Struct('!HQI')
+GLOB_CHARS = '*?['
+STORAGE_MODES = ('plain', 'dedup')
+STORAGE_MODE = os.environ.get('FILE_STORAGE_MODE', 'plain')
 
 class FileInterface:
-    def __init__(self):
-        self.active_uploads = {}
+    def __init__(self, storage_mode=None):
+        self.storage_mode = storage_mode or STORAGE_MODE
+        if self.storage_mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode '{self.storage_mode}', expected one of {STORAGE_MODES}")
         if not os.path.exists(UPLOAD_DIR):
             os.makedirs(UPLOAD_DIR)
+        self.sessions = SessionRegistry(UPLOAD_DIR, UPLOAD_SESSION_DIR)
+        self.catalog = FileCatalog(UPLOAD_DIR)
+        self.content_cache = ContentCache()
+        self.blobstore = BlobStore(UPLOAD_DIR) if self.storage_mode == 'dedup' else None
+        self.compressor = ThreadPoolExecutor(max_workers=COMPRESSION_WORKERS, thread_name_prefix="Compressor")
+        self._compressing = set()
+        self._compressing_lock = threading.Lock()
 
     def _get_full_path(self, filename):
         return os.path.join(UPLOAD_DIR, os.path.basename(filename))
 
+    def _completed_parts(self, file_id):
+        try:
+            return {int(name) for name in os.listdir(self.sessions.parts_dir(file_id)) if name.isdigit()}
+        except OSError:
+            return set()
+
+    def _missing_parts(self, file_id, upload_info):
+        completed = self._completed_parts(file_id)
+        return [i for i in range(upload_info['part_count']) if i not in completed]
+
+    def _part_range(self, upload_info, part_index):
+        offset = part_index * upload_info['part_size']
+        return offset, min(upload_info['part_size'], upload_info['expected_size'] - offset)
+
+    def _mark_part_complete(self, file_id, part_index):
+        try:
+            with open(os.path.join(self.sessions.parts_dir(file_id), str(int(part_index))), 'w'):
+                pass
+        except (ValueError, OSError) as e:
+            return dict(status='ERROR', data=f'Server failed to record part {part_index}: {str(e)}')
+        upload_info = self.sessions.get(file_id)
+        parts_remaining = len(self._missing_parts(file_id, upload_info)) if upload_info else None
+        return dict(status='OK', file_id=file_id, part_index=part_index, parts_remaining=parts_remaining)
+
+    def _mark_chunks_complete(self, file_id, current_size, checksums=None):
+        upload_info = self.sessions.get(file_id)
+        if upload_info:
+            upload_info['current_size'] = current_size
+            upload_info['checksums'] = checksums
+            upload_info['status'] = 'CHUNKS_COMPLETE'
+            try: self.sessions.save(file_id, upload_info)
+            except OSError: pass
+
+    def _compressed_dir(self, filepath):
+        return os.path.join(COMPRESSED_DIR, os.path.basename(filepath))
+
+    def _drop_compressed(self, filepath):
+        shutil.rmtree(self._compressed_dir(filepath), ignore_errors=True)
+
+    def _compressed_copy(self, filepath, st, codec):
+        compressed_dir = self._compressed_dir(filepath)
+        version = f"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"
+        compressed_path = os.path.join(compressed_dir, f"{version}.{codec}")
+        if os.path.exists(compressed_path):
+            return compressed_path
+        if os.path.exists(os.path.join(compressed_dir, f"{version}.skip")):
+            return None
+        if st.st_size <= COMPRESSION_SYNC_MAX_SIZE:
+            return self._build_compressed(filepath, st, codec, compressed_dir, version)
+        with self._compressing_lock:
+            if compressed_path in self._compressing:
+                return None
+            self._compressing.add(compressed_path)
+        self.compressor.submit(self._build_compressed_async, filepath, st, codec, compressed_dir, version, compressed_path)
+        return None
+
+    def _build_compressed_async(self, filepath, st, codec, compressed_dir, version, compressed_path):
+        try:
+            self._build_compressed(filepath, st, codec, compressed_dir, version)
+        except OSError:
+            pass
+        finally:
+            with self._compressing_lock:
+                self._compressing.discard(compressed_path)
+
+    def _build_compressed(self, filepath, st, codec, compressed_dir, version):
+        compressed_path = os.path.join(compressed_dir, f"{version}.{codec}")
+        os.makedirs(compressed_dir, exist_ok=True)
+        for stale in os.listdir(compressed_dir):
+            if not stale.startswith(version):
+                try: os.remove(os.path.join(compressed_dir, stale))
+                except OSError: pass
+        if sample_ratio(filepath, st.st_size) > COMPRESSION_MAX_RATIO:
+            open(os.path.join(compressed_dir, f"{version}.skip"), 'w').close()
+            return None
+        compress_file(filepath, compressed_path, codec)
+        current = os.stat(filepath)
+        if (current.st_ino, current.st_mtime_ns, current.st_size) != (st.st_ino, st.st_mtime_ns, st.st_size):
+            try: os.remove(compressed_path)
+            except OSError: pass
+            return None
+        return compressed_path
+
+    def _split_params(self, params):
+        positional = [param for param in params if '=' not in param]
+        return positional, self._parse_options([param for param in params if '=' in param])
+
+    def _parse_options(self, params):
+        options = {}
+        for param in params:
+            key, sep, value = param.partition('=')
+            if not sep:
+                raise ValueError(f"Expected key=value, got '{param}'")
+            options[key.lower()] = value
+        return options
+
+    def _record_checksums(self, filepath, checksums, st):
+        try:
+            current = os.stat(filepath)
+        except OSError:
+            return
+        if (current.st_ino, current.st_size, current.st_mtime_ns) == (st.st_ino, st.st_size, st.st_mtime_ns):
+            self.catalog.set_checksum(filepath, checksums, current)
+
+    def _publish_blob(self, final_file, checksums, source_path=None):
+        name = os.path.basename(final_file)
+        if source_path is None:
+            self.blobstore.link(name, checksums['sha256'])
+        else:
+            self.blobstore.store(name, source_path, checksums['sha256'])
+        self.content_cache.invalidate(final_file)
+        self._drop_compressed(final_file)
+        self.catalog.update(final_file)
+        self.catalog.set_checksum(final_file, checksums)
+
+    def _expand_patterns(self, patterns, limit=MAX_BATCH_ITEMS):
+        names = []
+        seen = set()
+        unmatched = []
+        more = False
+        for pattern in patterns:
+            pattern = os.path.basename(pattern)
+            if not pattern:
+                continue
+            if any(c in pattern for c in GLOB_CHARS):
+                wildcard_at = min(i for i, c in enumerate(pattern) if c in GLOB_CHARS)
+                entries, _ = self.catalog.list(prefix=pattern[:wildcard_at])
+                matched = [e['name'] for e in entries if fnmatch.fnmatchcase(e['name'], pattern)]
+                if not matched:
+                    unmatched.append(pattern)
+            else:
+                matched = [pattern]
+            for name in matched:
+                if name in seen:
+                    continue
+                if len(names) >= limit:
+                    more = True
+                    break
+                seen.add(name)
+                names.append(name)
+        return names, unmatched, more
+
     def list(self, params=[]):
         try:
-            filelist = [f for f in os.listdir(UPLOAD_DIR) if os.path.isfile(os.path.join(UPLOAD_DIR, f))]
-            return dict(status='OK', data=filelist)
+            options = self._parse_options(params)
+            limit = min(int(options.get('limit', DEFAULT_LIST_LIMIT)), MAX_LIST_LIMIT)
+            if limit <= 0: raise ValueError("limit must be positive")
+            entries, next_cursor = self.catalog.list(
+                prefix=options.get('prefix', ''),
+                sort=options.get('sort', 'name'),
+                descending=options.get('order', 'asc').lower() == 'desc',
+                limit=limit,
+                cursor=options.get('cursor'))
+        except (ValueError, CatalogError) as e:
+            return dict(status='ERROR', data=f'Invalid LIST option: {str(e)}')
         except Exception as e:
             return dict(status='ERROR', data=str(e))
+        hasil = dict(status='OK', data=[entry['name'] for entry in entries], next_cursor=next_cursor)
+        if options.get('detail', '0') not in ('0', 'false', 'no'):
+            hasil['entries'] = [dict(name=e['name'], size=e['size'], mtime=e['mtime'], checksums=e.get('checksum')) for e in entries]
+        return hasil
             
     def delete(self, params=[]):
         if not params or not params[0]:
@@ -30,11 +221,32 @@ class FileInterface:
             filepath = self._get_full_path(filename)
             if not os.path.exists(filepath):
                 return dict(status='ERROR', data=f"File {filename} not found for deletion")
-            os.remove(filepath)
+            if self.blobstore:
+                self.blobstore.unlink(os.path.basename(filepath))
+            else:
+                os.remove(filepath)
+            self.content_cache.invalidate(filepath)
+            self._drop_compressed(filepath)
+            self.catalog.remove(filename)
             return dict(status='OK', data=f"File {filename} deleted successfully")
         except Exception as e:
             return dict(status='ERROR', data=f"Error during delete: {str(e)}")
 
+    def mdelete(self, params=[]):
+        if not params:
+            return dict(status='ERROR', data='MDELETE requires at least one filename or pattern')
+        try:
+            names, unmatched, more = self._expand_patterns(params)
+        except Exception as e:
+            return dict(status='ERROR', data=f"Error during mdelete: {str(e)}")
+        results = [dict(name=pattern, status='ERROR', data=f"No files match '{pattern}'") for pattern in unmatched]
+        for name in names:
+            hasil = self.delete([name])
+            results.append(dict(name=name, status=hasil['status'], data=hasil['data']))
+        deleted = sum(1 for r in results if r['status'] == 'OK')
+        return dict(status='OK', data=f"{deleted} file(s) deleted, {len(results) - deleted} failed",
+                    deleted=deleted, failed=len(results) - deleted, results=results, more=more)
+
     def upload_initiate(self, params=[]):
         if len(params) < 2:
             return dict(status='ERROR', data='UPLOAD_INITIATE requires client_filename and expected_size')
@@ -48,24 +260,46 @@ class FileInterface:
 
         if not client_filename:
             return dict(status='ERROR', data='Client filename for UPLOAD_INITIATE cannot be empty')
+        try:
+            options = self._parse_options(params[2:])
+            declared_checksums = parse_checksums(options)
+        except ValueError as e:
+            return dict(status='ERROR', data=f'Invalid UPLOAD_INITIATE option: {str(e)}')
+        encoding = choose_codec(options.get('compress', '').lower().split(',')) if expected_size else None
 
-        file_id = str(uuid.uuid4())
         server_filename = os.path.basename(client_filename) 
+        sha256 = declared_checksums.get('sha256')
+        if self.blobstore and sha256 and self.blobstore.has_blob(sha256, expected_size):
+            try:
+                self._publish_blob(self._get_full_path(server_filename), dict(sha256=sha256))
+                return dict(status='OK', data=f"File {client_filename} uploaded successfully (deduplicated).",
+                            deduplicated=True, sha256=sha256, checksums=dict(sha256=sha256))
+            except (OSError, BlobStoreError):
+                pass
+
+        file_id = str(uuid.uuid4())
         server_filepath_part = self._get_full_path(f"{file_id}_{server_filename}.part") 
 
-        self.active_uploads[file_id] = {
-            'original_filename': client_filename,
-            'server_filepath_part': server_filepath_part, 
-            'final_filepath': self._get_full_path(server_filename), 
-            'expected_size': expected_size,
-            'current_size': 0,
-            'status': 'INITIATED'
-        }
+        try:
+            self.sessions.save(file_id, {
+                'original_filename': client_filename,
+                'server_filepath_part': server_filepath_part, 
+                'final_filepath': self._get_full_path(server_filename), 
+                'expected_size': expected_size,
+                'current_size': 0,
+                'declared_checksums': declared_checksums,
+                'status': 'INITIATED'
+            })
+        except OSError as e:
+            self.sessions.drop(file_id)
+            return dict(status='ERROR', data=f'Server failed to register upload: {str(e)}')
         return dict(
             status='READY_FOR_DATA', 
             file_id=file_id,
             server_filepath_to_write=server_filepath_part, 
-            expected_size=expected_size
+            expected_size=expected_size,
+            checksum_algorithms=sorted({DEFAULT_CHECKSUM, *declared_checksums}),
+            encoding=encoding
         )
 
     def upload_finalize(self, params=[]):
@@ -73,31 +307,61 @@ class FileInterface:
             return dict(status='ERROR', data='UPLOAD_FINALIZE requires file_id')
         file_id = params[0]
 
-        upload_info = self.active_uploads.get(file_id)
+        upload_info = self.sessions.get(file_id)
         if not upload_info:
             return dict(status='ERROR', data=f'Invalid file_id for finalize: {file_id}')
+        try:
+            declared_checksums = dict(upload_info.get('declared_checksums') or {})
+            declared_checksums.update(parse_checksums(self._parse_options(params[1:])))
+        except ValueError as e:
+            return dict(status='ERROR', data=f'Invalid UPLOAD_FINALIZE option: {str(e)}')
 
         part_file = upload_info['server_filepath_part']
         final_file = upload_info['final_filepath']
 
-        if upload_info.get('status') != 'CHUNKS_COMPLETE' and upload_info.get('current_size') != upload_info.get('expected_size'):
-             pass
-
         if not os.path.exists(part_file):
             self.upload_abort([file_id]) 
             return dict(status='ERROR', data='Upload data not found for finalization.')
 
+        if 'part_count' in upload_info:
+            missing_parts = self._missing_parts(file_id, upload_info)
+            if missing_parts:
+                return dict(status='ERROR', data=f'{len(missing_parts)} part(s) still missing.', missing_parts=missing_parts)
+        elif upload_info.get('status') != 'CHUNKS_COMPLETE' or upload_info.get('current_size') != upload_info.get('expected_size'):
+            self.upload_abort([file_id])
+            return dict(status='ERROR', data=f'Upload incomplete. Expected {upload_info["expected_size"]}, received {upload_info.get("current_size", 0)}.')
+
         actual_size = os.path.getsize(part_file)
         if actual_size != upload_info['expected_size']:
             self.upload_abort([file_id]) 
             return dict(status='ERROR', data=f'File size mismatch. Expected {upload_info["expected_size"]}, received {actual_size}.')
 
         try:
-            if os.path.exists(final_file):
-                 os.remove(final_file)
-            os.rename(part_file, final_file)
-            del self.active_uploads[file_id]
-            return dict(status='OK', data=f"File {upload_info['original_filename']} uploaded successfully.")
+            checksums = dict(upload_info.get('checksums') or {})
+            required = set(declared_checksums) | ({'sha256'} if self.blobstore else set())
+            if required - set(checksums):
+                checksums.update(file_checksums(part_file, sorted(required - set(checksums))))
+            for algorithm, expected in declared_checksums.items():
+                if checksums[algorithm] != expected:
+                    self.upload_abort([file_id])
+                    return dict(status='ERROR', data=f"Checksum mismatch. Expected {algorithm} {expected}, received {checksums[algorithm]}.")
+            if durability.sync_on_finalize():
+                fsync_path(part_file)
+            if self.blobstore:
+                self._publish_blob(final_file, checksums, part_file)
+                self.sessions.drop(file_id)
+                return dict(status='OK', data=f"File {upload_info['original_filename']} uploaded successfully.",
+                            sha256=checksums['sha256'], checksums=checksums)
+            os.replace(part_file, final_file)
+            if durability.sync_on_finalize():
+                fsync_path(UPLOAD_DIR)
+            self.content_cache.invalidate(final_file)
+            self._drop_compressed(final_file)
+            self.catalog.update(final_file)
+            if checksums:
+                self.catalog.set_checksum(final_file, checksums)
+            self.sessions.drop(file_id)
+            return dict(status='OK', data=f"File {upload_info['original_filename']} uploaded successfully.", checksums=checksums)
         except Exception as e:
             self.upload_abort([file_id]) 
             return dict(status='ERROR', data=f'Server error during file finalization: {str(e)}')
@@ -106,7 +370,7 @@ class FileInterface:
         if not params or not params[0]:
             return dict(status='ERROR', data='UPLOAD_ABORT requires file_id')
         file_id = params[0]
-        upload_info = self.active_uploads.pop(file_id, None) 
+        upload_info = self.sessions.get(file_id) and self.sessions.drop(file_id)
         if upload_info:
             part_file = upload_info['server_filepath_part']
             if os.path.exists(part_file):
@@ -118,6 +382,117 @@ class FileInterface:
         else:
             return dict(status='OK', data=f"Upload {file_id} not found or already aborted.")
 
+    def upload_session_create(self, params=[]):
+        if len(params) < 2:
+            return dict(status='ERROR', data='UPLOAD_SESSION_CREATE requires client_filename and expected_size')
+        client_filename = params[0]
+        try:
+            expected_size = int(params[1])
+            part_size = int(params[2]) if len(params) > 2 else DEFAULT_PART_SIZE
+            if expected_size < 0 or part_size <= 0: raise ValueError("Size invalid")
+        except ValueError:
+            return dict(status='ERROR', data='Invalid expected_size or part_size for UPLOAD_SESSION_CREATE')
+        if not client_filename:
+            return dict(status='ERROR', data='Client filename for UPLOAD_SESSION_CREATE cannot be empty')
+
+        part_size = max(part_size, MIN_PART_SIZE, -(-expected_size // MAX_PART_COUNT))
+        part_count = max(1, -(-expected_size // part_size))
+        file_id = str(uuid.uuid4())
+        server_filename = os.path.basename(client_filename)
+        server_filepath_part = self._get_full_path(f"{file_id}_{server_filename}.part")
+        upload_info = {
+            'original_filename': client_filename,
+            'server_filepath_part': server_filepath_part,
+            'final_filepath': self._get_full_path(server_filename),
+            'expected_size': expected_size,
+            'current_size': 0,
+            'part_size': part_size,
+            'part_count': part_count,
+            'status': 'MULTIPART'
+        }
+        try:
+            self.sessions.save(file_id, upload_info)
+            os.makedirs(self.sessions.parts_dir(file_id), exist_ok=True)
+            fd = os.open(server_filepath_part, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                if expected_size and hasattr(os, 'posix_fallocate'):
+                    try: os.posix_fallocate(fd, 0, expected_size)
+                    except OSError: os.ftruncate(fd, expected_size)
+                else:
+                    os.ftruncate(fd, expected_size)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            self.upload_abort([file_id])
+            if os.path.exists(server_filepath_part):
+                os.remove(server_filepath_part)
+            return dict(status='ERROR', data=f'Server failed to create upload session: {str(e)}')
+        return dict(status='OK', file_id=file_id, part_size=part_size, part_count=part_count, expected_size=expected_size)
+
+    def upload_part(self, params=[]):
+        if len(params) < 2:
+            return dict(status='ERROR', data='UPLOAD_PART requires file_id and part_index')
+        file_id = params[0]
+        upload_info = self.sessions.get(file_id)
+        if not upload_info or 'part_count' not in upload_info:
+            return dict(status='ERROR', data=f'Invalid multipart file_id: {file_id}')
+        try:
+            part_index = int(params[1])
+            if not 0 <= part_index < upload_info['part_count']: raise ValueError("Part out of range")
+        except ValueError:
+            return dict(status='ERROR', data=f"Invalid part_index, expected 0..{upload_info['part_count'] - 1}")
+        offset, length = self._part_range(upload_info, part_index)
+        return dict(
+            status='READY_FOR_DATA',
+            file_id=file_id,
+            part_index=part_index,
+            server_filepath_to_write=upload_info['server_filepath_part'],
+            offset=offset,
+            expected_size=length
+        )
+
+    def upload_session_status(self, params=[]):
+        if not params or not params[0]:
+            return dict(status='ERROR', data='UPLOAD_SESSION_STATUS requires file_id')
+        file_id = params[0]
+        upload_info = self.sessions.get(file_id)
+        if not upload_info or 'part_count' not in upload_info:
+            return dict(status='ERROR', data=f'Invalid multipart file_id: {file_id}')
+        missing_parts = self._missing_parts(file_id, upload_info)
+        missing_ranges = []
+        for part_index in missing_parts:
+            offset, length = self._part_range(upload_info, part_index)
+            if missing_ranges and missing_ranges[-1][1] == offset:
+                missing_ranges[-1][1] = offset + length
+            else:
+                missing_ranges.append([offset, offset + length])
+        return dict(
+            status='OK',
+            file_id=file_id,
+            expected_size=upload_info['expected_size'],
+            part_size=upload_info['part_size'],
+            part_count=upload_info['part_count'],
+            missing_parts=missing_parts,
+            missing_ranges=missing_ranges
+        )
+
+    def upload_session_complete(self, params=[]):
+        if not params or not params[0]:
+            return dict(status='ERROR', data='UPLOAD_SESSION_COMPLETE requires file_id')
+        file_id = params[0]
+        upload_info = self.sessions.get(file_id)
+        if not upload_info or 'part_count' not in upload_info:
+            return dict(status='ERROR', data=f'Invalid multipart file_id: {file_id}')
+        return self.upload_finalize([file_id] + list(params[1:]))
+
+    def cache_stats(self, params=[]):
+        return dict(status='OK', data=self.content_cache.stats())
+
+    def storage_stats(self, params=[]):
+        if not self.blobstore:
+            return dict(status='OK', data=dict(mode=self.storage_mode))
+        return dict(status='OK', data=dict(mode=self.storage_mode, **self.blobstore.stats()))
+
     def get_stream_initiate(self, params=[]):
         if not params or not params[0]:
             return dict(status='ERROR', data='GET_STREAM_INITIATE requires a filename')
@@ -128,16 +503,100 @@ class FileInterface:
 
         filepath_to_read = self._get_full_path(filename_to_send)
 
-        if not os.path.exists(filepath_to_read) or not os.path.isfile(filepath_to_read):
+        try:
+            st = os.stat(filepath_to_read)
+        except OSError:
+            st = None
+        if st is None or not stat.S_ISREG(st.st_mode):
             return dict(status='ERROR', data=f"File '{filename_to_send}' not found on server.")
         try:
-            expected_size = os.path.getsize(filepath_to_read)
+            file_size = st.st_size
+            try:
+                positional, options = self._split_params(params[1:])
+                offset = int(positional[0]) if len(positional) > 0 else 0
+                length = int(positional[1]) if len(positional) > 1 else file_size - offset
+                if offset < 0 or length < 0 or offset > file_size: raise ValueError("Range invalid")
+            except ValueError:
+                return dict(status='ERROR', data=f"Invalid byte range for '{filename_to_send}' (size {file_size}).")
+            expected_size = min(length, file_size - offset)
+            codec = choose_codec(options.get('compress', '').lower().split(','))
+            if codec and offset == 0 and expected_size == file_size and file_size >= COMPRESSION_MIN_FILE_SIZE:
+                compressed_path = self._compressed_copy(filepath_to_read, st, codec)
+                if compressed_path:
+                    return dict(
+                        status='READY_TO_SEND_DATA',
+                        file_id=str(uuid.uuid4()),
+                        server_filepath_to_read=compressed_path,
+                        offset=0,
+                        expected_size=os.path.getsize(compressed_path),
+                        file_size=file_size,
+                        checksums=self.catalog.get_checksum(filepath_to_read, st),
+                        encoding=codec
+                    )
+            cached = self.content_cache.fetch(filepath_to_read, st) if expected_size else None
+            checksums = self.catalog.get_checksum(filepath_to_read, st)
+            if checksums is None and cached is not None:
+                checksum = RunningChecksum()
+                checksum.update(cached)
+                checksums = checksum.hexdigests()
+                self.catalog.set_checksum(filepath_to_read, checksums, st)
             file_id_for_log = str(uuid.uuid4())
             return dict(
                 status='READY_TO_SEND_DATA',
                 file_id=file_id_for_log,
                 server_filepath_to_read=filepath_to_read,
-                expected_size=expected_size
+                offset=offset,
+                expected_size=expected_size,
+                file_size=file_size,
+                checksums=checksums
             )
         except Exception as e:
-            return dict(status='ERROR', data=f"Server error preparing file '{filename_to_send}': {str(e)}")
\ No newline at end of file
+            return dict(status='ERROR', data=f"Server error preparing file '{filename_to_send}': {str(e)}")
+
+    def mget(self, params=[]):
+        if not params:
+            return dict(status='ERROR', data='MGET requires at least one filename or pattern')
+        try:
+            names, unmatched, more = self._expand_patterns(params)
+        except Exception as e:
+            return dict(status='ERROR', data=f"Error during mget: {str(e)}")
+        errors = [dict(name=pattern, data=f"No files match '{pattern}'") for pattern in unmatched]
+        deferred = []
+        remaining = []
+        parts = []
+        files = 0
+        total = 0
+        for index, name in enumerate(names):
+            filepath = self._get_full_path(name)
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                st = None
+            if st is None or not stat.S_ISREG(st.st_mode):
+                errors.append(dict(name=name, data=f"File '{name}' not found on server."))
+                continue
+            if st.st_size > MGET_MAX_BYTES:
+                deferred.append(name)
+                continue
+            if total + st.st_size > MGET_MAX_BYTES:
+                remaining = names[index:]
+                break
+            data = self.content_cache.fetch(filepath, st)
+            if data is None:
+                try:
+                    with open(filepath, 'rb') as f:
+                        data = f.read(MGET_MAX_BYTES - total + 1)
+                except OSError as e:
+                    errors.append(dict(name=name, data=f"Could not read '{name}': {str(e)}"))
+                    continue
+                if total + len(data) > MGET_MAX_BYTES:
+                    remaining = names[index:]
+                    break
+            encoded_name = name.encode('utf-8')
+            parts.append(MGET_HEADER.pack(len(encoded_name), len(data), zlib.crc32(data)))
+            parts.append(encoded_name)
+            parts.append(data)
+            files += 1
+            total += len(data)
+        return dict(status='OK', files=files, expected_size=sum(len(part) for part in parts), errors=errors,
+                    deferred=deferred, remaining=remaining, more=more, payload=parts)
@@ -0,0 +1,163 @@
+import os
+import time
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_PREFIX = 'file_server_'
+
+METRICS = {
+    'commands_total': ('counter', 'Commands processed, by command'),
+    'command_errors_total': ('counter', 'Commands answered with status ERROR, by command'),
+    'command_seconds': ('histogram', 'Time spent in the command handler, by command'),
+    'bytes_received_total': ('counter', 'Bytes read from client sockets'),
+    'bytes_sent_total': ('counter', 'Bytes written to client sockets'),
+    'connections_total': ('counter', 'Accepted client connections'),
+    'connections_active': ('gauge', 'Client connections currently being served'),
+    'pool_queue_depth': ('gauge', 'Accepted connections waiting for a worker thread'),
+    'transfers_total': ('counter', 'Completed file transfers, by direction'),
+    'transfer_disk_seconds': ('histogram', 'Disk I/O time per file transfer, by direction'),
+    'transfer_socket_seconds': ('histogram', 'Socket I/O time per file transfer, by direction'),
+    'errors_total': ('counter', 'Connection-level errors, by type'),
+    'admission_rejected_total': ('counter', 'Connections or transfers answered with BUSY, by reason'),
+    'rate_limit_wait_seconds_total': ('counter', 'Time transfers spent waiting for rate limit tokens, by direction'),
+    'upload_sessions_live': ('gauge', 'Upload sessions held in the session registry'),
+    'upload_sessions_reaped_total': ('counter', 'Upload sessions or orphaned part files removed by the reaper, by reason'),
+    'upload_reclaimed_bytes_total': ('counter', 'Bytes of part files removed by the session reaper'),
+}
+
+class _Histogram:
+    __slots__ = ('buckets', 'count', 'total')
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+class Metrics:
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = ({}, {})
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, value=1, labels=()):
+        values = self._shard()[0]
+        key = (name, labels)
+        values[key] = values.get(key, 0) + value
+
+    def observe(self, name, seconds, labels=()):
+        histograms = self._shard()[1]
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = _Histogram()
+        histogram.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        histogram.count += 1
+        histogram.total += seconds
+
+    def _merged(self):
+        with self._lock:
+            shards = list(self._shards)
+        values = {}
+        histograms = {}
+        for shard_values, shard_histograms in shards:
+            for key, value in dict(shard_values).items():
+                values[key] = values.get(key, 0) + value
+            for key, histogram in dict(shard_histograms).items():
+                merged = histograms.setdefault(key, _Histogram())
+                merged.buckets = [a + b for a, b in zip(merged.buckets, histogram.buckets)]
+                merged.count += histogram.count
+                merged.total += histogram.total
+        return values, histograms
+
+    def _quantile(self, histogram, q):
+        if not histogram.count:
+            return None
+        rank = q * histogram.count
+        seen = 0
+        for index, count in enumerate(histogram.buckets):
+            seen += count
+            if seen >= rank:
+                return LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else float('inf')
+        return None
+
+    def snapshot(self):
+        values, histograms = self._merged()
+        hasil = dict(pid=os.getpid(), uptime=time.time() - self.started, counters={}, gauges={}, histograms={})
+        for (name, labels), value in sorted(values.items()):
+            kind = 'gauges' if METRICS.get(name, ('counter',))[0] == 'gauge' else 'counters'
+            hasil[kind][_format_key(name, labels)] = value
+        for (name, labels), histogram in sorted(histograms.items()):
+            hasil['histograms'][_format_key(name, labels)] = dict(
+                count=histogram.count,
+                sum=histogram.total,
+                p50=self._quantile(histogram, 0.5),
+                p90=self._quantile(histogram, 0.9),
+                p99=self._quantile(histogram, 0.99))
+        return hasil
+
+    def prometheus_text(self):
+        values, histograms = self._merged()
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            full_name = METRIC_PREFIX + name
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            if kind == 'histogram':
+                for (metric, labels), histogram in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), histogram.buckets):
+                        cumulative += count
+                        lines.append(f"{full_name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{full_name}_sum{_format_labels(labels)} {histogram.total}")
+                    lines.append(f"{full_name}_count{_format_labels(labels)} {histogram.count}")
+            else:
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{full_name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+def _format_key(name, labels):
+    return name + _format_labels(labels)
+
+registry = Metrics()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = registry.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port, address='0.0.0.0'):
+    httpd = ThreadingHTTPServer((address, port), _MetricsHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name="MetricsHTTP", daemon=True).start()
+    return httpd
@@ -1,44 +1,212 @@
-import json
 import logging
+import os
 import shlex
+import struct
+import time
 
 from file_interface import FileInterface
+from file_metrics import registry as metrics
+from file_ratelimit import SCOPES as RATE_LIMIT_SCOPES, limiter, parse_rate
+
+PROTOCOL_V1 = 1
+PROTOCOL_V2 = 2
+SUPPORTED_PROTOCOLS = (PROTOCOL_V1, PROTOCOL_V2)
+ADMIN_TOKEN = os.environ.get('FILE_ADMIN_TOKEN')
+
+FRAME_MAGIC = 0xF2
+FRAME_HEADER = struct.Struct('!BBBHQ')
+PARAM_COUNT = struct.Struct('!H')
+PARAM_LEN = struct.Struct('!H')
+
+FLAG_JSON_HEADER = 0x01
+
+OP_COMMAND = 0x00
+OP_LIST = 0x01
+OP_DELETE = 0x02
+OP_MDELETE = 0x03
+OP_UPLOAD_INITIATE = 0x10
+OP_UPLOAD_FINALIZE = 0x11
+OP_UPLOAD_ABORT = 0x12
+OP_UPLOAD_SESSION_CREATE = 0x13
+OP_UPLOAD_PART = 0x14
+OP_UPLOAD_SESSION_STATUS = 0x15
+OP_UPLOAD_SESSION_COMPLETE = 0x16
+OP_GET_STREAM_INITIATE = 0x20
+OP_MGET = 0x21
+OP_RESPONSE = 0x7F
+
+OPCODE_COMMANDS = {
+    OP_LIST: 'list',
+    OP_DELETE: 'delete',
+    OP_MDELETE: 'mdelete',
+    OP_UPLOAD_INITIATE: 'upload_initiate',
+    OP_UPLOAD_FINALIZE: 'upload_finalize',
+    OP_UPLOAD_ABORT: 'upload_abort',
+    OP_UPLOAD_SESSION_CREATE: 'upload_session_create',
+    OP_UPLOAD_PART: 'upload_part',
+    OP_UPLOAD_SESSION_STATUS: 'upload_session_status',
+    OP_UPLOAD_SESSION_COMPLETE: 'upload_session_complete',
+    OP_GET_STREAM_INITIATE: 'get_stream_initiate',
+    OP_MGET: 'mget',
+}
+
+class FrameError(ValueError):
+    pass
+
+def tokenize(command_str):
+    if '"' in command_str or "'" in command_str or '\\' in command_str:
+        return shlex.split(command_str)
+    return command_str.split()
+
+def pack_params(params):
+    parts = [PARAM_COUNT.pack(len(params))]
+    for param in params:
+        encoded = str(param).encode('utf-8')
+        parts.append(PARAM_LEN.pack(len(encoded)))
+        parts.append(encoded)
+    return b''.join(parts)
+
+def unpack_params(header):
+    view = memoryview(header)
+    if len(view) < PARAM_COUNT.size:
+        raise FrameError('Frame header too short')
+    (count,) = PARAM_COUNT.unpack_from(view, 0)
+    pos = PARAM_COUNT.size
+    params = []
+    for _ in range(count):
+        if pos + PARAM_LEN.size > len(view):
+            raise FrameError('Truncated parameter length')
+        (length,) = PARAM_LEN.unpack_from(view, pos)
+        pos += PARAM_LEN.size
+        if pos + length > len(view):
+            raise FrameError('Truncated parameter')
+        params.append(bytes(view[pos:pos + length]).decode('utf-8'))
+        pos += length
+    return params
+
+def encode_frame(opcode, header=b'', body_len=0, flags=0):
+    return FRAME_HEADER.pack(FRAME_MAGIC, opcode, flags, len(header), body_len) + header
+
+def decode_frame_header(data):
+    magic, opcode, flags, header_len, body_len = FRAME_HEADER.unpack_from(data, 0)
+    if magic != FRAME_MAGIC:
+        raise FrameError('Bad frame magic')
+    return opcode, flags, header_len, body_len
+
+def encode_response(response_str, protocol_version=PROTOCOL_V1):
+    if protocol_version == PROTOCOL_V2:
+        return encode_frame(OP_RESPONSE, response_str.encode('utf-8'), flags=FLAG_JSON_HEADER)
+    return (response_str + "\r\n\r\n").encode()
 
 class FileProtocol:
     def __init__(self):
         self.file_interface = FileInterface() 
+        self.handlers = {
+            'hello': self.hello,
+            'list': self.file_interface.list,
+            'delete': self.file_interface.delete,
+            'mdelete': self.file_interface.mdelete,
+            'upload_initiate': self.file_interface.upload_initiate,
+            'upload_finalize': self.file_interface.upload_finalize,
+            'upload_abort': self.file_interface.upload_abort,
+            'upload_session_create': self.file_interface.upload_session_create,
+            'upload_part': self.file_interface.upload_part,
+            'upload_session_status': self.file_interface.upload_session_status,
+            'upload_session_complete': self.file_interface.upload_session_complete,
+            'get_stream_initiate': self.file_interface.get_stream_initiate,
+            'mget': self.file_interface.mget,
+            'cache_stats': self.file_interface.cache_stats,
+            'storage_stats': self.file_interface.storage_stats,
+            'stats': self.stats,
+            'rate_limit': self.rate_limit,
+        }
+
+    def hello(self, params=[]):
+        try:
+            requested = int(params[0]) if params else PROTOCOL_V1
+        except ValueError:
+            return dict(status='ERROR', data='HELLO requires a numeric protocol version')
+        version = max(v for v in SUPPORTED_PROTOCOLS if v <= max(requested, PROTOCOL_V1))
+        return dict(status='OK', protocol=version)
+
+    def stats(self, params=[]):
+        hasil = metrics.snapshot()
+        hasil['cache'] = self.file_interface.content_cache.stats()
+        return dict(status='OK', data=hasil)
 
-    def proses_string(self, string_datamasuk=''):
+    def rate_limit(self, params=[]):
+        try:
+            options = self.file_interface._parse_options(params)
+        except ValueError as ve:
+            return dict(status='ERROR', data=str(ve))
+        if not limiter.enforced:
+            return dict(status='ERROR', data='RATE_LIMIT tidak didukung oleh engine server ini')
+        if not ADMIN_TOKEN:
+            return dict(status='ERROR', data='RATE_LIMIT nonaktif, jalankan server dengan FILE_ADMIN_TOKEN')
+        if options.pop('token', None) != ADMIN_TOKEN:
+            return dict(status='ERROR', data='RATE_LIMIT membutuhkan token admin yang valid')
+        rates = {}
+        for scope, value in options.items():
+            if scope not in RATE_LIMIT_SCOPES:
+                return dict(status='ERROR', data=f"Scope '{scope}' tidak dikenali, gunakan {', '.join(RATE_LIMIT_SCOPES)}")
+            try:
+                rates[scope] = parse_rate(value)
+            except ValueError as ve:
+                return dict(status='ERROR', data=str(ve))
+        if rates:
+            limiter.configure(**rates)
+        return dict(status='OK', data=limiter.settings())
+
+    def handle_frame(self, opcode, header=b''):
+        try:
+            params = unpack_params(header)
+        except (FrameError, UnicodeDecodeError) as fe:
+            return '', dict(status='ERROR', data=f'Invalid frame: {fe}')
+        if opcode == OP_COMMAND:
+            if not params:
+                return '', dict(status='ERROR', data='Request kosong')
+            return self.dispatch(params[0].lower(), params[1:])
+        c_request = OPCODE_COMMANDS.get(opcode)
+        if c_request is None:
+            return '', dict(status='ERROR', data=f'Opcode {opcode} tidak dikenali')
+        return self.dispatch(c_request, params)
+
+    def handle_string(self, string_datamasuk=''):
         string_datamasuk_cleaned = string_datamasuk.strip()
         try:
-            tokens = shlex.split(string_datamasuk_cleaned)
+            tokens = tokenize(string_datamasuk_cleaned)
         except ValueError as sve:
             logging.error(f"Shlex parsing error for input '{string_datamasuk_cleaned[:100]}...': {sve}")
-            return json.dumps(dict(status='ERROR', data='Invalid command format: Check quoting or special characters.'))
-            
+            return '', dict(status='ERROR', data='Invalid command format: Check quoting or special characters.')
+
         if not tokens:
-            return json.dumps(dict(status='ERROR', data='Request kosong'))
-        
-        c_request = tokens[0].lower() 
-        
-        params = tokens[1:]
+            return '', dict(status='ERROR', data='Request kosong')
+        return self.dispatch(tokens[0].lower(), tokens[1:])
 
+    def dispatch(self, c_request, params):
+        handler = self.handlers.get(c_request)
+        if handler is None:
+            logging.warning(f"Unknown command received: {c_request}")
+            metrics.inc('command_errors_total', labels=(('command', 'unknown'),))
+            return c_request, dict(status='ERROR', data=f'Request "{c_request}" tidak dikenali')
+        labels = (('command', c_request),)
+        started = time.perf_counter()
         try:
-            if hasattr(self.file_interface, c_request):
-                method_to_call = getattr(self.file_interface, c_request)
-                hasil = method_to_call(params)
-                return json.dumps(hasil)
-            else:
-                logging.warning(f"Unknown command received: {c_request}")
-                return json.dumps(dict(status='ERROR', data=f'Request "{c_request}" tidak dikenali'))
-        
+            hasil = handler(params)
+            metrics.observe('command_seconds', time.perf_counter() - started, labels)
+            metrics.inc('commands_total', labels=labels)
+            if hasil.get('status') == 'ERROR':
+                metrics.inc('command_errors_total', labels=labels)
+            return c_request, hasil
         except TypeError as te:
+            metrics.inc('command_errors_total', labels=labels)
             logging.error(f"TypeError calling {c_request} with params {params}: {te}", exc_info=True)      
-            return json.dumps(dict(status='ERROR', data=f'Internal server error: Type error processing request "{c_request}". Check parameters.'))
+            return c_request, dict(status='ERROR', data=f'Internal server error: Type error processing request "{c_request}". Check parameters.')
         except Exception as e:
+            metrics.inc('command_errors_total', labels=labels)
             logging.error(f"Error processing command '{c_request}' with params {params}: {e}", exc_info=True)
-            return json.dumps(dict(status='ERROR', data=f'Error internal server: {str(e)}'))
+            return c_request, dict(status='ERROR', data=f'Error internal server: {str(e)}')
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
-    fp = FileProtocol()
\ No newline at end of file
+    fp = FileProtocol()
@@ -0,0 +1,122 @@
+import time
+import threading
+
+SCOPES = ('global', 'per_ip', 'per_connection')
+RATE_UNITS = {'': 1, 'k': 1024, 'm': 1024 * 1024, 'g': 1024 * 1024 * 1024}
+MIN_BURST = 64 * 1024
+BURST_SECONDS = 0.25
+SMALL_TRANSFER_BYTES = 64 * 1024
+SHAPED_CHUNK_SIZE = 256 * 1024
+
+def parse_rate(value):
+    text = str(value).strip().lower()
+    if text in ('', '0', 'off', 'none'):
+        return None
+    if text.endswith('b'):
+        text = text[:-1]
+    unit = text[-1] if text and text[-1] in RATE_UNITS else ''
+    number = text[:-1] if unit else text
+    try:
+        rate = int(float(number) * RATE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"Invalid rate '{value}', expected bytes/s such as 512k or 10M")
+    if rate < 0:
+        raise ValueError(f"Invalid rate '{value}', must not be negative")
+    return rate or None
+
+class TokenBucket:
+    def __init__(self, rate=None):
+        self._lock = threading.Lock()
+        self.configure(rate)
+
+    def configure(self, rate):
+        with self._lock:
+            self.rate = rate or None
+            self.burst = max(MIN_BURST, self.rate * BURST_SECONDS) if self.rate else 0
+            self.tokens = self.burst
+            self.updated = time.monotonic()
+
+    def reserve(self, amount):
+        with self._lock:
+            if not self.rate:
+                return 0.0
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+class ConnectionShaper:
+    def __init__(self, limiter, ip, ip_bucket):
+        self.limiter = limiter
+        self.ip = ip
+        self.ip_bucket = ip_bucket
+        self.bucket = TokenBucket(limiter.rates['per_connection'])
+
+    def limited(self):
+        return bool(self.bucket.rate or self.ip_bucket.rate or self.limiter.global_bucket.rate)
+
+    def reserve(self, amount, interactive=False):
+        waits = [bucket.reserve(amount) for bucket in (self.bucket, self.ip_bucket, self.limiter.global_bucket)]
+        return 0.0 if interactive else max(waits)
+
+    def throttle(self, amount, interactive=False):
+        wait = self.reserve(amount, interactive)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def close(self):
+        self.limiter.release(self)
+
+class RateLimiter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rates = dict.fromkeys(SCOPES)
+        self.global_bucket = TokenBucket()
+        self.ip_buckets = {}
+        self.shapers = set()
+        self.enforced = False
+
+    def configure(self, **rates):
+        with self._lock:
+            for scope, rate in rates.items():
+                if scope not in SCOPES:
+                    raise ValueError(f"Unknown rate limit scope '{scope}'")
+                self.rates[scope] = rate or None
+            if 'global' in rates:
+                self.global_bucket.configure(self.rates['global'])
+            if 'per_ip' in rates:
+                for bucket, _ in self.ip_buckets.values():
+                    bucket.configure(self.rates['per_ip'])
+            if 'per_connection' in rates:
+                for shaper in self.shapers:
+                    shaper.bucket.configure(self.rates['per_connection'])
+
+    def open(self, address):
+        ip = address[0] if address else None
+        with self._lock:
+            entry = self.ip_buckets.get(ip)
+            if entry is None:
+                entry = self.ip_buckets[ip] = [TokenBucket(self.rates['per_ip']), 0]
+            entry[1] += 1
+            shaper = ConnectionShaper(self, ip, entry[0])
+            self.shapers.add(shaper)
+        return shaper
+
+    def release(self, shaper):
+        with self._lock:
+            if shaper not in self.shapers:
+                return
+            self.shapers.discard(shaper)
+            entry = self.ip_buckets.get(shaper.ip)
+            if entry:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self.ip_buckets[shaper.ip]
+
+    def settings(self):
+        with self._lock:
+            return dict(self.rates, connections=len(self.shapers), clients=len(self.ip_buckets))
+
+limiter = RateLimiter()
@@ -1,87 +1,586 @@
-from socket import *
+import os
+import json
+import errno
+import time
 import socket
-import threading
 import logging
-import time
-import sys
-import json
+import selectors
+import itertools
+import collections
+from concurrent.futures import ThreadPoolExecutor
 
-from file_protocol import FileProtocol
+from file_protocol import FileProtocol, FrameError, FRAME_HEADER, PROTOCOL_V1, PROTOCOL_V2, decode_frame_header, encode_response
+from file_transfer import BlockDecoder, RunningChecksum, UploadWriter, durability
+from file_metrics import registry as metrics
 fp = FileProtocol()
 
+STATE_EXPECT_COMMAND = 0
+STATE_EXPECT_FILEDATA = 1
+STATE_SENDING_FILEDATA = 2
+
+MAX_COMMAND_SIZE = 64 * 1024
+RECV_CHUNK_SIZE = 256 * 1024
+READ_CHUNK_SIZE = 256 * 1024
+SENDFILE_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_PENDING_SEND = 1024 * 1024
+SEND_IOV_MAX = 64
+CLIENT_TIMEOUT = 120.0
+SWEEP_INTERVAL = 1.0
+ACCEPT_BACKOFF = 0.5
+ACCEPT_RESOURCE_ERRORS = (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM)
+
+def _run_job(func, args):
+    try:
+        return func(*args), None
+    except Exception as e:
+        return None, e
+
+def _write_upload_chunk(transfer, data):
+    started = time.perf_counter()
+    blocks = transfer['decoder'].feed(data) if transfer['decoder'] else (data,)
+    for block in blocks:
+        transfer['file_handle'].write(block)
+        if transfer['checksum']:
+            transfer['checksum'].update(block)
+        transfer['current_size'] += len(block)
+    transfer['disk_time'] += time.perf_counter() - started
+
+def _finish_upload(transfer):
+    started = time.perf_counter()
+    transfer['file_handle'].close()
+    transfer['disk_time'] += time.perf_counter() - started
+    checksum = transfer['checksum']
+    if transfer['part_index'] is None:
+        fp.file_interface._mark_chunks_complete(transfer['file_id'], transfer['current_size'], checksum.hexdigests() if checksum else None)
+        return None
+    return fp.file_interface._mark_part_complete(transfer['file_id'], transfer['part_index'])
 
-class ProcessTheClient(threading.Thread):
-    def __init__(self, connection, address):
+def _read_download_chunk(send, size):
+    started = time.perf_counter()
+    chunk = os.pread(send['file_handle'].fileno(), size, send['offset'] + send['bytes_queued'])
+    send['disk_time'] += time.perf_counter() - started
+    if send['checksum']:
+        send['checksum'].update(chunk)
+    return chunk
+
+def _sendfile_chunk(sock_fd, send, size):
+    started = time.perf_counter()
+    try:
+        sent = os.sendfile(sock_fd, send['file_handle'].fileno(), send['offset'] + send['bytes_queued'], size)
+    except BlockingIOError:
+        return None
+    finally:
+        send['socket_time'] += time.perf_counter() - started
+    return sent
+
+def _finish_download(send):
+    if send['checksum']:
+        fp.file_interface._record_checksums(send['server_filepath_to_read'], send['checksum'].hexdigests(),
+                                            os.fstat(send['file_handle'].fileno()))
+    send['file_handle'].close()
+
+def _open_upload(transfer):
+    os.makedirs(os.path.dirname(transfer['server_filepath_to_write']), exist_ok=True)
+    return UploadWriter(transfer['server_filepath_to_write'], transfer['expected_size'], transfer['offset'])
+
+def _cleanup_transfers(transfer, send):
+    for state in (transfer, send):
+        handle = state.get('file_handle')
+        if handle and not handle.closed:
+            try: handle.close()
+            except Exception: pass
+    if transfer.get('file_id') and transfer.get('part_index') is None:
+        try: fp.file_interface.upload_abort([transfer['file_id']])
+        except Exception: pass
+
+class ProcessTheClient:
+    def __init__(self, server, connection, address):
+        self.server = server
         self.connection = connection
         self.address = address
-        threading.Thread.__init__(self)
+        self.fd = connection.fileno()
+        self.current_state = STATE_EXPECT_COMMAND
+        self.active_file_transfer = {}
+        self.active_file_send = {}
+        self.protocol_version = PROTOCOL_V1
+        self.command_buffer = bytearray()
+        self.scan_from = 0
+        self.pending_send = collections.deque()
+        self.pending_send_bytes = 0
+        self.busy = False
+        self.closing = False
+        self.closed = False
+        self.registered_mask = 0
+        self.last_activity = time.monotonic()
 
-    def run(self):
-        command_buffer = ""
-        while True:
+    def _queue_send(self, payload):
+        if payload:
+            self.pending_send.append(memoryview(payload))
+            self.pending_send_bytes += len(payload)
+
+    def _send_response(self, response_str):
+        self._queue_send(encode_response(response_str, self.protocol_version))
+
+    def _send_error(self, message, close=False):
+        self._send_response(json.dumps({'status': 'ERROR', 'data': message}))
+        if close:
+            self.closing = True
+
+    def _record_transfer(self, direction, transfer):
+        labels = (('direction', direction),)
+        metrics.inc('transfers_total', labels=labels)
+        metrics.observe('transfer_disk_seconds', transfer['disk_time'], labels)
+        metrics.observe('transfer_socket_seconds', transfer['socket_time'], labels)
+
+    def _submit(self, func, args, callback):
+        self.busy = True
+        self.server.submit(self, func, args, callback)
+
+    def wanted_events(self):
+        if self.closed:
+            return 0
+        events = 0
+        if not self.busy and not self.closing and self.pending_send_bytes < MAX_PENDING_SEND and \
+           (self.current_state == STATE_EXPECT_COMMAND or
+            (self.current_state == STATE_EXPECT_FILEDATA and not self.command_buffer)):
+            events |= selectors.EVENT_READ
+        if self.pending_send or (self.current_state == STATE_SENDING_FILEDATA and not self.busy and
+                                 self.active_file_send.get('use_sendfile')):
+            events |= selectors.EVENT_WRITE
+        return events
+
+    def _next_command(self):
+        if self.protocol_version == PROTOCOL_V2:
+            if len(self.command_buffer) < FRAME_HEADER.size:
+                return None
+            opcode, flags, header_len, body_len = decode_frame_header(self.command_buffer)
+            if body_len:
+                raise FrameError('Command frames do not carry a body')
+            frame_len = FRAME_HEADER.size + header_len
+            if len(self.command_buffer) < frame_len:
+                return None
+            header = bytes(self.command_buffer[FRAME_HEADER.size:frame_len])
+            del self.command_buffer[:frame_len]
+            return fp.handle_frame, (opcode, header)
+
+        end = self.command_buffer.find(b"\r\n\r\n", self.scan_from)
+        if end < 0:
+            self.scan_from = max(0, len(self.command_buffer) - 3)
+            return None
+        complete_command_str = self.command_buffer[:end].decode('utf-8', errors='ignore')
+        del self.command_buffer[:end + 4]
+        self.scan_from = 0
+        return fp.handle_string, (complete_command_str,)
+
+    def on_readable(self):
+        try:
+            data_chunk = self.connection.recv(RECV_CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        if not data_chunk:
+            self.close()
+            return
+        self.last_activity = time.monotonic()
+        metrics.inc('bytes_received_total', len(data_chunk))
+        self.command_buffer += data_chunk
+        self.process()
+
+    def on_writable(self):
+        while self.pending_send:
+            buffers = list(itertools.islice(self.pending_send, SEND_IOV_MAX))
             try:
-                data_chunk = self.connection.recv(4096) 
-                if not data_chunk:
-                    break
-
-                command_buffer += data_chunk.decode()
-                
-                while "\r\n\r\n" in command_buffer:
-                    complete_command, command_buffer = command_buffer.split("\r\n\r\n", 1)
-                    
-                    hasil = fp.proses_string(complete_command) 
-                    
-                    response_to_send = hasil + "\r\n\r\n"
-                    self.connection.sendall(response_to_send.encode())
-
-            except ConnectionResetError:
-                logging.warning(f"Connection reset by client {self.address}.")
-                break
-            
-            except socket.timeout:
-                logging.warning(f"Socket timeout for client {self.address}.")
-                break
-            
-            except Exception as e:
-                logging.error(f"Error processing client {self.address}: {e}", exc_info=True)
-                try:
-                    error_response = json.dumps({'status': 'ERROR', 'data': f'Server processing error: {str(e)}'}) + "\r\n\r\n"
-                    self.connection.sendall(error_response.encode())
-                except Exception as send_err:
-                    logging.error(f"Failed to send error response to {self.address}: {send_err}")
-                break
+                sent = self.connection.sendmsg(buffers)
+            except BlockingIOError:
+                return
+            self.last_activity = time.monotonic()
+            metrics.inc('bytes_sent_total', sent)
+            self.pending_send_bytes -= sent
+            if sent < sum(len(view) for view in buffers):
+                while sent >= len(self.pending_send[0]):
+                    sent -= len(self.pending_send.popleft())
+                self.pending_send[0] = self.pending_send[0][sent:]
+                return
+            for _ in buffers:
+                self.pending_send.popleft()
+        if self.closing:
+            self.close()
+            return
+        if self.current_state == STATE_SENDING_FILEDATA and not self.busy and self.active_file_send.get('use_sendfile'):
+            remaining = self.active_file_send['expected_size'] - self.active_file_send['bytes_queued']
+            self._submit(_sendfile_chunk, (self.fd, self.active_file_send, min(SENDFILE_CHUNK_SIZE, remaining)), self._on_sendfile_done)
+            return
+        self.process()
+
+    def process(self):
+        if self.busy or self.closing or self.closed:
+            return
+        if self.current_state == STATE_EXPECT_COMMAND:
+            next_command = self._next_command()
+            if next_command is None:
+                if len(self.command_buffer) > MAX_COMMAND_SIZE:
+                    metrics.inc('errors_total', labels=(('type', 'command_too_long'),))
+                    self._send_error('Command too long.', close=True)
+                return
+            handler, args = next_command
+            self._submit(handler, args, self._on_command_done)
+
+        elif self.current_state == STATE_EXPECT_FILEDATA:
+            transfer = self.active_file_transfer
+            remaining = transfer['expected_size'] - transfer['current_size']
+            if remaining <= 0:
+                self._submit(_finish_upload, (transfer,), self._on_upload_finished)
+                return
+            if not self.command_buffer:
+                return
+            wanted = min(RECV_CHUNK_SIZE, transfer['decoder'].wanted() if transfer['decoder'] else remaining)
+            data = bytes(self.command_buffer[:wanted])
+            del self.command_buffer[:wanted]
+            self._submit(_write_upload_chunk, (transfer, data), self._on_upload_written)
+
+        elif self.current_state == STATE_SENDING_FILEDATA:
+            send = self.active_file_send
+            remaining = send['expected_size'] - send['bytes_queued']
+            if remaining <= 0:
+                self._submit(_finish_download, (send,), self._on_download_finished)
+            elif not send['use_sendfile'] and self.pending_send_bytes < MAX_PENDING_SEND:
+                self._submit(_read_download_chunk, (send, min(READ_CHUNK_SIZE, remaining)), self._on_download_read)
 
-        logging.warning(f"Closing connection from {self.address}.")
-        self.connection.close()
+    def _on_command_done(self, result, error):
+        if error:
+            raise error
+        command, response_dict = result
+        body = response_dict.pop('payload', ())
+        json_response_str = json.dumps(response_dict)
 
+        if response_dict.get('status') == 'READY_FOR_DATA' and \
+           command in ('upload_initiate', 'upload_part') and \
+           response_dict.get('file_id') and \
+           response_dict.get('server_filepath_to_write') and \
+           'expected_size' in response_dict:
+            self.active_file_transfer = {
+                'file_id': response_dict['file_id'],
+                'server_filepath_to_write': response_dict['server_filepath_to_write'],
+                'expected_size': int(response_dict['expected_size']),
+                'current_size': 0, 'file_handle': None,
+                'offset': response_dict.get('offset'),
+                'part_index': response_dict.get('part_index'),
+                'checksum': RunningChecksum(response_dict['checksum_algorithms']) if response_dict.get('checksum_algorithms') else None,
+                'decoder': BlockDecoder(response_dict['encoding']) if response_dict.get('encoding') else None,
+                'response': json_response_str,
+                'disk_time': 0.0, 'socket_time': 0.0
+            }
+            self._submit(_open_upload, (self.active_file_transfer,), self._on_upload_opened)
 
-class Server(threading.Thread):
-    def __init__(self,ipaddress='0.0.0.0',port=8889):
-        self.ipinfo=(ipaddress,port)
-        self.the_clients = []
+        elif response_dict.get('status') == 'READY_TO_SEND_DATA' and \
+             command == 'get_stream_initiate' and \
+             response_dict.get('server_filepath_to_read') and \
+             'expected_size' in response_dict:
+            cached = fp.file_interface.content_cache.get(response_dict['server_filepath_to_read'])
+            if cached is not None:
+                offset = int(response_dict.get('offset', 0))
+                self._send_response(json_response_str)
+                self._queue_send(memoryview(cached)[offset:offset + int(response_dict['expected_size'])])
+                self._record_transfer('download', {'disk_time': 0.0, 'socket_time': 0.0})
+                return
+            hash_on_send = response_dict.get('checksums') is None and not response_dict.get('encoding') and \
+                           int(response_dict.get('offset', 0)) == 0 and \
+                           int(response_dict['expected_size']) == response_dict.get('file_size')
+            self.active_file_send = {
+                'server_filepath_to_read': response_dict['server_filepath_to_read'],
+                'expected_size': int(response_dict['expected_size']),
+                'offset': int(response_dict.get('offset', 0)),
+                'bytes_queued': 0, 'file_handle': None,
+                'checksum': RunningChecksum() if hash_on_send else None,
+                'use_sendfile': hasattr(os, 'sendfile') and not hash_on_send,
+                'response': json_response_str,
+                'disk_time': 0.0, 'socket_time': 0.0
+            }
+            self._submit(open, (self.active_file_send['server_filepath_to_read'], 'rb'), self._on_download_opened)
+
+        else:
+            self._send_response(json_response_str)
+            for buffer in body:
+                self._queue_send(buffer)
+            if response_dict.get('status') == 'OK' and command == 'hello':
+                self.protocol_version = response_dict.get('protocol', PROTOCOL_V1)
+            if response_dict.get('status') == 'OK' and \
+               command in ('upload_finalize', 'upload_abort'):
+                self.active_file_transfer = {}
+
+    def _on_upload_opened(self, handle, error):
+        if error:
+            metrics.inc('errors_total', labels=(('type', 'upload_open'),))
+            self.server.submit(None, _cleanup_transfers, (self.active_file_transfer, {}), None)
+            self.active_file_transfer = {}
+            self._send_error('Server failed to prepare file for upload')
+            return
+        self.active_file_transfer['file_handle'] = handle
+        self._send_response(self.active_file_transfer['response'])
+        self.current_state = STATE_EXPECT_FILEDATA
+
+    def _on_upload_written(self, result, error):
+        if isinstance(error, ValueError):
+            metrics.inc('errors_total', labels=(('type', 'invalid_compressed_data'),))
+            self._abort_transfers()
+            self._send_error('Invalid compressed upload data.', close=True)
+        elif error:
+            metrics.inc('errors_total', labels=(('type', 'upload_write'),))
+            self._abort_transfers()
+            self._send_error('Server failed to write file data.', close=True)
+
+    def _on_upload_finished(self, response, error):
+        if isinstance(error, OSError):
+            metrics.inc('errors_total', labels=(('type', 'upload_write'),))
+            self._abort_transfers()
+            self._send_error('Server failed to write file data.')
+            return
+        if error:
+            raise error
+        self._record_transfer('upload', self.active_file_transfer)
+        self.active_file_transfer = {}
+        self.current_state = STATE_EXPECT_COMMAND
+        if response is not None:
+            self._send_response(json.dumps(response))
+
+    def _on_download_opened(self, handle, error):
+        if error:
+            metrics.inc('errors_total', labels=(('type', 'download_open'),))
+            self.active_file_send = {}
+            self._send_error('Server error: Could not read file')
+            return
+        self.active_file_send['file_handle'] = handle
+        self._send_response(self.active_file_send['response'])
+        self.current_state = STATE_SENDING_FILEDATA
+
+    def _on_download_read(self, chunk, error):
+        if error or not chunk:
+            metrics.inc('errors_total', labels=(('type', 'download_read'),))
+            self._abort_transfers()
+            self.close()
+            return
+        self.active_file_send['bytes_queued'] += len(chunk)
+        self._queue_send(chunk)
+
+    def _on_sendfile_done(self, sent, error):
+        if isinstance(error, OSError) and not isinstance(error, (BrokenPipeError, ConnectionResetError)):
+            self.active_file_send['use_sendfile'] = False
+            return
+        if error:
+            raise error
+        if sent is None:
+            return
+        if sent == 0:
+            metrics.inc('errors_total', labels=(('type', 'download_read'),))
+            self._abort_transfers()
+            self.close()
+            return
+        self.last_activity = time.monotonic()
+        self.active_file_send['bytes_queued'] += sent
+        metrics.inc('bytes_sent_total', sent)
+
+    def _on_download_finished(self, result, error):
+        if error:
+            raise error
+        self._record_transfer('download', self.active_file_send)
+        self.active_file_send = {}
+        self.current_state = STATE_EXPECT_COMMAND
+
+    def _abort_transfers(self):
+        if self.active_file_transfer or self.active_file_send:
+            self.server.submit(None, _cleanup_transfers, (self.active_file_transfer, self.active_file_send), None)
+        self.active_file_transfer = {}
+        self.active_file_send = {}
+        self.current_state = STATE_EXPECT_COMMAND
+
+    def handle_error(self, error):
+        if isinstance(error, (UnicodeDecodeError, FrameError)):
+            metrics.inc('errors_total', labels=(('type', 'framing'),))
+            self.command_buffer = bytearray()
+            self._abort_transfers()
+            self._send_error('Invalid command framing or encoding.', close=True)
+        elif isinstance(error, ConnectionResetError):
+            metrics.inc('errors_total', labels=(('type', 'connection_reset'),))
+            self.close()
+        elif isinstance(error, OSError):
+            metrics.inc('errors_total', labels=(('type', 'socket'),))
+            self.close()
+        else:
+            logging.error(f"Error processing client {self.address}: {error}", exc_info=error)
+            metrics.inc('errors_total', labels=(('type', 'unexpected'),))
+            self._abort_transfers()
+            self._send_error('Unexpected server error processing request.', close=True)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.server.forget(self)
+        try: self.connection.close()
+        except Exception: pass
+        if not self.busy:
+            self._abort_transfers()
+
+class Server:
+    def __init__(self, ipaddress='0.0.0.0', port=8889, disk_workers=4, backlog=1024, durability_policy=None):
+        self.ipinfo = (ipaddress, port)
+        self.disk_workers = disk_workers
+        self.backlog = backlog
+        if durability_policy:
+            durability.configure(durability_policy)
+        self.selector = selectors.DefaultSelector()
+        self.clients = {}
+        self.completions = collections.deque()
+        self.disk_executor = None
+        self.accept_paused_until = None
         self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        threading.Thread.__init__(self)
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
 
-    def run(self):
-        logging.warning(f"Server berjalan di ip address {self.ipinfo}")
-        self.my_socket.bind(self.ipinfo)
-        self.my_socket.listen(5)
+    def submit(self, client, func, args, callback):
+        if self.disk_executor is None:
+            self.completions.append((client, callback, _run_job(func, args)))
+            return
+        future = self.disk_executor.submit(_run_job, func, args)
+        future.add_done_callback(lambda f: self._complete(client, callback, f.result()))
+
+    def _complete(self, client, callback, outcome):
+        self.completions.append((client, callback, outcome))
+        try: self.wake_w.send(b'\0')
+        except (BlockingIOError, OSError): pass
+
+    def _run_completions(self):
+        while self.completions:
+            client, callback, (result, error) = self.completions.popleft()
+            if client is None:
+                continue
+            client.busy = False
+            if client.closed:
+                client._abort_transfers()
+                continue
+            try:
+                callback(result, error)
+                client.process()
+            except Exception as e:
+                client.handle_error(e)
+            self._update(client)
+
+    def _update(self, client):
+        if client.closed:
+            return
+        events = client.wanted_events()
+        if events == client.registered_mask:
+            return
+        if client.registered_mask == 0:
+            self.selector.register(client.connection, events, client)
+        elif events == 0:
+            self.selector.unregister(client.connection)
+        else:
+            self.selector.modify(client.connection, events, client)
+        client.registered_mask = events
+
+    def forget(self, client):
+        if client.registered_mask:
+            try: self.selector.unregister(client.connection)
+            except (KeyError, ValueError): pass
+            client.registered_mask = 0
+        if self.clients.pop(client.fd, None) is not None:
+            metrics.inc('connections_active', -1)
+        self._resume_accept()
+
+    def _pause_accept(self, error):
+        if self.accept_paused_until is None:
+            logging.error(f"Error accepting new connection: {error}; pausing accept for {ACCEPT_BACKOFF}s")
+            metrics.inc('errors_total', labels=(('type', 'accept_resources'),))
+            self.selector.unregister(self.my_socket)
+        self.accept_paused_until = time.monotonic() + ACCEPT_BACKOFF
+
+    def _resume_accept(self):
+        if self.accept_paused_until is not None:
+            self.accept_paused_until = None
+            self.selector.register(self.my_socket, selectors.EVENT_READ, None)
+
+    def _accept(self):
         while True:
             try:
-                self.connection, self.client_address = self.my_socket.accept()
-                logging.warning(f"Connection from {self.client_address}")
+                connection, client_address = self.my_socket.accept()
+            except BlockingIOError:
+                return
+            except OSError as e:
+                if e.errno in ACCEPT_RESOURCE_ERRORS:
+                    self._pause_accept(e)
+                else:
+                    logging.error(f"Error accepting new connection: {e}")
+                return
+            connection.setblocking(False)
+            client = ProcessTheClient(self, connection, client_address)
+            self.clients[client.fd] = client
+            metrics.inc('connections_total')
+            metrics.inc('connections_active')
+            self._update(client)
 
-                clt = ProcessTheClient(self.connection, self.client_address)
-                clt.start()
-                self.the_clients.append(clt)
-            except Exception as e:
-                logging.error(f"Error accepting new connection: {e}", exc_info=True)
+    def _sweep_idle(self):
+        deadline = time.monotonic() - CLIENT_TIMEOUT
+        for client in list(self.clients.values()):
+            if not client.busy and client.last_activity < deadline:
+                metrics.inc('errors_total', labels=(('type', 'timeout'),))
+                client.close()
+
+    def serve_forever(self):
+        self.my_socket.setblocking(False)
+        self.selector.register(self.my_socket, selectors.EVENT_READ, None)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, self.wake_r)
+        next_sweep = time.monotonic() + SWEEP_INTERVAL
+        while True:
+            timeout = ACCEPT_BACKOFF if self.accept_paused_until is not None else SWEEP_INTERVAL
+            for key, mask in self.selector.select(timeout=timeout):
+                if key.data is None:
+                    self._accept()
+                    continue
+                if key.data is self.wake_r:
+                    try:
+                        while self.wake_r.recv(4096): pass
+                    except BlockingIOError: pass
+                    continue
+                client = key.data
+                try:
+                    if mask & selectors.EVENT_READ:
+                        client.on_readable()
+                    if mask & selectors.EVENT_WRITE and not client.closed:
+                        client.on_writable()
+                except Exception as e:
+                    client.handle_error(e)
+                self._update(client)
+            self._run_completions()
+            if self.accept_paused_until is not None and time.monotonic() >= self.accept_paused_until:
+                self._resume_accept()
+            if time.monotonic() >= next_sweep:
+                self._sweep_idle()
+                next_sweep = time.monotonic() + SWEEP_INTERVAL
+
+    def run(self):
+        logging.warning(f"Server berjalan di ip address {self.ipinfo} dengan {self.disk_workers} disk worker")
+        try:
+            self.my_socket.bind(self.ipinfo)
+            self.my_socket.listen(self.backlog)
+        except OSError as e:
+            logging.error(f"Could not bind/listen on {self.ipinfo}: {e}")
+            return
+        try:
+            if self.disk_workers:
+                with ThreadPoolExecutor(max_workers=self.disk_workers, thread_name_prefix="DiskIOPool") as self.disk_executor:
+                    self.serve_forever()
+            else:
+                self.serve_forever()
+        except KeyboardInterrupt:
+            logging.warning("KeyboardInterrupt received. Shutting down server...")
+        finally:
+            self.my_socket.close()
 
 def main():
     svr = Server()
-    svr.start()
-
+    svr.run()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,290 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from file_protocol import FileProtocol, FrameError, FRAME_HEADER, PROTOCOL_V1, PROTOCOL_V2, decode_frame_header, encode_response
+from file_transfer import BlockDecoder, RunningChecksum, UploadWriter, durability
+from file_ratelimit import SMALL_TRANSFER_BYTES, limiter
+fp = FileProtocol()
+
+COMMAND_TERMINATOR = b"\r\n\r\n"
+TRANSFER_CHUNK_SIZE = 65536
+CLIENT_TIMEOUT = 120.0
+
+class ProcessTheClient:
+    def __init__(self, reader, writer, server):
+        self.reader = reader
+        self.writer = writer
+        self.server = server
+        self.address = writer.get_extra_info('peername')
+        self.active_file_transfer = {}
+        self.active_file_send = {}
+        self.protocol_version = PROTOCOL_V1
+        self.shaper = limiter.open(self.address)
+
+    async def _throttle(self, amount, interactive=False):
+        wait = self.shaper.reserve(amount, interactive)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _disk(self, func, *args):
+        async with self.server.disk_slots:
+            return await asyncio.get_running_loop().run_in_executor(self.server.disk_executor, func, *args)
+
+    async def _send_response(self, response_str, body=()):
+        self.writer.writelines([encode_response(response_str, self.protocol_version), *body])
+        await self.writer.drain()
+
+    async def _close_handle(self, handle):
+        if handle and not handle.closed:
+            try: await self._disk(handle.close)
+            except Exception: pass
+
+    async def _cleanup_active_transfer_or_send(self, transfer_type="UPLOAD"):
+        if transfer_type == "UPLOAD" and self.active_file_transfer:
+            file_id = self.active_file_transfer.get('file_id')
+            await self._close_handle(self.active_file_transfer.get('file_handle'))
+            if file_id and self.active_file_transfer.get('part_index') is None:
+                try: await self._disk(fp.file_interface.upload_abort, [file_id])
+                except Exception: pass
+            self.active_file_transfer = {}
+        elif transfer_type == "DOWNLOAD" and self.active_file_send:
+            await self._close_handle(self.active_file_send.get('file_handle'))
+            self.active_file_send = {}
+
+    async def _receive_upload(self, response_dict, json_response_str):
+        self.active_file_transfer = {
+            'file_id': response_dict['file_id'],
+            'server_filepath_to_write': response_dict['server_filepath_to_write'],
+            'expected_size': int(response_dict['expected_size']),
+            'current_size': 0, 'file_handle': None,
+            'offset': response_dict.get('offset'),
+            'part_index': response_dict.get('part_index'),
+            'checksum': RunningChecksum(response_dict['checksum_algorithms']) if response_dict.get('checksum_algorithms') else None,
+            'decoder': BlockDecoder(response_dict['encoding']) if response_dict.get('encoding') else None
+        }
+        try:
+            os.makedirs(os.path.dirname(self.active_file_transfer['server_filepath_to_write']), exist_ok=True)
+            self.active_file_transfer['file_handle'] = await self._disk(UploadWriter, self.active_file_transfer['server_filepath_to_write'],
+                                                                        self.active_file_transfer['expected_size'], self.active_file_transfer['offset'])
+        except IOError:
+            await self._cleanup_active_transfer_or_send("UPLOAD")
+            await self._send_response(json.dumps({'status':'ERROR', 'data':'Server failed to prepare file for upload'}))
+            return True
+        await self._send_response(json_response_str)
+
+        fh_upload = self.active_file_transfer['file_handle']
+        decoder = self.active_file_transfer['decoder']
+        interactive = self.active_file_transfer['expected_size'] <= SMALL_TRANSFER_BYTES
+        while self.active_file_transfer['current_size'] < self.active_file_transfer['expected_size']:
+            bytes_to_receive = min(TRANSFER_CHUNK_SIZE, decoder.wanted() if decoder else self.active_file_transfer['expected_size'] - self.active_file_transfer['current_size'])
+            file_data_chunk = await asyncio.wait_for(self.reader.read(bytes_to_receive), CLIENT_TIMEOUT)
+            if not file_data_chunk:
+                await self._cleanup_active_transfer_or_send("UPLOAD")
+                return False
+            await self._throttle(len(file_data_chunk), interactive)
+            try:
+                blocks = decoder.feed(file_data_chunk) if decoder else (file_data_chunk,)
+            except ValueError:
+                await self._cleanup_active_transfer_or_send("UPLOAD")
+                await self._send_response(json.dumps({'status':'ERROR', 'data':'Invalid compressed upload data.'}))
+                return False
+            try:
+                for block in blocks:
+                    await self._disk(fh_upload.write, block)
+                    if self.active_file_transfer['checksum']:
+                        self.active_file_transfer['checksum'].update(block)
+                    self.active_file_transfer['current_size'] += len(block)
+            except IOError:
+                await self._cleanup_active_transfer_or_send("UPLOAD")
+                await self._send_response(json.dumps({'status':'ERROR', 'data':'Server failed to write file data.'}))
+                return False
+
+        try:
+            await self._disk(fh_upload.close)
+        except IOError:
+            await self._cleanup_active_transfer_or_send("UPLOAD")
+            await self._send_response(json.dumps({'status':'ERROR', 'data':'Server failed to write file data.'}))
+            return False
+        file_id = self.active_file_transfer['file_id']
+        part_index = self.active_file_transfer['part_index']
+        current_size = self.active_file_transfer['current_size']
+        checksum = self.active_file_transfer['checksum']
+        self.active_file_transfer = {}
+        if part_index is None:
+            await self._disk(fp.file_interface._mark_chunks_complete, file_id, current_size, checksum.hexdigests() if checksum else None)
+        else:
+            await self._send_response(json.dumps(await self._disk(fp.file_interface._mark_part_complete, file_id, part_index)))
+        return True
+
+    async def _send_download(self, response_dict, json_response_str):
+        cached = fp.file_interface.content_cache.get(response_dict['server_filepath_to_read'])
+        if cached is not None:
+            offset = int(response_dict.get('offset', 0))
+            await self._throttle(int(response_dict['expected_size']), int(response_dict['expected_size']) <= SMALL_TRANSFER_BYTES)
+            self.writer.writelines([encode_response(json_response_str, self.protocol_version),
+                                    memoryview(cached)[offset:offset + int(response_dict['expected_size'])]])
+            await asyncio.wait_for(self.writer.drain(), CLIENT_TIMEOUT)
+            return True
+        hash_on_send = response_dict.get('checksums') is None and not response_dict.get('encoding') and \
+                       int(response_dict.get('offset', 0)) == 0 and \
+                       int(response_dict['expected_size']) == response_dict.get('file_size')
+        self.active_file_send = {
+            'server_filepath_to_read': response_dict['server_filepath_to_read'],
+            'expected_size': int(response_dict['expected_size']),
+            'offset': int(response_dict.get('offset', 0)),
+            'bytes_sent': 0, 'file_handle': None,
+            'checksum': RunningChecksum() if hash_on_send else None
+        }
+        try:
+            self.active_file_send['file_handle'] = await self._disk(open, self.active_file_send['server_filepath_to_read'], 'rb')
+        except IOError:
+            await self._cleanup_active_transfer_or_send("DOWNLOAD")
+            await self._send_response(json.dumps({'status':'ERROR', 'data':'Server error: Could not read file'}))
+            return True
+        await self._send_response(json_response_str)
+
+        fh_download = self.active_file_send['file_handle']
+        interactive = self.active_file_send['expected_size'] <= SMALL_TRANSFER_BYTES
+        try:
+            if self.active_file_send['expected_size'] > 0 and not self.active_file_send['checksum'] and not self.shaper.limited():
+                self.active_file_send['bytes_sent'] = await asyncio.get_running_loop().sendfile(
+                    self.writer.transport, fh_download, self.active_file_send['offset'], self.active_file_send['expected_size'], fallback=False)
+            else:
+                await self._disk(fh_download.seek, self.active_file_send['offset'])
+        except asyncio.SendfileNotAvailableError:
+            await self._disk(fh_download.seek, self.active_file_send['offset'])
+        while self.active_file_send['bytes_sent'] < self.active_file_send['expected_size']:
+            chunk_to_send = await self._disk(fh_download.read, min(TRANSFER_CHUNK_SIZE, self.active_file_send['expected_size'] - self.active_file_send['bytes_sent']))
+            if not chunk_to_send:
+                await self._cleanup_active_transfer_or_send("DOWNLOAD")
+                return False
+            if self.active_file_send['checksum']:
+                self.active_file_send['checksum'].update(chunk_to_send)
+            await self._throttle(len(chunk_to_send), interactive)
+            self.writer.write(chunk_to_send)
+            await asyncio.wait_for(self.writer.drain(), CLIENT_TIMEOUT)
+            self.active_file_send['bytes_sent'] += len(chunk_to_send)
+        if self.active_file_send['checksum']:
+            await self._disk(fp.file_interface._record_checksums, self.active_file_send['server_filepath_to_read'],
+                             self.active_file_send['checksum'].hexdigests(), os.fstat(fh_download.fileno()))
+        await self._cleanup_active_transfer_or_send("DOWNLOAD")
+        return True
+
+    async def _next_command(self):
+        if self.protocol_version == PROTOCOL_V2:
+            frame_header = await asyncio.wait_for(self.reader.readexactly(FRAME_HEADER.size), CLIENT_TIMEOUT)
+            opcode, flags, header_len, body_len = decode_frame_header(frame_header)
+            if body_len:
+                raise FrameError('Command frames do not carry a body')
+            header = await asyncio.wait_for(self.reader.readexactly(header_len), CLIENT_TIMEOUT) if header_len else b''
+            return await self._disk(fp.handle_frame, opcode, header)
+
+        raw_command = await asyncio.wait_for(self.reader.readuntil(COMMAND_TERMINATOR), CLIENT_TIMEOUT)
+        complete_command_str = raw_command[:-len(COMMAND_TERMINATOR)].decode('utf-8', errors='ignore')
+        return await self._disk(fp.handle_string, complete_command_str)
+
+    async def run(self):
+        while True:
+            try:
+                command, response_dict = await self._next_command()
+                body = response_dict.pop('payload', ())
+                json_response_str = json.dumps(response_dict)
+
+                if response_dict.get('status') == 'READY_FOR_DATA' and \
+                   command in ('upload_initiate', 'upload_part') and \
+                   response_dict.get('file_id') and \
+                   response_dict.get('server_filepath_to_write') and \
+                   'expected_size' in response_dict:
+                    if not await self._receive_upload(response_dict, json_response_str): break
+
+                elif response_dict.get('status') == 'READY_TO_SEND_DATA' and \
+                     command == 'get_stream_initiate' and \
+                     response_dict.get('server_filepath_to_read') and \
+                     'expected_size' in response_dict:
+                    if not await self._send_download(response_dict, json_response_str): break
+
+                else:
+                    if body:
+                        await self._throttle(response_dict['expected_size'], response_dict['expected_size'] <= SMALL_TRANSFER_BYTES)
+                    await self._send_response(json_response_str, body)
+                    if response_dict.get('status') == 'OK' and command == 'hello':
+                        self.protocol_version = response_dict.get('protocol', PROTOCOL_V1)
+                    if response_dict.get('status') == 'OK' and \
+                       command in ('upload_finalize', 'upload_abort'):
+                        self.active_file_transfer = {}
+
+            except asyncio.IncompleteReadError:
+                break
+            except FrameError:
+                try: await self._send_response(json.dumps({'status':'ERROR', 'data':'Invalid command framing.'}))
+                except Exception: pass
+                break
+            except asyncio.LimitOverrunError:
+                try: await self._send_response(json.dumps({'status':'ERROR', 'data':'Command too long.'}))
+                except Exception: pass
+                break
+            except (asyncio.TimeoutError, ConnectionError, OSError):
+                break
+            except Exception:
+                try: await self._send_response(json.dumps({'status':'ERROR', 'data':'Unexpected server error processing request.'}))
+                except Exception: pass
+                break
+
+        await self._cleanup_active_transfer_or_send("UPLOAD")
+        await self._cleanup_active_transfer_or_send("DOWNLOAD")
+        self.shaper.close()
+        try:
+            self.writer.close()
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+
+class Server:
+    def __init__(self, ipaddress='0.0.0.0', port=8889, disk_workers=10, max_pending_disk_ops=64, backlog=1024,
+                 reuse_port=False, listen_socket=None, rate_limits=None, durability_policy=None):
+        self.ipinfo = (ipaddress, port)
+        self.reuse_port = reuse_port
+        self.listen_socket = listen_socket
+        self.disk_workers = disk_workers
+        self.max_pending_disk_ops = max_pending_disk_ops
+        self.backlog = backlog
+        self.disk_executor = None
+        self.disk_slots = None
+        limiter.enforced = True
+        if rate_limits:
+            limiter.configure(**rate_limits)
+        if durability_policy:
+            durability.configure(durability_policy)
+
+    async def _handle_client(self, reader, writer):
+        await ProcessTheClient(reader, writer, self).run()
+
+    async def serve(self):
+        self.disk_slots = asyncio.Semaphore(self.max_pending_disk_ops)
+        with ThreadPoolExecutor(max_workers=self.disk_workers, thread_name_prefix="DiskIOPool") as self.disk_executor:
+            if self.listen_socket is not None:
+                server = await asyncio.start_server(self._handle_client, sock=self.listen_socket, backlog=self.backlog)
+            else:
+                server = await asyncio.start_server(self._handle_client, self.ipinfo[0], self.ipinfo[1],
+                                                    reuse_address=True, reuse_port=self.reuse_port or None,
+                                                    backlog=self.backlog)
+            async with server:
+                await server.serve_forever()
+
+    def run(self):
+        print(f"Async server starting on {self.ipinfo[0]}:{self.ipinfo[1]} with {self.disk_workers} disk workers")
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("KeyboardInterrupt received. Shutting down server...")
+        except Exception as e:
+            print(f"ERROR: Could not bind/listen on {self.ipinfo}: {e}")
+
+def main():
+    server_instance = Server(ipaddress='0.0.0.0', port=8889, disk_workers=10)
+    server_instance.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import os
+import sys
+import signal
+import socket
+import time
+import multiprocessing
+
+ENGINES = ('threadpool', 'async')
+RESTART_BACKOFF_MAX = 30.0
+STABLE_UPTIME = 60.0
+MAX_QUICK_RESTARTS = 5
+
+def _run_worker(engine, ipaddress, port, listen_socket, worker_options):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    reuse_port = listen_socket is None
+    if engine == 'async':
+        from file_server_async import Server
+    else:
+        from file_server_threadpool import Server
+    Server(ipaddress=ipaddress, port=port, reuse_port=reuse_port, listen_socket=listen_socket, **worker_options).run()
+    sys.exit(1)
+
+class Supervisor:
+    def __init__(self, ipaddress='0.0.0.0', port=8889, num_workers=None, engine='threadpool',
+                 worker_options=None, use_reuseport=None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+        self.ipinfo = (ipaddress, port)
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.engine = engine
+        self.worker_options = worker_options or {}
+        self.use_reuseport = hasattr(socket, 'SO_REUSEPORT') if use_reuseport is None else use_reuseport
+        self.listen_socket = None
+        self.workers = []
+        self.restart_counts = []
+        self.restart_at = []
+        self.started_at = []
+        self.stopping = False
+        self.ctx = multiprocessing.get_context('fork')
+
+    def _create_shared_socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(self.ipinfo)
+        sock.listen(1024)
+        return sock
+
+    def _spawn(self, index):
+        process = self.ctx.Process(
+            target=_run_worker,
+            args=(self.engine, self.ipinfo[0], self.ipinfo[1], self.listen_socket, self.worker_options),
+            name=f"FileServerWorker-{index}", daemon=False)
+        process.start()
+        self.started_at[index] = time.monotonic()
+        return process
+
+    def _request_stop(self, signum, frame):
+        self.stopping = True
+
+    def _check_workers(self):
+        now = time.monotonic()
+        for index, process in enumerate(self.workers):
+            if self.stopping or process.is_alive():
+                continue
+            if self.restart_at[index] is None:
+                process.join(0)
+                if now - self.started_at[index] >= STABLE_UPTIME:
+                    self.restart_counts[index] = 0
+                self.restart_counts[index] += 1
+                if self.restart_counts[index] > MAX_QUICK_RESTARTS:
+                    print(f"Worker {index} (pid {process.pid}) exited with code {process.exitcode} "
+                          f"{self.restart_counts[index]} times in a row; stopping server")
+                    self.stopping = True
+                    return
+                delay = min(RESTART_BACKOFF_MAX, 0.5 * (2 ** min(self.restart_counts[index], 6)))
+                print(f"Worker {index} (pid {process.pid}) exited with code {process.exitcode}; restarting in {delay:.1f}s")
+                self.restart_at[index] = now + delay
+            elif now >= self.restart_at[index]:
+                self.restart_at[index] = None
+                self.workers[index] = self._spawn(index)
+
+    def shutdown(self, timeout=5.0):
+        self.stopping = True
+        for process in self.workers:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self.workers:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        if self.listen_socket is not None:
+            try: self.listen_socket.close()
+            except Exception: pass
+
+    def run(self):
+        mode = "SO_REUSEPORT" if self.use_reuseport else "shared listening socket"
+        print(f"Supervisor starting {self.num_workers} {self.engine} workers on {self.ipinfo[0]}:{self.ipinfo[1]} ({mode})")
+        try:
+            if not self.use_reuseport:
+                self.listen_socket = self._create_shared_socket()
+        except Exception as e:
+            print(f"ERROR: Could not bind/listen on {self.ipinfo}: {e}")
+            return
+
+        signal.signal(signal.SIGTERM, self._request_stop)
+        self.started_at = [None] * self.num_workers
+        self.restart_counts = [0] * self.num_workers
+        self.restart_at = [None] * self.num_workers
+        self.workers = [self._spawn(i) for i in range(self.num_workers)]
+        try:
+            while not self.stopping:
+                time.sleep(0.5)
+                self._check_workers()
+        except KeyboardInterrupt:
+            print("KeyboardInterrupt received. Shutting down workers...")
+        finally:
+            self.shutdown()
+            print("All workers stopped.")
+
+def main():
+    supervisor = Supervisor(ipaddress='0.0.0.0', port=8889, num_workers=os.cpu_count(), engine='threadpool')
+    supervisor.run()
+
+if __name__ == "__main__":
+    main()
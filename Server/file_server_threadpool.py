@@ -1,22 +1,116 @@
 import socket
 import json
 import os
+import io
+import time
+import threading
+import itertools
+import collections
 from concurrent.futures import ThreadPoolExecutor
 
-from file_protocol import FileProtocol
+from file_protocol import FileProtocol, FrameError, FRAME_HEADER, PROTOCOL_V1, PROTOCOL_V2, decode_frame_header, encode_response
+from file_transfer import BlockDecoder, RunningChecksum, UploadWriter, durability
+from file_metrics import registry as metrics, start_http_server
+from file_admission import AdmissionController, BusyResponder
+from file_ratelimit import SHAPED_CHUNK_SIZE, SMALL_TRANSFER_BYTES, limiter
 fp = FileProtocol()
 
 STATE_EXPECT_COMMAND = 0
 STATE_EXPECT_FILEDATA = 1
 STATE_SENDING_FILEDATA = 2
 
+MAX_COMMAND_SIZE = 64 * 1024
+SEND_IOV_MAX = 64
+SENDFILE_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_RECV_CHUNK_SIZE = 1024 * 1024
+MIN_RECV_CHUNK_SIZE = 64 * 1024
+MAX_RECV_CHUNK_SIZE = 8 * 1024 * 1024
+
+_worker_buffers = threading.local()
+
+def _get_recv_buffer(size):
+    buf = getattr(_worker_buffers, 'recv_buffer', None)
+    if buf is None or len(buf) != size:
+        buf = memoryview(bytearray(size))
+        _worker_buffers.recv_buffer = buf
+    return buf
+
 class ProcessTheClient:
-    def __init__(self, connection, address):
+    def __init__(self, connection, address, recv_chunk_size=UPLOAD_RECV_CHUNK_SIZE, admission=None):
         self.connection = connection
         self.address = address
+        self.admission = admission
+        self.admitted_bytes = None
+        self.accepted_at = time.monotonic()
+        self.shaper = None
+        self.recv_chunk_size = max(MIN_RECV_CHUNK_SIZE, min(MAX_RECV_CHUNK_SIZE, int(recv_chunk_size)))
         self.current_state = STATE_EXPECT_COMMAND
         self.active_file_transfer = {}
         self.active_file_send = {}
+        self.protocol_version = PROTOCOL_V1
+        self.command_buffer = bytearray()
+        self.scan_from = 0
+
+    def _send_response(self, response_str, body=()):
+        header = encode_response(response_str, self.protocol_version)
+        buffers = collections.deque(memoryview(buffer) for buffer in (header, *body) if len(buffer))
+        total = sum(len(buffer) for buffer in buffers)
+        while buffers:
+            sent = self.connection.sendmsg(list(itertools.islice(buffers, SEND_IOV_MAX)))
+            while buffers and sent >= len(buffers[0]):
+                sent -= len(buffers.popleft())
+            if sent:
+                buffers[0] = buffers[0][sent:]
+        metrics.inc('bytes_sent_total', total)
+
+    def _record_transfer(self, direction, transfer):
+        labels = (('direction', direction),)
+        metrics.inc('transfers_total', labels=labels)
+        metrics.observe('transfer_disk_seconds', transfer['disk_time'], labels)
+        metrics.observe('transfer_socket_seconds', transfer['socket_time'], labels)
+
+    def _throttle(self, direction, amount, interactive=False):
+        wait = self.shaper.throttle(amount, interactive)
+        if wait:
+            metrics.inc('rate_limit_wait_seconds_total', wait, labels=(('direction', direction),))
+
+    def _admit_transfer(self, upload_bytes=0):
+        if self.admission is None:
+            return None
+        reason = self.admission.try_acquire_transfer(upload_bytes)
+        if reason:
+            metrics.inc('admission_rejected_total', labels=(('reason', reason),))
+            return self.admission.busy_response(reason, 'transfer')
+        self.admitted_bytes = upload_bytes
+        return None
+
+    def _release_transfer(self):
+        if self.admitted_bytes is not None:
+            self.admission.release_transfer(self.admitted_bytes)
+            self.admitted_bytes = None
+
+    def _next_command(self):
+        if self.protocol_version == PROTOCOL_V2:
+            if len(self.command_buffer) < FRAME_HEADER.size:
+                return None
+            opcode, flags, header_len, body_len = decode_frame_header(self.command_buffer)
+            if body_len:
+                raise FrameError('Command frames do not carry a body')
+            frame_len = FRAME_HEADER.size + header_len
+            if len(self.command_buffer) < frame_len:
+                return None
+            header = bytes(self.command_buffer[FRAME_HEADER.size:frame_len])
+            del self.command_buffer[:frame_len]
+            return fp.handle_frame(opcode, header)
+
+        end = self.command_buffer.find(b"\r\n\r\n", self.scan_from)
+        if end < 0:
+            self.scan_from = max(0, len(self.command_buffer) - 3)
+            return None
+        complete_command_str = self.command_buffer[:end].decode('utf-8', errors='ignore')
+        del self.command_buffer[:end + 4]
+        self.scan_from = 0
+        return fp.handle_string(complete_command_str)
 
     def _cleanup_active_transfer_or_send(self, transfer_type="UPLOAD"):
         if transfer_type == "UPLOAD" and self.active_file_transfer:
@@ -26,8 +120,8 @@ class ProcessTheClient:
                 if handle and not handle.closed:
                     try: handle.close()
                     except Exception: pass
-            if file_id:
-                try: fp.proses_string(f"upload_abort {file_id}")
+            if file_id and self.active_file_transfer.get('part_index') is None:
+                try: fp.file_interface.upload_abort([file_id])
                 except Exception: pass 
             self.active_file_transfer = {}
         elif transfer_type == "DOWNLOAD" and self.active_file_send:
@@ -37,118 +131,212 @@ class ProcessTheClient:
                     try: handle.close()
                     except Exception: pass
             self.active_file_send = {}
+        self._release_transfer()
         self.current_state = STATE_EXPECT_COMMAND
 
     def run(self):
-        command_buffer = ""
         try:
             self.connection.settimeout(120.0) 
         except Exception:
             try: self.connection.close()
             except Exception: pass
             return
+        self.shaper = limiter.open(self.address)
 
         while True:
             try:
                 if self.current_state == STATE_EXPECT_COMMAND:
-                    data_chunk = self.connection.recv(4096)
-                    if not data_chunk: break
-                    command_buffer += data_chunk.decode('utf-8', errors='ignore')
+                    next_command = self._next_command()
+                    if next_command is None:
+                        if len(self.command_buffer) > MAX_COMMAND_SIZE:
+                            metrics.inc('errors_total', labels=(('type', 'command_too_long'),))
+                            self._send_response(json.dumps({'status':'ERROR', 'data':'Command too long.'}))
+                            break
+                        data_chunk = self.connection.recv(65536)
+                        if not data_chunk: break
+                        metrics.inc('bytes_received_total', len(data_chunk))
+                        self.command_buffer += data_chunk
+                        continue
+                    command, response_dict = next_command
+                    body = response_dict.pop('payload', ())
+                    json_response_str = json.dumps(response_dict)
 
-                    while "\r\n\r\n" in command_buffer:
-                        complete_command_str, command_buffer = command_buffer.split("\r\n\r\n", 1)
-                        json_response_str = fp.proses_string(complete_command_str)
+                    if response_dict.get('status') == 'READY_FOR_DATA' and \
+                       command in ('upload_initiate', 'upload_part') and \
+                       response_dict.get('file_id') and \
+                       response_dict.get('server_filepath_to_write') and \
+                       'expected_size' in response_dict:
+                        busy = self._admit_transfer(int(response_dict['expected_size']))
+                        if busy:
+                            if command == 'upload_initiate':
+                                fp.file_interface.upload_abort([response_dict['file_id']])
+                            try: self._send_response(json.dumps(busy))
+                            except Exception: break
+                            continue
+                        self.active_file_transfer = {
+                            'file_id': response_dict['file_id'],
+                            'server_filepath_to_write': response_dict['server_filepath_to_write'],
+                            'expected_size': int(response_dict['expected_size']),
+                            'current_size': 0, 'file_handle': None,
+                            'offset': response_dict.get('offset'),
+                            'part_index': response_dict.get('part_index'),
+                            'checksum': RunningChecksum(response_dict['checksum_algorithms']) if response_dict.get('checksum_algorithms') else None,
+                            'decoder': BlockDecoder(response_dict['encoding']) if response_dict.get('encoding') else None,
+                            'interactive': int(response_dict['expected_size']) <= SMALL_TRANSFER_BYTES,
+                            'disk_time': 0.0, 'socket_time': 0.0
+                        }
                         try:
-                            response_dict = json.loads(json_response_str)
-                        except json.JSONDecodeError:
-                            try: self.connection.sendall((json_response_str + "\r\n\r\n").encode())
+                            os.makedirs(os.path.dirname(self.active_file_transfer['server_filepath_to_write']), exist_ok=True)
+                            self.active_file_transfer['file_handle'] = UploadWriter(self.active_file_transfer['server_filepath_to_write'],
+                                                                                    self.active_file_transfer['expected_size'],
+                                                                                    self.active_file_transfer['offset'])
+                        except IOError:
+                            metrics.inc('errors_total', labels=(('type', 'upload_open'),))
+                            self._cleanup_active_transfer_or_send("UPLOAD")
+                            err_resp_str = json.dumps({'status':'ERROR', 'data':'Server failed to prepare file for upload'})
+                            try: self._send_response(err_resp_str)
                             except Exception: pass
                             continue
-
-                        if response_dict.get('status') == 'READY_FOR_DATA' and \
-                           'UPLOAD_INITIATE' in complete_command_str.upper() and \
-                           response_dict.get('file_id') and \
-                           response_dict.get('server_filepath_to_write') and \
-                           'expected_size' in response_dict:
-                            self.active_file_transfer = {
-                                'file_id': response_dict['file_id'],
-                                'server_filepath_to_write': response_dict['server_filepath_to_write'],
-                                'expected_size': int(response_dict['expected_size']),
-                                'current_size': 0, 'file_handle': None
-                            }
-                            try:
-                                os.makedirs(os.path.dirname(self.active_file_transfer['server_filepath_to_write']), exist_ok=True)
-                                self.active_file_transfer['file_handle'] = open(self.active_file_transfer['server_filepath_to_write'], 'wb')
-                            except IOError:
-                                self._cleanup_active_transfer_or_send("UPLOAD")
-                                err_resp_str = json.dumps({'status':'ERROR', 'data':'Server failed to prepare file for upload'})
-                                try: self.connection.sendall((err_resp_str + "\r\n\r\n").encode())
-                                except Exception: pass
-                                continue
-                            try: self.connection.sendall((json_response_str + "\r\n\r\n").encode())
+                        try: self._send_response(json_response_str)
+                        except Exception: break
+                        self.current_state = STATE_EXPECT_FILEDATA
+                    
+                    elif response_dict.get('status') == 'READY_TO_SEND_DATA' and \
+                         command == 'get_stream_initiate' and \
+                         response_dict.get('server_filepath_to_read') and \
+                         'expected_size' in response_dict:
+                        cached = fp.file_interface.content_cache.get(response_dict['server_filepath_to_read'])
+                        busy = self._admit_transfer()
+                        if busy:
+                            try: self._send_response(json.dumps(busy))
                             except Exception: break
-                            self.current_state = STATE_EXPECT_FILEDATA
-                        
-                        elif response_dict.get('status') == 'READY_TO_SEND_DATA' and \
-                             'GET_STREAM_INITIATE' in complete_command_str.upper() and \
-                             response_dict.get('server_filepath_to_read') and \
-                             'expected_size' in response_dict:
-                            self.active_file_send = {
-                                'server_filepath_to_read': response_dict['server_filepath_to_read'],
-                                'expected_size': int(response_dict['expected_size']),
-                                'bytes_sent': 0, 'file_handle': None
-                            }
-                            try:
-                                self.active_file_send['file_handle'] = open(self.active_file_send['server_filepath_to_read'], 'rb')
-                            except IOError:
-                                self._cleanup_active_transfer_or_send("DOWNLOAD")
-                                err_resp_str = json.dumps({'status':'ERROR', 'data':'Server error: Could not read file'})
-                                try: self.connection.sendall((err_resp_str + "\r\n\r\n").encode())
-                                except Exception: pass
-                                continue
-                            try: self.connection.sendall((json_response_str + "\r\n\r\n").encode())
-                            except Exception: break
-                            self.current_state = STATE_SENDING_FILEDATA
-                        
-                        else:
-                            try: self.connection.sendall((json_response_str + "\r\n\r\n").encode())
+                            continue
+                        if cached is not None:
+                            offset = int(response_dict.get('offset', 0))
+                            body = memoryview(cached)[offset:offset + int(response_dict['expected_size'])]
+                            self._throttle('download', len(body), len(body) <= SMALL_TRANSFER_BYTES)
+                            started = time.perf_counter()
+                            try: self._send_response(json_response_str, (body,))
                             except Exception: break
-                            if response_dict.get('status') == 'OK' and \
-                               ('UPLOAD_FINALIZE' in complete_command_str.upper() or \
-                                'UPLOAD_ABORT' in complete_command_str.upper()):
-                                self.active_file_transfer = {} 
+                            finally: self._release_transfer()
+                            self._record_transfer('download', {'disk_time': 0.0, 'socket_time': time.perf_counter() - started})
+                            continue
+                        hash_on_send = response_dict.get('checksums') is None and not response_dict.get('encoding') and \
+                                       int(response_dict.get('offset', 0)) == 0 and \
+                                       int(response_dict['expected_size']) == response_dict.get('file_size')
+                        self.active_file_send = {
+                            'server_filepath_to_read': response_dict['server_filepath_to_read'],
+                            'expected_size': int(response_dict['expected_size']),
+                            'offset': int(response_dict.get('offset', 0)),
+                            'bytes_sent': 0, 'file_handle': None,
+                            'checksum': RunningChecksum() if hash_on_send else None,
+                            'use_sendfile': hasattr(os, 'sendfile') and not hash_on_send,
+                            'interactive': int(response_dict['expected_size']) <= SMALL_TRANSFER_BYTES,
+                            'disk_time': 0.0, 'socket_time': 0.0
+                        }
+                        try:
+                            self.active_file_send['file_handle'] = open(self.active_file_send['server_filepath_to_read'], 'rb')
+                            self.active_file_send['file_handle'].seek(self.active_file_send['offset'])
+                        except IOError:
+                            metrics.inc('errors_total', labels=(('type', 'download_open'),))
+                            self._cleanup_active_transfer_or_send("DOWNLOAD")
+                            err_resp_str = json.dumps({'status':'ERROR', 'data':'Server error: Could not read file'})
+                            try: self._send_response(err_resp_str)
+                            except Exception: pass
+                            continue
+                        try: self._send_response(json_response_str)
+                        except Exception: break
+                        self.current_state = STATE_SENDING_FILEDATA
+                    
+                    else:
+                        if body:
+                            busy = self._admit_transfer()
+                            if busy:
+                                try: self._send_response(json.dumps(busy))
+                                except Exception: break
+                                continue
+                            body_size = response_dict['expected_size']
+                            self._throttle('download', body_size, body_size <= SMALL_TRANSFER_BYTES)
+                        try: self._send_response(json_response_str, body)
+                        except Exception: break
+                        finally: self._release_transfer()
+                        if response_dict.get('status') == 'OK' and command == 'hello':
+                            self.protocol_version = response_dict.get('protocol', PROTOCOL_V1)
+                        if response_dict.get('status') == 'OK' and \
+                           command in ('upload_finalize', 'upload_abort'):
+                            self.active_file_transfer = {} 
 
                 elif self.current_state == STATE_EXPECT_FILEDATA:
                     if not self.active_file_transfer or not self.active_file_transfer.get('file_handle'):
                         self._cleanup_active_transfer_or_send("UPLOAD")
                         continue
                     fh_upload = self.active_file_transfer['file_handle']
-                    bytes_to_receive = min(65536, self.active_file_transfer['expected_size'] - self.active_file_transfer['current_size'])
+                    decoder = self.active_file_transfer['decoder']
+                    bytes_to_receive = min(self.recv_chunk_size, self.active_file_transfer['expected_size'] - self.active_file_transfer['current_size'])
 
-                    if bytes_to_receive <= 0:
-                        file_id = self.active_file_transfer['file_id']
-                        if hasattr(fp, 'file_interface') and hasattr(fp.file_interface, 'active_uploads') and file_id in fp.file_interface.active_uploads:
-                            try:
-                                fp.file_interface.active_uploads[file_id]['current_size'] = self.active_file_transfer['current_size']
-                                fp.file_interface.active_uploads[file_id]['status'] = 'CHUNKS_COMPLETE'
-                            except Exception: pass
-                        if fh_upload and not fh_upload.closed:
-                            try: fh_upload.close()
+                    if bytes_to_receive > 0 and decoder:
+                        bytes_to_receive = min(self.recv_chunk_size, decoder.wanted())
+                    elif bytes_to_receive <= 0:
+                        try:
+                            started = time.perf_counter()
+                            fh_upload.close()
+                            self.active_file_transfer['disk_time'] += time.perf_counter() - started
+                        except IOError:
+                            metrics.inc('errors_total', labels=(('type', 'upload_write'),))
+                            self._cleanup_active_transfer_or_send("UPLOAD")
+                            try: self._send_response(json.dumps({'status':'ERROR', 'data':'Server failed to write file data.'}))
                             except Exception: pass
-                        self.active_file_transfer['file_handle'] = None
+                            continue
+                        file_id = self.active_file_transfer['file_id']
+                        part_index = self.active_file_transfer['part_index']
+                        current_size = self.active_file_transfer['current_size']
+                        checksum = self.active_file_transfer['checksum']
+                        self._record_transfer('upload', self.active_file_transfer)
+                        self.active_file_transfer = {}
+                        self._release_transfer()
                         self.current_state = STATE_EXPECT_COMMAND
+                        if part_index is None:
+                            fp.file_interface._mark_chunks_complete(file_id, current_size, checksum.hexdigests() if checksum else None)
+                        else:
+                            self._send_response(json.dumps(fp.file_interface._mark_part_complete(file_id, part_index)))
                         continue
-                    file_data_chunk = self.connection.recv(bytes_to_receive)
-                    if not file_data_chunk:
+                    if self.shaper.limited():
+                        bytes_to_receive = min(bytes_to_receive, SHAPED_CHUNK_SIZE)
+                    recv_view = _get_recv_buffer(self.recv_chunk_size)
+                    if self.command_buffer:
+                        bytes_received = min(bytes_to_receive, len(self.command_buffer))
+                        recv_view[:bytes_received] = self.command_buffer[:bytes_received]
+                        del self.command_buffer[:bytes_received]
+                    else:
+                        started = time.perf_counter()
+                        bytes_received = self.connection.recv_into(recv_view, bytes_to_receive)
+                        self.active_file_transfer['socket_time'] += time.perf_counter() - started
+                        metrics.inc('bytes_received_total', bytes_received)
+                    if not bytes_received:
                         self._cleanup_active_transfer_or_send("UPLOAD")
                         break 
+                    self._throttle('upload', bytes_received, self.active_file_transfer['interactive'])
+                    try:
+                        blocks = decoder.feed(recv_view[:bytes_received]) if decoder else (recv_view[:bytes_received],)
+                    except ValueError:
+                        metrics.inc('errors_total', labels=(('type', 'invalid_compressed_data'),))
+                        self._cleanup_active_transfer_or_send("UPLOAD")
+                        try: self._send_response(json.dumps({'status':'ERROR', 'data':'Invalid compressed upload data.'}))
+                        except Exception: pass
+                        break
                     try:
-                        fh_upload.write(file_data_chunk)
-                        self.active_file_transfer['current_size'] += len(file_data_chunk)
+                        started = time.perf_counter()
+                        for block in blocks:
+                            fh_upload.write(block)
+                            if self.active_file_transfer['checksum']:
+                                self.active_file_transfer['checksum'].update(block)
+                            self.active_file_transfer['current_size'] += len(block)
+                        self.active_file_transfer['disk_time'] += time.perf_counter() - started
                     except IOError:
+                        metrics.inc('errors_total', labels=(('type', 'upload_write'),))
                         self._cleanup_active_transfer_or_send("UPLOAD")
                         err_resp_str = json.dumps({'status':'ERROR', 'data':'Server failed to write file data.'})
-                        try: self.connection.sendall((err_resp_str + "\r\n\r\n").encode())
+                        try: self._send_response(err_resp_str)
                         except Exception: pass
                         break
                 
@@ -158,78 +346,161 @@ class ProcessTheClient:
                         continue
                     fh_download = self.active_file_send['file_handle']
                     if self.active_file_send['bytes_sent'] >= self.active_file_send['expected_size']:
+                        if self.active_file_send['checksum']:
+                            fp.file_interface._record_checksums(self.active_file_send['server_filepath_to_read'],
+                                                                self.active_file_send['checksum'].hexdigests(), os.fstat(fh_download.fileno()))
+                        self._record_transfer('download', self.active_file_send)
                         self._cleanup_active_transfer_or_send("DOWNLOAD")
                         continue
-                    chunk_to_send = fh_download.read(65536)
+                    if self.active_file_send['use_sendfile']:
+                        bytes_to_send = min(SENDFILE_CHUNK_SIZE, self.active_file_send['expected_size'] - self.active_file_send['bytes_sent'])
+                        if self.shaper.limited():
+                            bytes_to_send = min(bytes_to_send, SHAPED_CHUNK_SIZE)
+                        self._throttle('download', bytes_to_send, self.active_file_send['interactive'])
+                        try:
+                            started = time.perf_counter()
+                            sent = self.connection.sendfile(fh_download, self.active_file_send['offset'] + self.active_file_send['bytes_sent'], bytes_to_send)
+                            self.active_file_send['socket_time'] += time.perf_counter() - started
+                        except (ValueError, AttributeError, io.UnsupportedOperation):
+                            self.active_file_send['use_sendfile'] = False
+                            fh_download.seek(self.active_file_send['offset'] + self.active_file_send['bytes_sent'])
+                            continue
+                        if sent <= 0:
+                            self._cleanup_active_transfer_or_send("DOWNLOAD")
+                            break
+                        self.active_file_send['bytes_sent'] += sent
+                        metrics.inc('bytes_sent_total', sent)
+                        continue
+                    started = time.perf_counter()
+                    chunk_to_send = fh_download.read(min(65536, self.active_file_send['expected_size'] - self.active_file_send['bytes_sent']))
+                    self.active_file_send['disk_time'] += time.perf_counter() - started
                     if not chunk_to_send:
                         self._cleanup_active_transfer_or_send("DOWNLOAD")
                         break
+                    if self.active_file_send['checksum']:
+                        self.active_file_send['checksum'].update(chunk_to_send)
+                    self._throttle('download', len(chunk_to_send), self.active_file_send['interactive'])
                     try:
+                        started = time.perf_counter()
                         self.connection.sendall(chunk_to_send)
+                        self.active_file_send['socket_time'] += time.perf_counter() - started
                         self.active_file_send['bytes_sent'] += len(chunk_to_send)
+                        metrics.inc('bytes_sent_total', len(chunk_to_send))
                     except socket.error:
                         self._cleanup_active_transfer_or_send("DOWNLOAD")
                         break 
             
-            except UnicodeDecodeError:
-                command_buffer = ""
-                try:
-                    error_response = json.dumps({'status': 'ERROR', 'data': 'Invalid character encoding in command.'}) + "\r\n\r\n"
-                    self.connection.sendall(error_response.encode())
+            except (UnicodeDecodeError, FrameError):
+                metrics.inc('errors_total', labels=(('type', 'framing'),))
+                self.command_buffer = bytearray()
+                try: self._send_response(json.dumps({'status': 'ERROR', 'data': 'Invalid command framing or encoding.'}))
                 except Exception: pass
                 break 
             except ConnectionResetError:
+                metrics.inc('errors_total', labels=(('type', 'connection_reset'),))
                 self._cleanup_active_transfer_or_send("UPLOAD")
                 self._cleanup_active_transfer_or_send("DOWNLOAD")
                 break
             except socket.timeout:
+                metrics.inc('errors_total', labels=(('type', 'timeout'),))
                 self._cleanup_active_transfer_or_send("UPLOAD")
                 self._cleanup_active_transfer_or_send("DOWNLOAD")
                 break
             except socket.error:
+                metrics.inc('errors_total', labels=(('type', 'socket'),))
                 self._cleanup_active_transfer_or_send("UPLOAD")
                 self._cleanup_active_transfer_or_send("DOWNLOAD")
                 break
             except Exception:
+                metrics.inc('errors_total', labels=(('type', 'unexpected'),))
                 self._cleanup_active_transfer_or_send("UPLOAD")
                 self._cleanup_active_transfer_or_send("DOWNLOAD")
                 try:
                     err_resp_str = json.dumps({'status':'ERROR', 'data':'Unexpected server error processing request.'})
-                    self.connection.sendall((err_resp_str + "\r\n\r\n").encode())
+                    self._send_response(err_resp_str)
                 except Exception: pass
                 break 
 
         self._cleanup_active_transfer_or_send("UPLOAD")
         self._cleanup_active_transfer_or_send("DOWNLOAD")
+        self.shaper.close()
         try:
             self.connection.close()
         except Exception:
             pass
 
 class Server:
-    def __init__(self, ipaddress='0.0.0.0', port=8889, max_workers=10):
+    def __init__(self, ipaddress='0.0.0.0', port=8889, max_workers=10, recv_chunk_size=UPLOAD_RECV_CHUNK_SIZE,
+                 reuse_port=False, listen_socket=None, metrics_port=None, max_queued_connections=None,
+                 max_concurrent_transfers=None, max_upload_bytes=None, rate_limits=None, durability_policy=None):
         self.ipinfo = (ipaddress, port)
         self.max_workers = max_workers
-        self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.admission = AdmissionController(max_workers, max_queued_connections, max_concurrent_transfers, max_upload_bytes)
+        self.busy_responder = None
+        limiter.enforced = True
+        if rate_limits:
+            limiter.configure(**rate_limits)
+        if durability_policy:
+            durability.configure(durability_policy)
+        self.recv_chunk_size = recv_chunk_size
+        self.metrics_port = metrics_port
+        self.prebound = listen_socket is not None
+        if self.prebound:
+            self.my_socket = listen_socket
+        else:
+            self.my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if reuse_port:
+                self.my_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+
+    def _reject(self, connection, reason):
+        metrics.inc('admission_rejected_total', labels=(('reason', reason),))
+        busy = json.dumps(self.admission.busy_response(reason, 'connection'))
+        self.busy_responder.reject(connection, encode_response(busy, PROTOCOL_V1))
+
+    def _serve_client(self, client_task):
+        metrics.inc('pool_queue_depth', -1)
+        self.admission.connection_started()
+        if time.monotonic() - client_task.accepted_at > self.admission.max_queue_wait:
+            self._reject(client_task.connection, 'queue_wait')
+            return
+        metrics.inc('connections_active')
+        try:
+            client_task.run()
+        finally:
+            metrics.inc('connections_active', -1)
 
     def run(self):
         print(f"Server starting on {self.ipinfo[0]}:{self.ipinfo[1]} with {self.max_workers} workers")
         
         try:
-            self.my_socket.bind(self.ipinfo)
-            self.my_socket.listen(50)
+            if not self.prebound:
+                self.my_socket.bind(self.ipinfo)
+                self.my_socket.listen(50)
         except Exception as e:
             print(f"ERROR: Could not bind/listen on {self.ipinfo}: {e}") # Minimal error print
             return
+        if self.metrics_port:
+            try:
+                start_http_server(self.metrics_port)
+                print(f"Metrics available on http://{self.ipinfo[0]}:{self.metrics_port}/metrics")
+            except OSError as e:
+                print(f"WARNING: Could not start metrics endpoint on port {self.metrics_port}: {e}")
+
+        self.busy_responder = BusyResponder()
 
         with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ClientHandlerPool") as executor:
             try:
                 while True:
                     try:
                         connection, client_address = self.my_socket.accept()
-                        client_task = ProcessTheClient(connection, client_address)
-                        executor.submit(client_task.run)
+                        metrics.inc('connections_total')
+                        if not self.admission.try_enqueue_connection():
+                            self._reject(connection, 'queue_full')
+                            continue
+                        client_task = ProcessTheClient(connection, client_address, self.recv_chunk_size, self.admission)
+                        metrics.inc('pool_queue_depth')
+                        executor.submit(self._serve_client, client_task)
                     except socket.error:
                         if self.my_socket.fileno() == -1:
                             break 
@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+
+from file_metrics import registry as metrics
+
+SESSION_SHARDS = 16
+STREAM_SESSION_TIMEOUT = float(os.environ.get('FILE_UPLOAD_STREAM_TIMEOUT', 15 * 60))
+MULTIPART_SESSION_TIMEOUT = float(os.environ.get('FILE_UPLOAD_SESSION_TIMEOUT', 24 * 60 * 60))
+REAP_INTERVAL = float(os.environ.get('FILE_UPLOAD_REAP_INTERVAL', 60))
+TMP_FILE_GRACE = 60.0
+FILE_ID_LENGTH = 36
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+def _version(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _parse_file_id(text):
+    try:
+        return str(uuid.UUID(text))
+    except ValueError:
+        return None
+
+def _remove_file(path):
+    try:
+        size = os.stat(path).st_size
+        os.remove(path)
+        return size
+    except OSError:
+        return 0
+
+class SessionRegistry:
+    def __init__(self, upload_dir, session_dir, shards=SESSION_SHARDS, stream_timeout=STREAM_SESSION_TIMEOUT,
+                 multipart_timeout=MULTIPART_SESSION_TIMEOUT, reap_interval=REAP_INTERVAL):
+        self.upload_dir = upload_dir
+        self.session_dir = session_dir
+        self.stream_timeout = stream_timeout
+        self.multipart_timeout = multipart_timeout
+        self.reap_interval = reap_interval
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+        os.makedirs(session_dir, exist_ok=True)
+        self.reap()
+        if reap_interval:
+            threading.Thread(target=self._reap_loop, name="SessionReaper", daemon=True).start()
+
+    def _shard(self, file_id):
+        return self._shards[hash(file_id) % len(self._shards)]
+
+    def session_path(self, file_id):
+        return os.path.join(self.session_dir, f"{uuid.UUID(file_id)}.json")
+
+    def parts_dir(self, file_id):
+        return os.path.join(self.session_dir, f"{uuid.UUID(file_id)}.parts")
+
+    def _timeout(self, upload_info):
+        return self.multipart_timeout if 'part_count' in upload_info else self.stream_timeout
+
+    def _last_activity(self, file_id, upload_info, last_activity=0.0):
+        return max(last_activity, _mtime(self.session_path(file_id)),
+                   _mtime(upload_info.get('server_filepath_part', '')))
+
+    def get(self, file_id):
+        sessions, lock = self._shard(file_id)
+        with lock:
+            session_path = self.session_path(file_id)
+            version = _version(session_path)
+            entry = sessions.get(file_id)
+            if entry is not None and version is not None and entry[2] == version:
+                entry[1] = time.time()
+                return entry[0]
+            if version is None:
+                self._forget(sessions, file_id)
+                return None
+            try:
+                with open(session_path) as f:
+                    upload_info = json.load(f)
+            except (ValueError, OSError):
+                return None
+            if entry is None:
+                metrics.inc('upload_sessions_live')
+            sessions[file_id] = [upload_info, time.time(), version]
+            return upload_info
+
+    def save(self, file_id, upload_info):
+        sessions, lock = self._shard(file_id)
+        session_path = self.session_path(file_id)
+        tmp_path = f"{session_path}.{os.getpid()}.tmp"
+        with lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(upload_info, f)
+            os.replace(tmp_path, session_path)
+            if file_id not in sessions:
+                metrics.inc('upload_sessions_live')
+            sessions[file_id] = [upload_info, time.time(), _version(session_path)]
+
+    def _forget(self, sessions, file_id):
+        entry = sessions.pop(file_id, None)
+        if entry is not None:
+            metrics.inc('upload_sessions_live', -1)
+        return entry
+
+    def _remove_session_files(self, file_id):
+        try: os.remove(self.session_path(file_id))
+        except OSError: pass
+        shutil.rmtree(self.parts_dir(file_id), ignore_errors=True)
+
+    def drop(self, file_id):
+        if _parse_file_id(file_id) is None:
+            return None
+        sessions, lock = self._shard(file_id)
+        with lock:
+            entry = self._forget(sessions, file_id)
+            self._remove_session_files(file_id)
+        return entry[0] if entry else None
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            try: self.reap()
+            except OSError: pass
+
+    def _expire(self, file_id, upload_info, reason):
+        self._remove_session_files(file_id)
+        reclaimed = _remove_file(upload_info.get('server_filepath_part', ''))
+        metrics.inc('upload_sessions_reaped_total', labels=(('reason', reason),))
+        metrics.inc('upload_reclaimed_bytes_total', reclaimed)
+        return reclaimed
+
+    def _reap_memory(self, now):
+        reclaimed = 0
+        for sessions, lock in self._shards:
+            with lock:
+                for file_id, (upload_info, last_activity, _) in list(sessions.items()):
+                    if not os.path.exists(self.session_path(file_id)):
+                        self._forget(sessions, file_id)
+                    elif now - self._last_activity(file_id, upload_info, last_activity) > self._timeout(upload_info):
+                        self._forget(sessions, file_id)
+                        reclaimed += self._expire(file_id, upload_info, 'idle')
+        return reclaimed
+
+    def _reap_disk(self, now):
+        reclaimed = 0
+        with os.scandir(self.session_dir) as it:
+            names = [dir_entry.name for dir_entry in it]
+        for name in names:
+            path = os.path.join(self.session_dir, name)
+            if name.endswith('.tmp'):
+                if now - _mtime(path) > TMP_FILE_GRACE:
+                    reclaimed += _remove_file(path)
+                continue
+            stem, ext = os.path.splitext(name)
+            file_id = _parse_file_id(stem)
+            if file_id is None:
+                continue
+            sessions, lock = self._shard(file_id)
+            with lock:
+                if file_id in sessions:
+                    continue
+                if ext == '.parts':
+                    if not os.path.exists(self.session_path(file_id)) and now - _mtime(path) > TMP_FILE_GRACE:
+                        shutil.rmtree(path, ignore_errors=True)
+                    continue
+                if ext != '.json':
+                    continue
+                try:
+                    with open(path) as f:
+                        upload_info = json.load(f)
+                except ValueError:
+                    upload_info = {}
+                except OSError:
+                    continue
+                if now - self._last_activity(file_id, upload_info) > self._timeout(upload_info):
+                    reclaimed += self._expire(file_id, upload_info, 'idle')
+
+        with os.scandir(self.upload_dir) as it:
+            part_files = [dir_entry.name for dir_entry in it if dir_entry.name.endswith('.part') and dir_entry.is_file()]
+        for name in part_files:
+            file_id = _parse_file_id(name[:FILE_ID_LENGTH])
+            if file_id is None or name[FILE_ID_LENGTH:FILE_ID_LENGTH + 1] != '_':
+                continue
+            path = os.path.join(self.upload_dir, name)
+            sessions, lock = self._shard(file_id)
+            with lock:
+                if file_id in sessions or os.path.exists(self.session_path(file_id)):
+                    continue
+                if now - _mtime(path) <= TMP_FILE_GRACE:
+                    continue
+                size = _remove_file(path)
+            reclaimed += size
+            metrics.inc('upload_sessions_reaped_total', labels=(('reason', 'orphan'),))
+            metrics.inc('upload_reclaimed_bytes_total', size)
+        return reclaimed
+
+    def reap(self):
+        now = time.time()
+        return self._reap_memory(now) + self._reap_disk(now)
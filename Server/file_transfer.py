@@ -0,0 +1,322 @@
+import os
+import errno
+import zlib
+import struct
+import hashlib
+import threading
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+def pwrite_all(fd, data, offset):
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+DURABILITY_POLICIES = ('none', 'fsync-on-finalize', 'periodic')
+DEFAULT_FSYNC_INTERVAL = 16 * 1024 * 1024
+WRITE_BUFFER_SIZE = 1024 * 1024
+WRITE_ALIGNMENT = 4096
+DIRECT_WRITE_SIZE = 64 * 1024
+
+def parse_durability(value):
+    text = str(value or 'none').strip().lower()
+    if text in ('none', 'off'):
+        return 'none', None
+    if text in ('fsync-on-finalize', 'finalize'):
+        return 'fsync-on-finalize', None
+    if text.startswith('periodic'):
+        digits = ''.join(c for c in text if c.isdigit())
+        interval = int(digits) * 1024 * 1024 if digits else DEFAULT_FSYNC_INTERVAL
+        if interval <= 0:
+            raise ValueError(f"Invalid durability '{value}', fsync interval must be positive")
+        return 'periodic', interval
+    raise ValueError(f"Unknown durability '{value}', expected none, fsync-on-finalize or periodic:<MB>")
+
+class DurabilityPolicy:
+    def __init__(self, value='none'):
+        self.configure(value)
+
+    def configure(self, value):
+        self.name, self.fsync_interval = parse_durability(value)
+
+    def sync_on_finalize(self):
+        return self.name != 'none'
+
+    def __str__(self):
+        return f"periodic:{self.fsync_interval // (1024 * 1024)}" if self.fsync_interval else self.name
+
+durability = DurabilityPolicy(os.environ.get('FILE_DURABILITY', 'none'))
+
+def fadvise(fd, offset, length, advice):
+    if hasattr(os, 'posix_fadvise'):
+        try: os.posix_fadvise(fd, offset, length, getattr(os, advice))
+        except OSError: pass
+
+def preallocate(fd, size):
+    if not size:
+        return
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise
+    os.ftruncate(fd, size)
+
+def fsync_path(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class UploadWriter:
+    def __init__(self, path, expected_size, offset=None, policy=None, buffer_size=WRITE_BUFFER_SIZE):
+        self.policy = policy or durability
+        self.position = self.synced = offset or 0
+        aligned_size = -(-max(expected_size, 1) // WRITE_ALIGNMENT) * WRITE_ALIGNMENT
+        self._buffer = bytearray(min(buffer_size, aligned_size))
+        self._filled = 0
+        self.closed = False
+        if offset is None:
+            self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                preallocate(self.fd, expected_size)
+            except OSError:
+                os.close(self.fd)
+                raise
+        else:
+            self.fd = os.open(path, os.O_WRONLY)
+        fadvise(self.fd, self.position, expected_size, 'POSIX_FADV_SEQUENTIAL')
+
+    def fileno(self):
+        return self.fd
+
+    def _append(self, view):
+        count = min(len(view), len(self._buffer) - self._filled)
+        self._buffer[self._filled:self._filled + count] = view[:count]
+        self._filled += count
+        if self._filled == len(self._buffer):
+            self.flush()
+        return count
+
+    def write(self, data):
+        view = memoryview(data)
+        if len(view) >= DIRECT_WRITE_SIZE:
+            if self._filled:
+                top_up = (WRITE_ALIGNMENT - self._filled % WRITE_ALIGNMENT) % WRITE_ALIGNMENT
+                view = view[self._append(view[:top_up]):]
+                self.flush()
+            whole = len(view) - len(view) % WRITE_ALIGNMENT
+            self._write_out(view[:whole])
+            view = view[whole:]
+        while view:
+            view = view[self._append(view):]
+
+    def _write_out(self, data):
+        pwrite_all(self.fd, data, self.position)
+        self.position += len(data)
+        if self.policy.fsync_interval and self.position - self.synced >= self.policy.fsync_interval:
+            self._sync()
+
+    def _sync(self):
+        if hasattr(os, 'fdatasync'):
+            os.fdatasync(self.fd)
+        else:
+            os.fsync(self.fd)
+        fadvise(self.fd, self.synced, self.position - self.synced, 'POSIX_FADV_DONTNEED')
+        self.synced = self.position
+
+    def flush(self):
+        if self._filled:
+            self._write_out(memoryview(self._buffer)[:self._filled])
+            self._filled = 0
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.flush()
+            if self.policy.fsync_interval and self.position > self.synced:
+                self._sync()
+        finally:
+            os.close(self.fd)
+
+CHECKSUM_ALGORITHMS = ('sha256', 'blake2b', 'crc32')
+DEFAULT_CHECKSUM = 'sha256'
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+class Crc32:
+    def __init__(self):
+        self.value = 0
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return f"{self.value:08x}"
+
+def new_hasher(algorithm):
+    if algorithm == 'crc32':
+        return Crc32()
+    if algorithm in CHECKSUM_ALGORITHMS:
+        return hashlib.new(algorithm)
+    raise ValueError(f"Unknown checksum '{algorithm}', expected one of {CHECKSUM_ALGORITHMS}")
+
+class RunningChecksum:
+    def __init__(self, algorithms=(DEFAULT_CHECKSUM,)):
+        self.hashers = {algorithm: new_hasher(algorithm) for algorithm in algorithms}
+
+    def update(self, data):
+        for hasher in self.hashers.values():
+            hasher.update(data)
+
+    def hexdigests(self):
+        return {algorithm: hasher.hexdigest() for algorithm, hasher in self.hashers.items()}
+
+def file_checksums(path, algorithms=(DEFAULT_CHECKSUM,)):
+    checksum = RunningChecksum(algorithms)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b''):
+            checksum.update(chunk)
+    return checksum.hexdigests()
+
+def parse_checksums(options):
+    checksums = {}
+    for algorithm in CHECKSUM_ALGORITHMS:
+        value = options.get(algorithm, '').lower()
+        if not value:
+            continue
+        if not all(c in '0123456789abcdef' for c in value) or len(value) != len(new_hasher(algorithm).hexdigest()):
+            raise ValueError(f"Invalid {algorithm} digest '{value}'")
+        checksums[algorithm] = value
+    return checksums
+
+CODEC_PREFERENCE = ('zstd', 'lz4', 'zlib')
+COMPRESSION_BLOCK_SIZE = 1024 * 1024
+COMPRESSION_SAMPLE_SIZE = 64 * 1024
+COMPRESSION_SAMPLES = 4
+COMPRESSION_MAX_RATIO = 0.9
+COMPRESSION_MIN_FILE_SIZE = 4096
+ZLIB_LEVEL = 1
+BLOCK_HEADER = struct.Struct('!I')
+BLOCK_RAW_FLAG = 0x80000000
+
+def available_codecs():
+    available = {'zlib': True, 'zstd': zstandard is not None, 'lz4': lz4_frame is not None}
+    return tuple(codec for codec in CODEC_PREFERENCE if available[codec])
+
+def choose_codec(requested):
+    supported = available_codecs()
+    for codec in requested:
+        if codec in supported:
+            return codec
+    return None
+
+def compress_block(codec, data):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    if codec == 'lz4':
+        return lz4_frame.compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+def decompress_block(codec, data, max_size=COMPRESSION_BLOCK_SIZE):
+    try:
+        if codec == 'zstd':
+            raw = zstandard.ZstdDecompressor().decompress(data, max_output_size=max_size)
+        elif codec == 'lz4':
+            decompressor = lz4_frame.LZ4FrameDecompressor()
+            raw = decompressor.decompress(data, max_length=max_size + 1)
+            if not decompressor.eof or decompressor.unused_data:
+                raise ValueError('Truncated or oversized compressed block')
+        else:
+            decompressor = zlib.decompressobj()
+            raw = decompressor.decompress(data, max_size + 1)
+            if not decompressor.eof or decompressor.unconsumed_tail:
+                raise ValueError('Truncated or oversized compressed block')
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f'Corrupt {codec} block: {e}')
+    if len(raw) > max_size:
+        raise ValueError('Compressed block exceeds block size')
+    return raw
+
+def encode_block(codec, data):
+    compressed = compress_block(codec, data)
+    if len(compressed) >= len(data):
+        return BLOCK_HEADER.pack(len(data) | BLOCK_RAW_FLAG) + bytes(data)
+    return BLOCK_HEADER.pack(len(compressed)) + compressed
+
+class BlockDecoder:
+    def __init__(self, codec, max_block_size=COMPRESSION_BLOCK_SIZE):
+        self.codec = codec
+        self.max_block_size = max_block_size
+        self.pending = bytearray()
+        self.block_len = None
+        self.block_raw = False
+
+    def wanted(self):
+        if self.block_len is None:
+            return BLOCK_HEADER.size - len(self.pending)
+        return self.block_len - len(self.pending)
+
+    def feed(self, data):
+        output = []
+        view = memoryview(data)
+        while view:
+            take = min(len(view), self.wanted())
+            self.pending += view[:take]
+            view = view[take:]
+            if self.wanted():
+                continue
+            if self.block_len is None:
+                (header,) = BLOCK_HEADER.unpack(self.pending)
+                self.block_raw = bool(header & BLOCK_RAW_FLAG)
+                self.block_len = header & ~BLOCK_RAW_FLAG
+                if not 0 < self.block_len <= self.max_block_size + 1024:
+                    raise ValueError(f'Invalid compressed block length {self.block_len}')
+            else:
+                block = bytes(self.pending)
+                output.append(block if self.block_raw else decompress_block(self.codec, block, self.max_block_size))
+                self.block_len = None
+            self.pending.clear()
+        return output
+
+def sample_ratio(path, size):
+    if size <= 0:
+        return 1.0
+    compressor_input = 0
+    compressor_output = 0
+    step = max(size // COMPRESSION_SAMPLES, COMPRESSION_SAMPLE_SIZE)
+    with open(path, 'rb') as f:
+        for offset in range(0, size, step):
+            f.seek(offset)
+            sample = f.read(COMPRESSION_SAMPLE_SIZE)
+            compressor_input += len(sample)
+            compressor_output += len(zlib.compress(sample, ZLIB_LEVEL))
+    return compressor_output / max(compressor_input, 1)
+
+def compress_file(src_path, dst_path, codec):
+    tmp_path = f"{dst_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(src_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            for block in iter(lambda: src.read(COMPRESSION_BLOCK_SIZE), b''):
+                dst.write(encode_block(codec, block))
+        os.replace(tmp_path, dst_path)
+    except BaseException:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
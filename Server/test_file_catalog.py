@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from file_catalog import CatalogError, FileCatalog, decode_cursor, encode_cursor
+
+class CursorTest(unittest.TestCase):
+    def test_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(['pokijan.jpg'])), ('pokijan.jpg',))
+        self.assertEqual(decode_cursor(encode_cursor([1024, 'pokijan.jpg']), 'size'), (1024, 'pokijan.jpg'))
+
+    def test_invalid(self):
+        for cursor, sort in (('!!!', 'name'), (encode_cursor({'a': 1}), 'name'),
+                             (encode_cursor(['a', 'b']), 'name'), (encode_cursor([1]), 'name'),
+                             (encode_cursor(['a', 'b']), 'size'), (encode_cursor([True, 'a']), 'size')):
+            with self.subTest(cursor=cursor, sort=sort):
+                with self.assertRaises(CatalogError):
+                    decode_cursor(cursor, sort)
+
+class CatalogListTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for i, name in enumerate(['a.bin', 'b.bin', 'c.txt', 'd.bin', 'e.txt']):
+            with open(os.path.join(self.directory, name), 'wb') as f:
+                f.write(b'x' * (5 - i))
+        self.catalog = FileCatalog(self.directory, resync_interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def collect(self, **kwargs):
+        names, cursor = [], None
+        while True:
+            page, cursor = self.catalog.list(limit=2, cursor=cursor, **kwargs)
+            names.extend(entry['name'] for entry in page)
+            if cursor is None:
+                return names
+
+    def test_paging(self):
+        self.assertEqual(self.collect(), ['a.bin', 'b.bin', 'c.txt', 'd.bin', 'e.txt'])
+        self.assertEqual(self.collect(descending=True), ['e.txt', 'd.bin', 'c.txt', 'b.bin', 'a.bin'])
+        self.assertEqual(self.collect(sort='size'), ['e.txt', 'd.bin', 'c.txt', 'b.bin', 'a.bin'])
+
+    def test_prefix(self):
+        self.assertEqual(self.collect(prefix='c'), ['c.txt'])
+
+    def test_invalid_sort(self):
+        with self.assertRaises(CatalogError):
+            self.catalog.list(sort='warna')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+
+from file_protocol import (FRAME_HEADER, OP_LIST, OP_RESPONSE, FLAG_JSON_HEADER, FrameError,
+                           pack_params, unpack_params, encode_frame, decode_frame_header)
+
+class PackParamsTest(unittest.TestCase):
+    def test_round_trip(self):
+        params = ['pokijan.jpg', 'nama dengan spasi', 'ünïcödé', '', 'a=1']
+        self.assertEqual(unpack_params(pack_params(params)), params)
+
+    def test_empty(self):
+        self.assertEqual(unpack_params(pack_params([])), [])
+
+    def test_non_string_params(self):
+        self.assertEqual(unpack_params(pack_params([1, 2.5])), ['1', '2.5'])
+
+    def test_truncated(self):
+        packed = pack_params(['pokijan.jpg'])
+        for cut in (1, 3, len(packed) - 1):
+            with self.assertRaises(FrameError):
+                unpack_params(packed[:cut])
+
+class FrameTest(unittest.TestCase):
+    def test_round_trip(self):
+        header = pack_params(['limit=50'])
+        frame = encode_frame(OP_LIST, header, body_len=1234)
+        opcode, flags, header_len, body_len = decode_frame_header(frame)
+        self.assertEqual((opcode, flags, header_len, body_len), (OP_LIST, 0, len(header), 1234))
+        self.assertEqual(frame[FRAME_HEADER.size:], header)
+
+    def test_flags(self):
+        frame = encode_frame(OP_RESPONSE, b'{}', flags=FLAG_JSON_HEADER)
+        self.assertEqual(decode_frame_header(frame)[:2], (OP_RESPONSE, FLAG_JSON_HEADER))
+
+    def test_bad_magic(self):
+        frame = bytearray(encode_frame(OP_LIST))
+        frame[0] = 0x00
+        with self.assertRaises(FrameError):
+            decode_frame_header(bytes(frame))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import uuid
+
+from file_sessions import TMP_FILE_GRACE, SessionRegistry
+
+class SessionRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.upload_dir = tempfile.mkdtemp()
+        self.session_dir = os.path.join(self.upload_dir, '.uploads')
+        self.registry = self.new_registry()
+
+    def tearDown(self):
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
+
+    def new_registry(self, **kwargs):
+        kwargs.setdefault('reap_interval', 0)
+        return SessionRegistry(self.upload_dir, self.session_dir, **kwargs)
+
+    def age(self, path, seconds):
+        past = time.time() - seconds
+        os.utime(path, (past, past))
+
+    def test_save_get_drop(self):
+        file_id = str(uuid.uuid4())
+        upload_info = {'filename': 'pokijan.jpg', 'total_size': 10}
+        self.registry.save(file_id, upload_info)
+        self.assertEqual(self.registry.get(file_id), upload_info)
+        self.assertEqual(self.registry.drop(file_id), upload_info)
+        self.assertIsNone(self.registry.get(file_id))
+        self.assertFalse(os.path.exists(self.registry.session_path(file_id)))
+
+    def test_get_unknown(self):
+        self.assertIsNone(self.registry.get(str(uuid.uuid4())))
+        self.assertIsNone(self.registry.drop('bukan-uuid'))
+
+    def test_get_reloads_after_other_writer(self):
+        file_id = str(uuid.uuid4())
+        other = self.new_registry()
+        self.registry.save(file_id, {'received': 0})
+        self.assertEqual(other.get(file_id), {'received': 0})
+        self.registry.save(file_id, {'received': 5})
+        self.assertEqual(other.get(file_id), {'received': 5})
+        self.registry.drop(file_id)
+        self.assertIsNone(other.get(file_id))
+
+    def test_reap_idle_stream_session(self):
+        registry = self.new_registry(stream_timeout=60)
+        file_id = str(uuid.uuid4())
+        part_path = os.path.join(self.upload_dir, f'{file_id}_pokijan.jpg.part')
+        with open(part_path, 'wb') as f:
+            f.write(b'x' * 100)
+        registry.save(file_id, {'server_filepath_part': part_path})
+        self.assertEqual(registry.reap(), 0)
+        self.age(registry.session_path(file_id), 120)
+        self.age(part_path, 120)
+        registry._shard(file_id)[0][file_id][1] = time.time() - 120
+        self.assertEqual(registry.reap(), 100)
+        self.assertFalse(os.path.exists(part_path))
+        self.assertIsNone(registry.get(file_id))
+
+    def test_reap_idle_session_on_disk(self):
+        file_id = str(uuid.uuid4())
+        self.registry.save(file_id, {'part_count': 2})
+        self.age(self.registry.session_path(file_id), 120)
+        registry = self.new_registry(multipart_timeout=60)
+        self.assertFalse(os.path.exists(registry.session_path(file_id)))
+
+    def test_reap_orphan_part_after_grace(self):
+        fresh = os.path.join(self.upload_dir, f'{uuid.uuid4()}_baru.bin.part')
+        stale = os.path.join(self.upload_dir, f'{uuid.uuid4()}_lama.bin.part')
+        for path in (fresh, stale):
+            with open(path, 'wb') as f:
+                f.write(b'x' * 10)
+        self.age(stale, TMP_FILE_GRACE + 10)
+        self.assertEqual(self.registry.reap(), 10)
+        self.assertTrue(os.path.exists(fresh))
+        self.assertFalse(os.path.exists(stale))
+
+if __name__ == '__main__':
+    unittest.main()
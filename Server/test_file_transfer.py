@@ -0,0 +1,69 @@
+import hashlib
+import os
+import unittest
+import zlib
+
+from file_transfer import (BLOCK_HEADER, BLOCK_RAW_FLAG, BlockDecoder, RunningChecksum, available_codecs,
+                           encode_block, parse_durability)
+
+class BlockCodecTest(unittest.TestCase):
+    def decode(self, codec, encoded, step=None):
+        decoder = BlockDecoder(codec)
+        if step is None:
+            return b''.join(decoder.feed(encoded))
+        output = []
+        for pos in range(0, len(encoded), step):
+            output.extend(decoder.feed(encoded[pos:pos + step]))
+        return b''.join(output)
+
+    def test_round_trip(self):
+        blocks = [b'pokijan ' * 4096, b'x' * 10, bytes(range(256)) * 64]
+        for codec in available_codecs():
+            with self.subTest(codec=codec):
+                encoded = b''.join(encode_block(codec, block) for block in blocks)
+                self.assertEqual(self.decode(codec, encoded), b''.join(blocks))
+                self.assertEqual(self.decode(codec, encoded, step=1), b''.join(blocks))
+
+    def test_incompressible_block_is_raw(self):
+        data = os.urandom(4096)
+        encoded = encode_block('zlib', data)
+        (header,) = BLOCK_HEADER.unpack_from(encoded)
+        self.assertTrue(header & BLOCK_RAW_FLAG)
+        self.assertEqual(self.decode('zlib', encoded), data)
+
+    def test_invalid_block_length(self):
+        with self.assertRaises(ValueError):
+            BlockDecoder('zlib').feed(BLOCK_HEADER.pack(0))
+        with self.assertRaises(ValueError):
+            BlockDecoder('zlib', max_block_size=1024).feed(BLOCK_HEADER.pack(4096))
+
+    def test_oversized_block(self):
+        compressed = zlib.compress(b'\0' * 4096)
+        with self.assertRaises(ValueError):
+            BlockDecoder('zlib', max_block_size=1024).feed(BLOCK_HEADER.pack(len(compressed)) + compressed)
+
+    def test_corrupt_block(self):
+        with self.assertRaises(ValueError):
+            BlockDecoder('zlib').feed(BLOCK_HEADER.pack(8) + b'bukanzip')
+
+class ChecksumTest(unittest.TestCase):
+    def test_matches_hashlib(self):
+        data = b'pokijan' * 1000
+        checksum = RunningChecksum(('sha256', 'blake2b', 'crc32'))
+        checksum.update(data[:100])
+        checksum.update(memoryview(data)[100:])
+        digests = checksum.hexdigests()
+        self.assertEqual(digests['sha256'], hashlib.sha256(data).hexdigest())
+        self.assertEqual(digests['blake2b'], hashlib.blake2b(data).hexdigest())
+        self.assertEqual(digests['crc32'], f'{zlib.crc32(data):08x}')
+
+class DurabilityTest(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_durability('none')[0], 'none')
+        self.assertEqual(parse_durability('fsync-on-finalize')[0], 'fsync-on-finalize')
+        self.assertEqual(parse_durability('periodic:4'), ('periodic', 4 * 1024 * 1024))
+        with self.assertRaises(ValueError):
+            parse_durability('selalu')
+
+if __name__ == '__main__':
+    unittest.main()